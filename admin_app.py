@@ -6,11 +6,12 @@ Cấu trúc:
 - templates/admin/: Chứa các HTML templates
 """
 
-from flask import Flask, request
+from flask import Flask, Response, request
 from flask_socketio import SocketIO, emit
+from jetson_nano.metrics import CONTENT_TYPE, MetricFamily, MetricsRegistry
 from routes import admin_bp, api_bp
-from utils import init_drivers_data
-from yolo_processor import get_processor
+from utils import init_drivers_data, get_outbox_registry, get_metadata_outbox_registry, get_raw_outbox_registry
+from yolo_processor import StreamLimitError, collect_metrics, get_processor, find_processor
 
 
 def create_app():
@@ -35,6 +36,108 @@ app = create_app()
 # Khởi tạo SocketIO
 socketio = SocketIO(app, cors_allowed_origins="*", async_mode="threading")
 
+# Outbox theo từng client: client chưa ack frame trước thì chỉ giữ frame mới nhất cho nó
+client_outboxes = get_outbox_registry()
+
+# Outbox cho client chế độ metadata (chỉ nhận detections, tự vẽ overlay lên stream gốc)
+metadata_outboxes = get_metadata_outbox_registry()
+
+# Outbox cho client chế độ passthrough (JPEG gốc của source, metadata đi qua metadata_outboxes)
+raw_outboxes = get_raw_outbox_registry()
+
+STREAM_MODES = ("pixels", "metadata", "passthrough")
+
+# Metrics dạng Prometheus: pipeline từng stream + gửi Socket.IO theo mode
+metrics = MetricsRegistry()
+metrics.register(collect_metrics)
+
+
+@metrics.register
+def _collect_socketio_metrics():
+    """Tổng frame / byte đã gửi và frame bị bỏ (client chậm) qua Socket.IO, theo stream và mode"""
+    clients = MetricFamily("socketio_clients", "gauge", "Số client Socket.IO đang nhận stream")
+    sent = MetricFamily("socketio_messages_sent_total", "counter", "Số message (frame / detections) đã gửi")
+    dropped = MetricFamily("socketio_messages_dropped_total", "counter", "Số message bị bỏ do client chưa ack")
+    bytes_sent = MetricFamily("socketio_bytes_sent_total", "counter", "Số byte đã gửi qua Socket.IO")
+    for mode, outboxes in (("pixels", client_outboxes), ("metadata", metadata_outboxes), ("passthrough", raw_outboxes)):
+        for stream_url, totals in outboxes.totals().items():
+            clients.add(totals["clients"], stream=stream_url, mode=mode)
+            sent.add(totals["sent"], stream=stream_url, mode=mode)
+            dropped.add(totals["dropped"], stream=stream_url, mode=mode)
+            bytes_sent.add(totals["bytes_sent"], stream=stream_url, mode=mode)
+    return [clients, sent, dropped, bytes_sent]
+
+
+@app.route("/metrics")
+def metrics_endpoint():
+    """Metrics dạng Prometheus cho scrape (thời gian từng bước, FPS, hàng đợi, viewer, byte đã gửi)"""
+    return Response(metrics.render(), content_type=CONTENT_TYPE)
+
+
+def _make_sender(sid):
+    """Tạo hàm gửi frame tới một client, client ack khi đã render xong frame"""
+
+    def send(frame_bytes, on_ack):
+        # Gửi binary trực tiếp, không cần base64 (tiết kiệm ~33% bandwidth)
+        socketio.emit("yolo_frame", frame_bytes, to=sid, namespace="/", callback=on_ack)
+
+    return send
+
+
+def _make_metadata_sender(sid):
+    """Tạo hàm gửi metadata detection tới một client, client ack khi đã vẽ overlay"""
+
+    def send(payload, on_ack):
+        socketio.emit("yolo_detections", payload, to=sid, namespace="/", callback=on_ack)
+
+    return send
+
+
+def _ensure_dispatch(processor, stream_url):
+    """Gắn callback dispatch frame / metadata tới outbox của các client (chỉ một lần cho mỗi processor)"""
+    if processor.frame_callback is None:
+
+        def emit_frame(frame_bytes):
+            # Frame được encode một lần, mỗi client nhận theo tốc độ riêng của nó
+            client_outboxes.dispatch(stream_url, frame_bytes)
+
+        processor.set_frame_callback(emit_frame)
+
+    if processor.detection_callback is None:
+
+        def emit_detections(payload):
+            metadata_outboxes.dispatch(stream_url, payload)
+
+        processor.set_detection_callback(emit_detections)
+
+    if processor.raw_frame_callback is None:
+
+        def emit_raw_frame(jpeg_bytes):
+            # JPEG gốc của source, forward nguyên vẹn (không decode / encode lại)
+            raw_outboxes.dispatch(stream_url, jpeg_bytes)
+
+        processor.set_raw_frame_callback(emit_raw_frame)
+
+
+def _streams_of(sid):
+    """Các stream client đang xem (mọi chế độ)"""
+    return (
+        set(client_outboxes.streams_of(sid))
+        | set(metadata_outboxes.streams_of(sid))
+        | set(raw_outboxes.streams_of(sid))
+    )
+
+
+def _unsubscribe(sid, stream_url):
+    """Xóa client khỏi stream (không ảnh hưởng các viewer khác)"""
+    client_outboxes.remove(sid, stream_url)
+    metadata_outboxes.remove(sid, stream_url)
+    raw_outboxes.remove(sid, stream_url)
+
+    processor = find_processor(stream_url)
+    if processor is not None:
+        processor.remove_subscriber(sid)
+
 
 # WebSocket Events
 @socketio.on("connect")
@@ -47,7 +150,14 @@ def handle_connect():
 @socketio.on("disconnect")
 def handle_disconnect():
     """Xử lý khi client ngắt kết nối"""
-    print(f"[WebSocket] Client disconnected")
+    sid = request.sid
+    streams = _streams_of(sid)
+
+    # Dọn subscriber của client ở mọi stream nó đang xem
+    for stream_url in streams:
+        _unsubscribe(sid, stream_url)
+
+    print(f"[WebSocket] Client disconnected: {sid} (left {len(streams)} stream(s))")
 
 
 @socketio.on("start_yolo_stream")
@@ -59,26 +169,47 @@ def handle_start_stream(data):
             emit("error", {"message": "Thiếu stream_url"})
             return
 
+        # "pixels": nhận JPEG đã vẽ overlay, "metadata": chỉ nhận detections và tự vẽ ở client,
+        # "passthrough": nhận JPEG gốc của source + detections, tự vẽ ở client
+        mode = data.get("mode", "pixels")
+        if mode not in STREAM_MODES:
+            emit("error", {"message": f"mode không hợp lệ: {mode}"})
+            return
+
         # Lưu session ID của client hiện tại
         client_sid = request.sid
 
-        # Lấy processor cho stream này
+        # Lấy processor cho stream này (nhiều viewer dùng chung một pipeline)
         processor = get_processor(stream_url)
-
-        # Set callback để emit frames qua WebSocket
-        def emit_frame(frame_bytes):
-            # Gửi binary trực tiếp, không cần base64 (tiết kiệm ~33% bandwidth)
-            socketio.emit("yolo_frame", frame_bytes, room=client_sid, namespace="/")
-
-        processor.set_frame_callback(emit_frame)
+        _ensure_dispatch(processor, stream_url)
+
+        # Client gọi lại với mode khác trên cùng stream: gỡ đăng ký mode cũ (outbox + subscriber),
+        # tránh nhận cả hai loại event và giữ pixel viewer làm render / encode chạy vô ích
+        if stream_url in _streams_of(client_sid):
+            _unsubscribe(client_sid, stream_url)
+
+        # Đăng ký outbox riêng cho client này và thêm vào subscriber của stream
+        if mode in ("metadata", "passthrough"):
+            metadata_outboxes.add(client_sid, stream_url, _make_metadata_sender(client_sid))
+        if mode == "passthrough":
+            raw_outboxes.add(client_sid, stream_url, _make_sender(client_sid))
+        elif mode == "pixels":
+            client_outboxes.add(client_sid, stream_url, _make_sender(client_sid))
+        processor.add_subscriber(client_sid, mode)
 
         # Start processing nếu chưa chạy
         if not processor.is_running:
             processor.start_processing()
 
-        emit("stream_started", {"stream_url": stream_url})
+        emit(
+            "stream_started",
+            {"stream_url": stream_url, "mode": mode, "class_names": processor.class_names},
+        )
         print(f"[WebSocket] Started YOLO stream: {stream_url}")
 
+    except StreamLimitError as e:
+        emit("error", {"message": str(e), "code": "stream_limit"})
+        print(f"[WebSocket] Rejected stream {data.get('stream_url')}: {e}")
     except Exception as e:
         emit("error", {"message": str(e)})
         print(f"[WebSocket] Error starting stream: {e}")
@@ -93,10 +224,8 @@ def handle_stop_stream(data):
             emit("error", {"message": "Thiếu stream_url"})
             return
 
-        processor = get_processor(stream_url)
-
-        # Remove callback
-        processor.set_frame_callback(None)
+        # Chỉ client này ngừng nhận, viewer khác vẫn tiếp tục nhận frame
+        _unsubscribe(request.sid, stream_url)
 
         emit("stream_stopped", {"stream_url": stream_url})
         print(f"[WebSocket] Stopped YOLO stream: {stream_url}")
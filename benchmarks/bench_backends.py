@@ -0,0 +1,108 @@
+"""
+Benchmark - So sánh frames/sec của các backend inference (PyTorch / ONNX Runtime / OpenVINO)
+
+Ví dụ:
+  python benchmarks/bench_backends.py
+  python benchmarks/bench_backends.py --backends pytorch,onnx --batch 4 --threads 4
+  python benchmarks/bench_backends.py --images ./samples/cabin --frames 200
+"""
+
+import argparse
+import glob
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import config  # noqa: E402
+from inference_backends import create_backend  # noqa: E402
+
+
+def load_frames(images_dir, count, width=640, height=480):
+    """Đọc ảnh mẫu từ thư mục, hoặc sinh frame tổng hợp nếu không có"""
+    frames = []
+    if images_dir:
+        paths = sorted(glob.glob(os.path.join(images_dir, "*.jpg")) + glob.glob(os.path.join(images_dir, "*.png")))
+        for path in paths[:count]:
+            frame = cv2.imread(path)
+            if frame is not None:
+                frames.append(frame)
+
+    rng = np.random.default_rng(0)
+    while len(frames) < count:
+        frame = rng.integers(0, 255, (height, width, 3), dtype=np.uint8)
+        cv2.circle(frame, (width // 2, height // 2), 80, (200, 180, 160), -1)
+        frames.append(frame)
+    return frames
+
+
+def make_predict(backend, model_path, imgsz, threads, cache_dir):
+    """Trả về hàm predict(frames) cho backend"""
+    if backend == "pytorch":
+        import torch
+        from ultralytics import YOLO
+
+        if threads > 0:
+            torch.set_num_threads(threads)
+        model = YOLO(model_path)
+        return lambda frames: model.predict(frames, imgsz=imgsz, verbose=False)
+
+    runtime = create_backend(backend, model_path, imgsz, threads, cache_dir)
+    return lambda frames: runtime.predict(frames, 0.25)
+
+
+def benchmark(predict, frames, batch, warmup=3):
+    """
+    Returns:
+        (frames/sec, ms/frame)
+    """
+    for _ in range(warmup):
+        predict(frames[:batch])
+
+    start = time.perf_counter()
+    processed = 0
+    for i in range(0, len(frames), batch):
+        chunk = frames[i : i + batch]
+        predict(chunk)
+        processed += len(chunk)
+    elapsed = time.perf_counter() - start
+    return processed / elapsed, elapsed / processed * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark frames/sec theo backend inference")
+    parser.add_argument("--model", default=config.YOLO_MODEL_PATH, help="Weights YOLO (.pt)")
+    parser.add_argument("--backends", default="pytorch,onnx,openvino", help="Danh sách backend, cách nhau dấu phẩy")
+    parser.add_argument("--images", default=None, help="Thư mục ảnh mẫu (mặc định: frame tổng hợp)")
+    parser.add_argument("--frames", type=int, default=100, help="Số frame benchmark")
+    parser.add_argument("--batch", type=int, default=1, help="Batch size")
+    parser.add_argument("--imgsz", type=int, default=config.YOLO_IMGSZ, help="Kích thước input")
+    parser.add_argument("--threads", type=int, default=config.YOLO_NUM_THREADS, help="Số thread intra-op (0 = auto)")
+    parser.add_argument("--cache-dir", default=config.YOLO_EXPORT_CACHE_DIR, help="Thư mục cache model export")
+    args = parser.parse_args()
+
+    frames = load_frames(args.images, args.frames)
+    print(f"[INFO] {len(frames)} frames, batch={args.batch}, imgsz={args.imgsz}, threads={args.threads or 'auto'}")
+    print()
+    print(f"{'Backend':<10} {'FPS':>10} {'ms/frame':>10} {'Speedup':>10}")
+    print("-" * 44)
+
+    baseline = None
+    for backend in [b.strip() for b in args.backends.split(",") if b.strip()]:
+        try:
+            predict = make_predict(backend, args.model, args.imgsz, args.threads, args.cache_dir)
+            fps, ms = benchmark(predict, frames, args.batch)
+        except Exception as e:
+            print(f"{backend:<10} {'N/A':>10} {'':>10}   ({e})")
+            continue
+
+        baseline = baseline or fps
+        print(f"{backend:<10} {fps:>10.2f} {ms:>10.2f} {fps / baseline:>9.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+Benchmark - Thông lượng tách frame từ HTTP MJPEG: cách cũ (bytes += chunk, dò 0xFFD8 / 0xFFD9 từ đầu
+buffer sau mỗi chunk) so với MJPEGDemuxer (bytearray, quét tiếp từ vị trí cũ, dùng boundary / Content-Length)
+
+Stream giả lập giống camera_utils.generate_frames; một phần frame chứa thumbnail EXIF (có sẵn 0xFFD9 bên trong)
+để kiểm tra frame bị cắt sai.
+
+Ví dụ:
+  python benchmarks/bench_mjpeg_demux.py
+  python benchmarks/bench_mjpeg_demux.py --width 1280 --height 720 --frames 100
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from jetson_nano.mjpeg_stream import MJPEGDemuxer  # noqa: E402
+
+CHUNK_SIZES = (8192, 65536)
+
+
+def legacy_split(chunks):
+    """Cách cũ của MJPEGResponseCapture: tích lũy bytes và tìm marker từ đầu sau mỗi chunk"""
+    frames = []
+    bytes_data = bytes()
+    for chunk in chunks:
+        bytes_data += chunk
+        a = bytes_data.find(b"\xff\xd8")
+        b = bytes_data.find(b"\xff\xd9")
+        if a != -1 and b != -1:
+            frames.append(bytes_data[a : b + 2])
+            bytes_data = bytes_data[b + 2 :]
+    return frames
+
+
+def demuxer_split(chunks):
+    return list(MJPEGDemuxer(b"frame").iter_frames(chunks))
+
+
+def with_exif_thumbnail(jpeg, thumbnail):
+    """Chèn segment APP1 (Exif) chứa thumbnail JPEG ngay sau SOI"""
+    payload = b"Exif\x00\x00" + thumbnail
+    return jpeg[:2] + b"\xff\xe1" + (len(payload) + 2).to_bytes(2, "big") + payload + jpeg[2:]
+
+
+def make_stream(count, width, height, content_length, rng):
+    """
+    Returns:
+        (bytes stream multipart, list JPEG gốc)
+    """
+    base = rng.integers(0, 255, (height // 8, width // 8, 3), dtype=np.uint8)
+    thumbnail = cv2.imencode(".jpg", cv2.resize(base, (64, 48)))[1].tobytes()
+    jpegs = []
+    for i in range(count):
+        frame = cv2.resize(np.roll(base, i, axis=1), (width, height), interpolation=cv2.INTER_LINEAR)
+        jpeg = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, 80])[1].tobytes()
+        jpegs.append(with_exif_thumbnail(jpeg, thumbnail) if i % 4 == 0 else jpeg)
+
+    parts = []
+    for jpeg in jpegs:
+        header = b"--frame\r\nContent-Type: image/jpeg\r\n"
+        if content_length:
+            header += b"Content-Length: " + str(len(jpeg)).encode() + b"\r\n"
+        parts.append(header + b"\r\n" + jpeg + b"\r\n")
+    return b"".join(parts) + b"--frame\r\n", jpegs
+
+
+def measure(split, data, chunk_size, iterations):
+    """
+    Returns:
+        (MB/s, frames tách được)
+    """
+    chunks = [data[i : i + chunk_size] for i in range(0, len(data), chunk_size)]
+    frames = split(chunks)
+    start = time.perf_counter()
+    for _ in range(iterations):
+        split(chunks)
+    elapsed = (time.perf_counter() - start) / iterations
+    return len(data) / elapsed / 1e6, frames
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark tách frame MJPEG (trước / sau), đơn vị MB/s")
+    parser.add_argument("--width", type=int, default=640)
+    parser.add_argument("--height", type=int, default=480)
+    parser.add_argument("--frames", type=int, default=60, help="Số frame trong stream giả lập")
+    parser.add_argument("--iterations", type=int, default=5, help="Số lần lặp mỗi phép đo")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    print(f"[INFO] {args.frames} frames {args.width}x{args.height}, 1/4 frame có thumbnail EXIF")
+    print()
+    print(f"{'Stream':<16} {'Chunk':>6} {'Before MB/s':>12} {'After MB/s':>12} {'Speedup':>9} {'Before OK':>10} {'After OK':>9}")
+    print("-" * 80)
+
+    for content_length in (False, True):
+        data, jpegs = make_stream(args.frames, args.width, args.height, content_length, rng)
+        name = "Content-Length" if content_length else "boundary only"
+        for chunk_size in CHUNK_SIZES:
+            before, legacy_frames = measure(legacy_split, data, chunk_size, args.iterations)
+            after, frames = measure(demuxer_split, data, chunk_size, args.iterations)
+            # Số frame gốc được tách ra nguyên vẹn
+            legacy_ok = len(set(jpegs) & set(legacy_frames))
+            ok = len(set(jpegs) & set(frames))
+            print(
+                f"{name:<16} {chunk_size // 1024:>5}K {before:>12.1f} {after:>12.1f} {after / before:>8.2f}x "
+                f"{legacy_ok:>5}/{len(jpegs):<4} {ok:>4}/{len(jpegs)}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+Benchmark - Chi phí render overlay mỗi frame: cách cũ (copy frame + addWeighted cả frame) so với OverlayRenderer
+
+Ví dụ:
+  python benchmarks/bench_overlay.py
+  python benchmarks/bench_overlay.py --boxes 5 --iterations 500
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.detections import TRACK_DTYPE  # noqa: E402
+from utils.overlay import OverlayRenderer  # noqa: E402
+
+NAMES = {1: "sleepy_eye", 2: "yawn", 3: "look_away", 4: "phone"}
+COLORS = {"sleepy_eye": (0, 0, 255), "yawn": (0, 140, 255), "look_away": (0, 255, 255), "phone": (255, 0, 255)}
+RESOLUTIONS = {"640x480": (480, 640), "1080p": (1080, 1920)}
+
+
+def color_for_class(class_name):
+    return COLORS.get(class_name, (255, 255, 255))
+
+
+def stats_lines(frame_index):
+    return [
+        (f"FPS: {25 + frame_index % 5:.1f}", (0, 255, 0)),
+        ("Device: CPU (No GPU)", (0, 255, 255)),
+        ("Objects: 3", (255, 255, 255)),
+        ("Detect: 5.0/s (1/6 frames)", (255, 200, 0)),
+    ]
+
+
+def legacy_render(frame, detections, frame_index):
+    """Cách cũ: frame.copy() khi vẽ box, thêm một frame.copy() + addWeighted cả frame cho stats panel"""
+    annotated = frame.copy()
+    for x1, y1, x2, y2, conf, class_id, track_id in detections.tolist():
+        class_name = NAMES[class_id]
+        color = color_for_class(class_name)
+        cv2.rectangle(annotated, (x1, y1), (x2, y2), color, 1)
+        label = f"#{track_id} {class_name}: {conf:.2f}"
+        label_size, _ = cv2.getTextSize(label, cv2.FONT_HERSHEY_SIMPLEX, 0.5, 1)
+        cv2.rectangle(annotated, (x1, y1 - label_size[1] - 8), (x1 + label_size[0], y1), color, -1)
+        text_color = (0, 0, 0) if class_name == "look_away" else (255, 255, 255)
+        cv2.putText(annotated, label, (x1, y1 - 5), cv2.FONT_HERSHEY_SIMPLEX, 0.5, text_color, 1)
+
+    overlay = annotated.copy()
+    lines = stats_lines(frame_index)
+    cv2.rectangle(overlay, (10, 10), (400, 10 + 30 * len(lines) + 20), (0, 0, 0), -1)
+    cv2.addWeighted(overlay, 0.6, annotated, 0.4, 0, annotated)
+    y_offset = 40
+    for text, color in lines:
+        cv2.putText(annotated, text, (20, y_offset), cv2.FONT_HERSHEY_SIMPLEX, 0.6, color, 2)
+        y_offset += 30
+    return annotated
+
+
+def make_detections(count, height, width, rng):
+    """Sinh count track ngẫu nhiên trong frame"""
+    tracked = np.empty(count, dtype=TRACK_DTYPE)
+    x1 = rng.integers(0, width - 200, count)
+    y1 = rng.integers(40, height - 200, count)
+    tracked["x1"], tracked["y1"] = x1, y1
+    tracked["x2"], tracked["y2"] = x1 + rng.integers(50, 200, count), y1 + rng.integers(50, 200, count)
+    tracked["conf"] = rng.uniform(0.5, 1.0, count)
+    tracked["class_id"] = rng.integers(1, 5, count)
+    tracked["track_id"] = np.arange(1, count + 1)
+    return tracked
+
+
+def benchmark(render, frames, detections, iterations):
+    """
+    Returns:
+        ms mỗi frame
+    """
+    for i in range(10):
+        render(frames[i % len(frames)], detections, i)
+    start = time.perf_counter()
+    for i in range(iterations):
+        render(frames[i % len(frames)], detections, i)
+    return (time.perf_counter() - start) / iterations * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark chi phí render overlay mỗi frame (trước / sau)")
+    parser.add_argument("--boxes", type=int, default=3, help="Số box mỗi frame")
+    parser.add_argument("--iterations", type=int, default=300, help="Số frame mỗi phép đo")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    print(f"[INFO] {args.boxes} boxes/frame, {args.iterations} frames")
+    print()
+    print(f"{'Resolution':<12} {'Before (ms)':>12} {'After (ms)':>12} {'Speedup':>10}")
+    print("-" * 50)
+
+    for name, (height, width) in RESOLUTIONS.items():
+        frames = [rng.integers(0, 255, (height, width, 3), dtype=np.uint8) for _ in range(4)]
+        detections = make_detections(args.boxes, height, width, rng)
+        renderer = OverlayRenderer(color_for_class)
+
+        def render(frame, dets, frame_index):
+            canvas = renderer.prepare(frame)
+            renderer.draw_boxes(canvas, dets, NAMES)
+            return renderer.draw_panel(canvas, stats_lines(frame_index))
+
+        before = benchmark(legacy_render, frames, detections, args.iterations)
+        after = benchmark(render, frames, detections, args.iterations)
+        print(f"{name:<12} {before:>12.3f} {after:>12.3f} {before / after:>9.2f}x")
+
+
+if __name__ == "__main__":
+    main()
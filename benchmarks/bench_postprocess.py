@@ -0,0 +1,184 @@
+"""
+Benchmark - Thời gian hậu xử lý detection mỗi frame: cách cũ (lặp từng box) so với mảng NumPy gọn
+
+Đo hai đường:
+- PyTorch: ultralytics Results -> detections (cũ: box.xyxy[0] / box.conf[0] / box.cls[0] từng box,
+  tra names và lọc "natural" sau đó; mới: một lần boxes.data -> structured array)
+- Runtime (ONNX / OpenVINO): output thô (1, 4 + nc, N) -> decode + NMS -> detections
+
+Ví dụ:
+  python benchmarks/bench_postprocess.py
+  python benchmarks/bench_postprocess.py --boxes 50 --iterations 2000
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from inference_backends import letterbox, postprocess  # noqa: E402
+from utils.detections import from_ultralytics  # noqa: E402
+
+NAMES = {0: "natural", 1: "sleepy_eye", 2: "yawn", 3: "look_away", 4: "phone"}
+
+
+def legacy_parse_result(result, names):
+    """Cách cũ: lặp từng box, tạo tuple Python và lọc "natural" sau khi predict"""
+    detections = []
+    for box in result.boxes:
+        x1, y1, x2, y2 = map(int, box.xyxy[0])
+        conf = float(box.conf[0])
+        cls_id = int(box.cls[0])
+        class_name = names[cls_id]
+        if class_name == "natural":
+            continue
+        detections.append((x1, y1, x2, y2, conf, class_name))
+    return detections
+
+
+def legacy_runtime_postprocess(output, transforms, frame_shapes, conf_threshold, names, iou_threshold=0.7, max_det=300):
+    """Cách cũ của RuntimeBackend.postprocess + lọc class theo tên từng detection"""
+    results = []
+    for pred, (gain, (pad_x, pad_y)), (h, w) in zip(output, transforms, frame_shapes):
+        pred = pred.T
+        class_scores = pred[:, 4:]
+        class_ids = class_scores.argmax(axis=1)
+        scores = class_scores[np.arange(len(class_ids)), class_ids]
+
+        keep = scores >= conf_threshold
+        if not keep.any():
+            results.append([])
+            continue
+
+        boxes = pred[keep, :4]
+        scores = scores[keep]
+        class_ids = class_ids[keep]
+
+        xywh = np.empty_like(boxes)
+        xywh[:, 0] = (boxes[:, 0] - boxes[:, 2] / 2 - pad_x) / gain
+        xywh[:, 1] = (boxes[:, 1] - boxes[:, 3] / 2 - pad_y) / gain
+        xywh[:, 2] = boxes[:, 2] / gain
+        xywh[:, 3] = boxes[:, 3] / gain
+
+        indices = cv2.dnn.NMSBoxesBatched(
+            xywh.tolist(), scores.tolist(), class_ids.tolist(), conf_threshold, iou_threshold
+        )
+        indices = np.asarray(indices, dtype=np.int64).reshape(-1)[:max_det]
+
+        detections = []
+        for i in indices:
+            x, y, bw, bh = xywh[i]
+            x1 = int(min(max(x, 0), w))
+            y1 = int(min(max(y, 0), h))
+            x2 = int(min(max(x + bw, 0), w))
+            y2 = int(min(max(y + bh, 0), h))
+            class_name = names.get(int(class_ids[i]))
+            if class_name == "natural":
+                continue
+            detections.append((x1, y1, x2, y2, float(scores[i]), class_name))
+        results.append(detections)
+    return results
+
+
+def timeit(fn, iterations):
+    """
+    Returns:
+        ms mỗi lần gọi
+    """
+    for _ in range(min(20, iterations)):
+        fn()
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - start) / iterations * 1000
+
+
+def make_boxes(count, width, height, rng):
+    """Sinh (count, 6) box ngẫu nhiên: x1, y1, x2, y2, conf, cls"""
+    xy = rng.uniform(0, [width - 100, height - 100], size=(count, 2))
+    wh = rng.uniform(20, 100, size=(count, 2))
+    conf = rng.uniform(0.5, 1.0, size=(count, 1))
+    cls = rng.integers(0, len(NAMES), size=(count, 1))
+    return np.hstack([xy, xy + wh, conf, cls]).astype(np.float32)
+
+
+def bench_pytorch(boxes, frame, iterations):
+    """So sánh hậu xử lý ultralytics Results; trả None nếu thiếu ultralytics"""
+    try:
+        import torch
+        from ultralytics.engine.results import Results
+    except ImportError as e:
+        print(f"   pytorch: bỏ qua ({e})")
+        return None
+
+    result = Results(frame, path="bench.jpg", names=NAMES, boxes=torch.from_numpy(boxes))
+    # Cách mới lọc class ngay trong predict, nên kết quả đầu vào đã không còn "natural"
+    filtered = Results(frame, path="bench.jpg", names=NAMES, boxes=torch.from_numpy(boxes[boxes[:, 5] != 0]))
+
+    before = timeit(lambda: legacy_parse_result(result, NAMES), iterations)
+    after = timeit(lambda: from_ultralytics(filtered), iterations)
+    return before, after
+
+
+def bench_runtime(boxes, frame, iterations, imgsz, num_anchors):
+    """So sánh decode + NMS + tạo detections từ output thô của runtime"""
+    _, gain, pad = letterbox(frame, imgsz)
+    transforms = [(gain, pad)]
+    shapes = [frame.shape[:2]]
+
+    # Output (1, 4 + nc, N): phần lớn anchor có score thấp, một số anchor chứa các box đã sinh
+    rng = np.random.default_rng(1)
+    output = np.zeros((1, 4 + len(NAMES), num_anchors), dtype=np.float32)
+    output[0, :4] = rng.uniform(0, imgsz, size=(4, num_anchors))
+    output[0, 4:] = rng.uniform(0, 0.3, size=(len(NAMES), num_anchors))
+    for k, (x1, y1, x2, y2, conf, cls) in enumerate(boxes):
+        output[0, :4, k] = [
+            (x1 + x2) / 2 * gain + pad[0],
+            (y1 + y2) / 2 * gain + pad[1],
+            (x2 - x1) * gain,
+            (y2 - y1) * gain,
+        ]
+        output[0, 4 + int(cls), k] = conf
+
+    classes = [cls_id for cls_id, name in NAMES.items() if name != "natural"]
+    before = timeit(
+        lambda: legacy_runtime_postprocess(output, transforms, shapes, 0.5, NAMES), iterations
+    )
+    after = timeit(lambda: postprocess(output, transforms, shapes, 0.5, classes=classes), iterations)
+    return before, after
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark hậu xử lý detection mỗi frame (trước / sau)")
+    parser.add_argument("--boxes", type=int, default=10, help="Số box mỗi frame")
+    parser.add_argument("--iterations", type=int, default=1000, help="Số lần lặp mỗi phép đo")
+    parser.add_argument("--imgsz", type=int, default=640, help="Kích thước input của runtime")
+    parser.add_argument("--anchors", type=int, default=8400, help="Số anchor trong output thô")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    frame = np.zeros((480, 640, 3), dtype=np.uint8)
+    boxes = make_boxes(args.boxes, frame.shape[1], frame.shape[0], rng)
+
+    print(f"[INFO] {args.boxes} boxes/frame, {args.iterations} iterations")
+    print()
+    print(f"{'Path':<10} {'Before (ms)':>12} {'After (ms)':>12} {'Speedup':>10}")
+    print("-" * 48)
+
+    for name, result in (
+        ("pytorch", bench_pytorch(boxes, frame, args.iterations)),
+        ("runtime", bench_runtime(boxes, frame, args.iterations, args.imgsz, args.anchors)),
+    ):
+        if result is None:
+            continue
+        before, after = result
+        print(f"{name:<10} {before:>12.4f} {after:>12.4f} {before / after:>9.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Benchmark - Chi phí chuyển một frame từ camera_stream_server sang YOLO processor cùng máy:
+JPEG (encode phía camera + decode phía processor, chưa tính HTTP loopback) so với ShmRing
+(ghi frame thô vào shared memory + copy một lần khi đọc)
+
+Ví dụ:
+  python benchmarks/bench_shm_transport.py
+  python benchmarks/bench_shm_transport.py --width 1280 --height 720
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from jetson_nano.shm_ring import ShmRing  # noqa: E402
+
+
+def make_frames(count, width, height, rng):
+    base = rng.integers(0, 255, (height // 8, width // 8, 3), dtype=np.uint8)
+    return [cv2.resize(np.roll(base, i, axis=1), (width, height)) for i in range(count)]
+
+
+def jpeg_roundtrip(frames, quality):
+    for frame in frames:
+        jpeg = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, quality])[1].tobytes()
+        cv2.imdecode(np.frombuffer(jpeg, dtype=np.uint8), cv2.IMREAD_COLOR)
+
+
+def shm_roundtrip(frames, writer, reader):
+    for frame in frames:
+        seq = writer.write(frame, shape=frame.shape)
+        reader.read_frame(seq)
+
+
+def measure(fn, frames, iterations, *args):
+    """
+    Returns:
+        ms mỗi frame
+    """
+    fn(frames[:2], *args)
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn(frames, *args)
+    return (time.perf_counter() - start) / iterations / len(frames) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark JPEG encode + decode so với ShmRing, đơn vị ms/frame")
+    parser.add_argument("--width", type=int, default=640)
+    parser.add_argument("--height", type=int, default=480)
+    parser.add_argument("--frames", type=int, default=30)
+    parser.add_argument("--iterations", type=int, default=5)
+    parser.add_argument("--quality", type=int, default=85, help="Chất lượng JPEG của CameraBroadcaster")
+    args = parser.parse_args()
+
+    frames = make_frames(args.frames, args.width, args.height, np.random.default_rng(0))
+    writer = ShmRing(slots=4, slot_size=frames[0].nbytes, create=True)
+    reader = ShmRing(writer.name, shared_tracker=True)
+    try:
+        jpeg_ms = measure(jpeg_roundtrip, frames, args.iterations, args.quality)
+        shm_ms = measure(shm_roundtrip, frames, args.iterations, writer, reader)
+    finally:
+        reader.close()
+        writer.close()
+
+    print(f"[INFO] {args.frames} frames {args.width}x{args.height}")
+    print()
+    print(f"{'Transport':<22} {'ms/frame':>10} {'Max FPS':>10}")
+    print("-" * 44)
+    print(f"{'JPEG encode+decode':<22} {jpeg_ms:>10.3f} {1000 / jpeg_ms:>10.0f}")
+    print(f"{'ShmRing write+read':<22} {shm_ms:>10.3f} {1000 / shm_ms:>10.0f}")
+    print(f"Speedup: {jpeg_ms / shm_ms:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -21,3 +21,59 @@ JSON_SORT_KEYS = False
 
 # Camera Server (mặc định)
 DEFAULT_CAMERA_SERVER = "http://localhost:5001"
+
+# YOLO Inference Engine (dùng chung cho tất cả stream)
+YOLO_MODEL_PATH = os.environ.get("YOLO_MODEL_PATH", "./models/yolo_based/customized_yolo11s.pt")
+YOLO_CONF_THRESHOLD = float(os.environ.get("YOLO_CONF_THRESHOLD", "0.5"))
+YOLO_MAX_BATCH_SIZE = int(os.environ.get("YOLO_MAX_BATCH_SIZE", "8"))  # Số frame tối đa mỗi batch
+YOLO_MAX_WAIT_MS = float(os.environ.get("YOLO_MAX_WAIT_MS", "15"))  # Thời gian chờ gom batch (ms)
+
+# Adaptive frame skip: tự chọn tần suất detect theo latency inference đo được
+YOLO_ADAPTIVE_SKIP = os.environ.get("YOLO_ADAPTIVE_SKIP", "1") == "1"
+YOLO_TARGET_DETECTION_FPS = float(os.environ.get("YOLO_TARGET_DETECTION_FPS", "5"))  # Số lần detect/giây mỗi stream
+YOLO_CPU_BUDGET = float(os.environ.get("YOLO_CPU_BUDGET", "0.8"))  # Tỉ lệ thời gian tối đa engine bận inference (0-1)
+
+# Backend inference: "pytorch", "onnx" hoặc "openvino" (export một lần, cache theo hash weights + imgsz)
+YOLO_BACKEND = os.environ.get("YOLO_BACKEND", "pytorch")
+YOLO_IMGSZ = int(os.environ.get("YOLO_IMGSZ", "640"))
+YOLO_NUM_THREADS = int(os.environ.get("YOLO_NUM_THREADS", "0"))  # 0 = để runtime tự chọn
+YOLO_EXPORT_CACHE_DIR = os.environ.get("YOLO_EXPORT_CACHE_DIR", "./models/cache")
+YOLO_PRECISION = os.environ.get("YOLO_PRECISION", "fp32")  # "int8" cần chạy tools/quantize_model.py trước
+
+# Motion gate: bỏ qua inference khi khung hình không đổi (so sánh ảnh xám thu nhỏ)
+YOLO_MOTION_GATE = os.environ.get("YOLO_MOTION_GATE", "1") == "1"
+YOLO_MOTION_THRESHOLD = float(os.environ.get("YOLO_MOTION_THRESHOLD", "0.02"))  # Tỉ lệ pixel thay đổi tối thiểu
+YOLO_MOTION_PIXEL_DELTA = int(os.environ.get("YOLO_MOTION_PIXEL_DELTA", "12"))  # Chênh mức xám để tính là thay đổi
+YOLO_MOTION_MAX_STALENESS = float(os.environ.get("YOLO_MOTION_MAX_STALENESS", "2.0"))  # Giây, buộc detect lại
+
+# Tracker giữa các lần detect: box bám theo object trên mọi frame, cho phép giảm tần suất chạy YOLO
+YOLO_TRACKING = os.environ.get("YOLO_TRACKING", "1") == "1"
+YOLO_TRACK_IOU_THRESHOLD = float(os.environ.get("YOLO_TRACK_IOU_THRESHOLD", "0.3"))  # IoU tối thiểu để ghép
+YOLO_TRACK_MAX_AGE = float(os.environ.get("YOLO_TRACK_MAX_AGE", "1.5"))  # Giây giữ track (chỉ để ghép lại) khi không còn detect
+
+# Source MJPEG (http://.../video_feed/<id>): tự tách multipart, forward JPEG gốc cho viewer passthrough,
+# chỉ decode frame được chọn để inference / vẽ overlay
+YOLO_MJPEG_PASSTHROUGH = os.environ.get("YOLO_MJPEG_PASSTHROUGH", "1") == "1"
+
+# Camera server cùng máy (http://localhost:<port>/video_feed/<id>): đọc frame thô từ shared memory nếu
+# camera server đang publish (CAMERA_SHM=1), bỏ encode / decode JPEG mỗi frame. URL shm://camera/<id> luôn dùng shm
+YOLO_LOCAL_SHM = os.environ.get("YOLO_LOCAL_SHM", "1") == "1"
+
+# Vòng đời processor: giới hạn số stream đồng thời (0 = không giới hạn, vượt quá trả 503),
+# tự dừng processor không còn viewer sau YOLO_IDLE_TIMEOUT giây (0 = không tự dừng)
+YOLO_MAX_STREAMS = int(os.environ.get("YOLO_MAX_STREAMS", "0"))
+YOLO_IDLE_TIMEOUT = float(os.environ.get("YOLO_IDLE_TIMEOUT", "30"))
+
+# Chạy processor trong worker process (vượt GIL): "thread" (mặc định, mọi stream trong process web)
+# hoặc "process" (mỗi worker giữ YOLO_STREAMS_PER_WORKER stream, JPEG trả về qua shared memory)
+YOLO_WORKER_MODE = os.environ.get("YOLO_WORKER_MODE", "thread")
+YOLO_MAX_WORKERS = int(os.environ.get("YOLO_MAX_WORKERS", "0"))  # 0 = số CPU
+YOLO_STREAMS_PER_WORKER = int(os.environ.get("YOLO_STREAMS_PER_WORKER", "1"))
+YOLO_WORKER_START_METHOD = os.environ.get("YOLO_WORKER_START_METHOD", "spawn")
+YOLO_WORKER_START_TIMEOUT = float(os.environ.get("YOLO_WORKER_START_TIMEOUT", "120"))  # Giây, gồm thời gian load model
+YOLO_SHM_SLOTS = int(os.environ.get("YOLO_SHM_SLOTS", "4"))
+YOLO_SHM_SLOT_SIZE = int(os.environ.get("YOLO_SHM_SLOT_SIZE", str(2 * 1024 * 1024)))  # Byte, JPEG tối đa mỗi slot
+
+# Trace span theo frame / stage (xuất Chrome trace qua GET /api/yolo/trace), bật / tắt lúc chạy qua API
+YOLO_TRACE = os.environ.get("YOLO_TRACE", "0") == "1"
+YOLO_TRACE_CAPACITY = int(os.environ.get("YOLO_TRACE_CAPACITY", "50000"))  # Số span tối đa giữ trong RAM
@@ -0,0 +1,413 @@
+"""
+Inference Backends - Runtime tối ưu cho CPU (ONNX Runtime / OpenVINO)
+Chức năng:
+- Export model YOLO (.pt) sang ONNX / OpenVINO IR một lần, cache trên đĩa
+  theo hash của weights + kích thước input
+- Chạy inference qua runtime với số thread intra-op có thể cấu hình
+- Tiền xử lý (letterbox) và hậu xử lý (decode + NMS) bằng NumPy / OpenCV
+- Quantize tĩnh INT8 (ONNX Runtime) từ ảnh calibration
+"""
+
+import ast
+import hashlib
+import os
+import shutil
+from abc import ABC, abstractmethod
+
+import cv2
+import numpy as np
+from loguru import logger
+
+from utils.detections import empty_detections, make_detections
+
+SUPPORTED_BACKENDS = ("pytorch", "onnx", "openvino")
+SUPPORTED_PRECISIONS = ("fp32", "int8")
+INT8_SUFFIX = "-int8"
+
+
+def compute_weights_hash(model_path, length=16):
+    """
+    Hash nội dung file weights (để cache không bị dùng nhầm khi weights thay đổi)
+
+    Args:
+        model_path: Đường dẫn file weights
+        length: Số ký tự hex giữ lại
+
+    Returns:
+        Chuỗi hex
+    """
+    digest = hashlib.sha256()
+    with open(model_path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()[:length]
+
+
+def get_export_path(model_path, backend, imgsz, cache_dir, suffix=""):
+    """
+    Đường dẫn artifact đã export trong cache
+
+    Args:
+        model_path: Đường dẫn weights gốc (.pt)
+        backend: "onnx" hoặc "openvino"
+        imgsz: Kích thước input
+        cache_dir: Thư mục cache
+        suffix: Hậu tố thêm vào tên (ví dụ "-int8")
+
+    Returns:
+        Đường dẫn file .onnx hoặc thư mục OpenVINO IR
+    """
+    stem = os.path.splitext(os.path.basename(model_path))[0]
+    key = f"{stem}-{compute_weights_hash(model_path)}-{imgsz}{suffix}"
+    if backend == "onnx":
+        return os.path.join(cache_dir, f"{key}.onnx")
+    if backend == "openvino":
+        return os.path.join(cache_dir, f"{key}_openvino_model")
+    raise ValueError(f"Backend không hỗ trợ export: {backend}")
+
+
+def export_model(model_path, backend, imgsz=640, cache_dir="./models/cache"):
+    """
+    Export model sang backend (nếu chưa có trong cache)
+
+    Args:
+        model_path: Đường dẫn weights gốc (.pt)
+        backend: "onnx" hoặc "openvino"
+        imgsz: Kích thước input
+        cache_dir: Thư mục cache
+
+    Returns:
+        Đường dẫn artifact trong cache
+    """
+    target = get_export_path(model_path, backend, imgsz, cache_dir)
+    if os.path.exists(target):
+        logger.info(f"Using cached {backend} export: {target}")
+        return target
+
+    from ultralytics import YOLO
+
+    logger.info(f"Exporting {model_path} to {backend} (imgsz={imgsz}), chỉ chạy lần đầu...")
+    exported = YOLO(model_path).export(format=backend, imgsz=imgsz, dynamic=True, half=False, verbose=False)
+
+    os.makedirs(cache_dir, exist_ok=True)
+    shutil.move(str(exported), target)
+    logger.success(f"✓ Exported {backend} model cached at {target}")
+    return target
+
+
+def letterbox(frame, imgsz, color=(114, 114, 114)):
+    """
+    Resize giữ tỉ lệ và pad về imgsz x imgsz (giống ultralytics LetterBox)
+
+    Returns:
+        (ảnh đã pad, gain, (pad_x, pad_y))
+    """
+    h, w = frame.shape[:2]
+    gain = min(imgsz / h, imgsz / w)
+    new_w, new_h = int(round(w * gain)), int(round(h * gain))
+    pad_x, pad_y = (imgsz - new_w) / 2, (imgsz - new_h) / 2
+
+    if (w, h) != (new_w, new_h):
+        frame = cv2.resize(frame, (new_w, new_h), interpolation=cv2.INTER_LINEAR)
+
+    top, bottom = int(round(pad_y - 0.1)), int(round(pad_y + 0.1))
+    left, right = int(round(pad_x - 0.1)), int(round(pad_x + 0.1))
+    padded = cv2.copyMakeBorder(frame, top, bottom, left, right, cv2.BORDER_CONSTANT, value=color)
+    return padded, gain, (left, top)
+
+
+def preprocess(frames, imgsz):
+    """
+    Letterbox + BGR->RGB + HWC->CHW + chuẩn hóa về [0, 1]
+
+    Args:
+        frames: List frame BGR
+        imgsz: Kích thước input
+
+    Returns:
+        (blob (B, 3, imgsz, imgsz) float32, list of (gain, pad))
+    """
+    blob = np.empty((len(frames), 3, imgsz, imgsz), dtype=np.float32)
+    transforms = []
+    for i, frame in enumerate(frames):
+        padded, gain, pad = letterbox(frame, imgsz)
+        blob[i] = padded[:, :, ::-1].transpose(2, 0, 1)
+        transforms.append((gain, pad))
+    blob *= 1.0 / 255.0
+    return blob, transforms
+
+
+def postprocess(output, transforms, frame_shapes, conf_threshold, iou_threshold=0.7, max_det=300, classes=None):
+    """
+    Decode output YOLO (B, 4 + nc, N) + NMS theo class, scale box về ảnh gốc
+
+    Args:
+        output: Output thô của model
+        transforms: List (gain, pad) từ preprocess
+        frame_shapes: List (h, w) của frame gốc
+        conf_threshold: Ngưỡng confidence
+        iou_threshold: Ngưỡng IoU của NMS
+        max_det: Số detection tối đa mỗi frame
+        classes: Danh sách class id được giữ lại (None = tất cả), lọc trước NMS
+
+    Returns:
+        List (theo frame) mảng detection (DETECTION_DTYPE)
+    """
+    results = []
+    for pred, (gain, (pad_x, pad_y)), (h, w) in zip(output, transforms, frame_shapes):
+        pred = pred.T  # (N, 4 + nc)
+        class_scores = pred[:, 4:]
+        class_ids = class_scores.argmax(axis=1)
+        scores = class_scores[np.arange(len(class_ids)), class_ids]
+
+        keep = scores >= conf_threshold
+        if classes is not None:
+            allowed = np.zeros(class_scores.shape[1], dtype=bool)
+            allowed[classes] = True
+            keep &= allowed[class_ids]
+        if not keep.any():
+            results.append(empty_detections())
+            continue
+
+        boxes = pred[keep, :4]
+        scores = scores[keep]
+        class_ids = class_ids[keep]
+
+        # cx, cy, w, h -> x, y, w, h (cho NMS) theo tọa độ ảnh gốc
+        xywh = np.empty_like(boxes)
+        xywh[:, 0] = (boxes[:, 0] - boxes[:, 2] / 2 - pad_x) / gain
+        xywh[:, 1] = (boxes[:, 1] - boxes[:, 3] / 2 - pad_y) / gain
+        xywh[:, 2] = boxes[:, 2] / gain
+        xywh[:, 3] = boxes[:, 3] / gain
+
+        indices = cv2.dnn.NMSBoxesBatched(
+            xywh.tolist(), scores.tolist(), class_ids.tolist(), conf_threshold, iou_threshold
+        )
+        indices = np.asarray(indices, dtype=np.int64).reshape(-1)[:max_det]
+
+        selected = xywh[indices]
+        xyxy = np.empty_like(selected)
+        xyxy[:, 0] = np.clip(selected[:, 0], 0, w)
+        xyxy[:, 1] = np.clip(selected[:, 1], 0, h)
+        xyxy[:, 2] = np.clip(selected[:, 0] + selected[:, 2], 0, w)
+        xyxy[:, 3] = np.clip(selected[:, 1] + selected[:, 3], 0, h)
+        results.append(make_detections(xyxy, scores[indices], class_ids[indices]))
+
+    return results
+
+
+class RuntimeBackend(ABC):
+    """Base class: tiền xử lý / hậu xử lý dùng chung cho các runtime không phải PyTorch"""
+
+    name = "runtime"
+
+    def __init__(self, imgsz=640, iou_threshold=0.7, max_det=300):
+        self.imgsz = imgsz
+        self.iou_threshold = iou_threshold
+        self.max_det = max_det
+        self.names = {}
+
+    @abstractmethod
+    def _run(self, blob):
+        """Chạy model trên blob (B, 3, imgsz, imgsz) float32, trả output (B, 4 + nc, N)"""
+
+    def preprocess(self, frames):
+        """
+        Returns:
+            (blob, list of (gain, pad)) (xem preprocess)
+        """
+        return preprocess(frames, self.imgsz)
+
+    def postprocess(self, output, transforms, frame_shapes, conf_threshold, classes=None):
+        """
+        Returns:
+            List (theo frame) mảng detection (xem postprocess)
+        """
+        return postprocess(
+            output, transforms, frame_shapes, conf_threshold, self.iou_threshold, self.max_det, classes
+        )
+
+    def predict(self, frames, conf_threshold=0.25, classes=None):
+        """
+        Chạy inference cho một batch frame
+
+        Args:
+            frames: List frame BGR
+            conf_threshold: Ngưỡng confidence
+            classes: Danh sách class id được giữ lại (None = tất cả)
+
+        Returns:
+            List (theo frame) mảng detection (DETECTION_DTYPE)
+        """
+        blob, transforms = self.preprocess(frames)
+        output = self._run(blob)
+        shapes = [frame.shape[:2] for frame in frames]
+        return self.postprocess(output, transforms, shapes, conf_threshold, classes)
+
+
+class OnnxRuntimeBackend(RuntimeBackend):
+    """Chạy model ONNX qua ONNX Runtime (CPU)"""
+
+    name = "onnx"
+
+    def __init__(self, onnx_path, imgsz=640, num_threads=0, **kwargs):
+        """
+        Args:
+            onnx_path: Đường dẫn file .onnx
+            imgsz: Kích thước input
+            num_threads: Số thread intra-op (0 = mặc định của ONNX Runtime)
+        """
+        super().__init__(imgsz=imgsz, **kwargs)
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if num_threads > 0:
+            options.intra_op_num_threads = num_threads
+            options.inter_op_num_threads = 1
+
+        self.session = ort.InferenceSession(onnx_path, sess_options=options, providers=["CPUExecutionProvider"])
+        self.input_name = self.session.get_inputs()[0].name
+        self.num_threads = num_threads
+
+        # Ultralytics ghi tên class vào metadata của file ONNX
+        metadata = self.session.get_modelmeta().custom_metadata_map
+        if "names" in metadata:
+            self.names = ast.literal_eval(metadata["names"])
+
+    def _run(self, blob):
+        return self.session.run(None, {self.input_name: blob})[0]
+
+
+class OpenVINOBackend(RuntimeBackend):
+    """Chạy model OpenVINO IR (CPU)"""
+
+    name = "openvino"
+
+    def __init__(self, model_dir, imgsz=640, num_threads=0, **kwargs):
+        """
+        Args:
+            model_dir: Thư mục OpenVINO IR do ultralytics export
+            imgsz: Kích thước input
+            num_threads: Số thread inference (0 = mặc định của OpenVINO)
+        """
+        super().__init__(imgsz=imgsz, **kwargs)
+        import openvino as ov
+        import yaml
+
+        xml_path = next(
+            os.path.join(model_dir, name) for name in os.listdir(model_dir) if name.endswith(".xml")
+        )
+        config = {"PERFORMANCE_HINT": "LATENCY"}
+        if num_threads > 0:
+            config["INFERENCE_NUM_THREADS"] = num_threads
+
+        core = ov.Core()
+        self.compiled = core.compile_model(core.read_model(xml_path), "CPU", config)
+        self.num_threads = num_threads
+
+        metadata_path = os.path.join(model_dir, "metadata.yaml")
+        if os.path.exists(metadata_path):
+            with open(metadata_path, "r", encoding="utf-8") as f:
+                self.names = yaml.safe_load(f).get("names", {})
+
+    def _run(self, blob):
+        return self.compiled(blob)[0]
+
+
+def get_int8_path(model_path, imgsz=640, cache_dir="./models/cache"):
+    """Đường dẫn model INT8 (ONNX) trong cache"""
+    return get_export_path(model_path, "onnx", imgsz, cache_dir, suffix=INT8_SUFFIX)
+
+
+def quantize_int8(model_path, calibration_frames, imgsz=640, cache_dir="./models/cache", per_channel=False):
+    """
+    Quantize tĩnh model sang INT8 (QDQ, ONNX Runtime) bằng frame calibration
+
+    Args:
+        model_path: Weights gốc (.pt)
+        calibration_frames: List frame BGR mẫu (ảnh cabin thực tế)
+        imgsz: Kích thước input
+        cache_dir: Thư mục cache
+        per_channel: Quantize weights theo từng channel (chính xác hơn, chậm hơn một chút)
+
+    Returns:
+        Đường dẫn model INT8
+    """
+    import onnx
+    from onnxruntime.quantization import CalibrationDataReader, QuantFormat, QuantType, quantize_static
+
+    fp32_path = export_model(model_path, "onnx", imgsz, cache_dir)
+    int8_path = get_int8_path(model_path, imgsz, cache_dir)
+    input_name = onnx.load(fp32_path, load_external_data=False).graph.input[0].name
+
+    class FrameCalibrationReader(CalibrationDataReader):
+        """Đưa từng frame calibration (đã letterbox) vào ONNX Runtime"""
+
+        def __init__(self, frames):
+            self._frames = iter(frames)
+
+        def get_next(self):
+            frame = next(self._frames, None)
+            if frame is None:
+                return None
+            blob, _ = preprocess([frame], imgsz)
+            return {input_name: blob}
+
+    logger.info(f"Calibrating INT8 model on {len(calibration_frames)} frames...")
+    quantize_static(
+        fp32_path,
+        int8_path,
+        FrameCalibrationReader(calibration_frames),
+        quant_format=QuantFormat.QDQ,
+        activation_type=QuantType.QUInt8,
+        weight_type=QuantType.QInt8,
+        per_channel=per_channel,
+    )
+
+    # Giữ metadata (tên class) của model FP32
+    fp32_model = onnx.load(fp32_path, load_external_data=False)
+    int8_model = onnx.load(int8_path)
+    existing = {prop.key for prop in int8_model.metadata_props}
+    for prop in fp32_model.metadata_props:
+        if prop.key not in existing:
+            int8_model.metadata_props.append(prop)
+    onnx.save(int8_model, int8_path)
+
+    logger.success(f"✓ INT8 model saved at {int8_path}")
+    return int8_path
+
+
+def create_backend(backend, model_path, imgsz=640, num_threads=0, cache_dir="./models/cache", precision="fp32"):
+    """
+    Tạo runtime backend (export + cache nếu cần)
+
+    Args:
+        backend: "onnx" hoặc "openvino"
+        model_path: Weights gốc (.pt) hoặc artifact đã export
+        imgsz: Kích thước input
+        num_threads: Số thread intra-op
+        cache_dir: Thư mục cache
+        precision: "fp32" hoặc "int8" (INT8 cần chạy tools/quantize_model.py trước, chỉ hỗ trợ ONNX Runtime)
+
+    Returns:
+        RuntimeBackend instance
+    """
+    if precision not in SUPPORTED_PRECISIONS:
+        raise ValueError(f"Precision không hỗ trợ: {precision} (chọn một trong {SUPPORTED_PRECISIONS})")
+
+    if precision == "int8":
+        if backend != "onnx":
+            raise ValueError("INT8 chỉ hỗ trợ backend onnx")
+        path = model_path if model_path.endswith(".onnx") else get_int8_path(model_path, imgsz, cache_dir)
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"Chưa có model INT8 ({path}), hãy chạy tools/quantize_model.py để calibrate")
+        return OnnxRuntimeBackend(path, imgsz=imgsz, num_threads=num_threads)
+
+    if backend == "onnx":
+        path = model_path if model_path.endswith(".onnx") else export_model(model_path, "onnx", imgsz, cache_dir)
+        return OnnxRuntimeBackend(path, imgsz=imgsz, num_threads=num_threads)
+    if backend == "openvino":
+        path = model_path if os.path.isdir(model_path) else export_model(model_path, "openvino", imgsz, cache_dir)
+        return OpenVINOBackend(path, imgsz=imgsz, num_threads=num_threads)
+    raise ValueError(f"Backend không hỗ trợ: {backend} (chọn một trong {SUPPORTED_BACKENDS})")
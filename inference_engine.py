@@ -0,0 +1,370 @@
+"""
+Inference Engine - Engine YOLO dùng chung cho tất cả stream
+Chức năng:
+- Load YOLO model một lần duy nhất (không nhân bản weights theo số stream)
+- Gom frame đang chờ từ mọi processor thành một batch
+- Chạy predict theo batch (giới hạn max batch size / max wait time)
+- Trả detections về đúng stream đã gửi frame
+- Chọn backend: PyTorch hoặc runtime tối ưu cho CPU (ONNX Runtime / OpenVINO)
+"""
+
+import queue
+import threading
+import time
+
+from loguru import logger
+from ultralytics import YOLO
+import torch
+
+import config
+from inference_backends import SUPPORTED_BACKENDS, create_backend
+from utils.detections import from_ultralytics
+
+
+class InferenceRequest:
+    """Một frame đang chờ inference trong engine"""
+
+    __slots__ = ("frame", "event", "detections", "error", "submitted_at")
+
+    def __init__(self, frame):
+        self.frame = frame
+        self.event = threading.Event()
+        self.detections = None
+        self.error = None
+        self.submitted_at = time.time()
+
+    def wait(self, timeout=None):
+        """
+        Đợi kết quả inference
+
+        Args:
+            timeout: Thời gian chờ tối đa (giây), None = chờ mãi
+
+        Returns:
+            Mảng detection (DETECTION_DTYPE)
+        """
+        if not self.event.wait(timeout):
+            raise TimeoutError("Inference request timed out")
+        if self.error is not None:
+            raise self.error
+        return self.detections
+
+
+class InferenceEngine:
+    """Engine YOLO dùng chung: một model, một worker, batch inference cho nhiều stream"""
+
+    def __init__(
+        self,
+        model_path,
+        max_batch_size=8,
+        max_wait_ms=15,
+        conf_threshold=0.5,
+        backend="pytorch",
+        imgsz=640,
+        num_threads=0,
+        cache_dir="./models/cache",
+        precision="fp32",
+    ):
+        """
+        Khởi tạo inference engine
+
+        Args:
+            model_path: Đường dẫn đến model YOLO
+            max_batch_size: Số frame tối đa trong một batch
+            max_wait_ms: Thời gian tối đa (ms) chờ gom thêm frame sau frame đầu tiên
+            conf_threshold: Ngưỡng confidence
+            backend: "pytorch", "onnx" hoặc "openvino" (tự fallback về PyTorch nếu không dùng được)
+            imgsz: Kích thước input khi export / chạy runtime
+            num_threads: Số thread intra-op của runtime (0 = mặc định)
+            cache_dir: Thư mục cache model đã export
+            precision: "fp32" hoặc "int8" (INT8 cần backend onnx và model đã calibrate)
+        """
+        self.model_path = model_path
+        self.model = None  # ultralytics YOLO (chỉ dùng với backend PyTorch)
+        self.runtime = None  # RuntimeBackend (ONNX Runtime / OpenVINO)
+        self.names = {}
+        self.class_filter = None  # Class id được giữ lại khi predict (bỏ "natural")
+        self.backend = backend
+        self.imgsz = imgsz
+        self.num_threads = num_threads
+        self.cache_dir = cache_dir
+        self.precision = precision
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self.conf_threshold = conf_threshold
+
+        self._queue = queue.Queue()
+        self._worker = None
+        self._lock = threading.Lock()
+        self.is_running = False
+
+        # Thống kê batch
+        self.batch_count = 0
+        self.frame_total = 0
+        self.last_batch_size = 0
+        self.last_batch_time = 0.0  # Thời gian predict của batch gần nhất (giây)
+        self.frame_time = 0.0  # EMA thời gian inference trên mỗi frame (giây)
+
+        # Các stream đang dùng engine (để chia ngân sách CPU)
+        self._streams = set()
+
+        # GPU info
+        self.gpu_info = "CPU"
+
+        self.load_model()
+
+    def load_model(self):
+        """Load model (chỉ một lần cho toàn bộ engine), fallback về PyTorch nếu runtime không dùng được"""
+        if self.backend != "pytorch":
+            try:
+                if self.backend not in SUPPORTED_BACKENDS:
+                    raise ValueError(f"Backend không hỗ trợ: {self.backend}")
+                self.runtime = self._create_runtime()
+                self.names = self.runtime.names
+                self._init_class_filter()
+                threads = self.num_threads or "auto"
+                self.gpu_info = f"CPU ({self.runtime.name} {self.precision}, {threads} threads)"
+                logger.success(
+                    f"✓ YOLO model loaded with {self.runtime.name} backend ({self.precision}, {threads} threads)"
+                )
+                return
+            except Exception as e:
+                logger.warning(f"⚠ Cannot use {self.backend} backend ({e}), falling back to PyTorch")
+                self.runtime = None
+                self.backend = "pytorch"
+                self.precision = "fp32"
+
+        try:
+            logger.info(f"Loading YOLO model from {self.model_path}")
+            self.model = YOLO(self.model_path)
+            self.names = self.model.names
+            self._init_class_filter()
+
+            # Kiểm tra GPU
+            cuda_available = torch.cuda.is_available()
+            if cuda_available:
+                gpu_name = torch.cuda.get_device_name(0)
+                gpu_memory = torch.cuda.get_device_properties(0).total_memory / 1024**3  # GB
+                self.gpu_info = f"{gpu_name} ({gpu_memory:.1f}GB)"
+                logger.success(f"✓ YOLO model loaded successfully!")
+                logger.success(f"✓ GPU: {self.gpu_info}")
+                logger.success(f"✓ CUDA Version: {torch.version.cuda}")
+            else:
+                if self.num_threads > 0:
+                    torch.set_num_threads(self.num_threads)
+                self.gpu_info = "CPU (No GPU)"
+                logger.warning("⚠ GPU not available - running on CPU")
+                logger.warning("⚠ Performance will be significantly slower")
+
+        except Exception as e:
+            logger.error(f"Failed to load YOLO model: {e}")
+            raise
+
+    def _init_class_filter(self):
+        """Lọc class ngay trong predict: giữ mọi class trừ natural"""
+        keep = [cls_id for cls_id, name in self.names.items() if name != "natural"]
+        self.class_filter = keep if len(keep) < len(self.names) else None
+
+    def _create_runtime(self):
+        """Tạo runtime backend, INT8 chưa calibrate thì fallback về FP32 cùng backend"""
+        try:
+            return create_backend(
+                self.backend, self.model_path, self.imgsz, self.num_threads, self.cache_dir, self.precision
+            )
+        except FileNotFoundError as e:
+            logger.warning(f"⚠ {e} - using fp32")
+            self.precision = "fp32"
+            return create_backend(self.backend, self.model_path, self.imgsz, self.num_threads, self.cache_dir)
+
+    def start(self):
+        """Khởi động worker thread (nếu chưa chạy)"""
+        with self._lock:
+            if self.is_running:
+                return
+            self.is_running = True
+            self._worker = threading.Thread(target=self._worker_loop, daemon=True)
+            self._worker.start()
+        logger.info(
+            f"Inference engine started (max_batch_size={self.max_batch_size}, "
+            f"max_wait={self.max_wait * 1000:.0f}ms)"
+        )
+
+    def stop(self):
+        """Dừng worker thread"""
+        with self._lock:
+            self.is_running = False
+        logger.info("Inference engine stopped")
+
+    def register_stream(self, stream_id):
+        """Đăng ký stream đang dùng engine"""
+        with self._lock:
+            self._streams.add(stream_id)
+
+    def unregister_stream(self, stream_id):
+        """Hủy đăng ký stream khi dừng xử lý"""
+        with self._lock:
+            self._streams.discard(stream_id)
+
+    def active_stream_count(self):
+        """Số stream đang dùng engine"""
+        return len(self._streams)
+
+    def submit(self, frame):
+        """
+        Gửi frame vào hàng đợi inference (không block)
+
+        Args:
+            frame: Frame BGR (numpy array)
+
+        Returns:
+            InferenceRequest để đợi kết quả
+        """
+        if not self.is_running:
+            self.start()
+
+        request = InferenceRequest(frame)
+        self._queue.put(request)
+        return request
+
+    def infer(self, frame, timeout=10.0):
+        """
+        Gửi frame và đợi detections (block cho tới khi batch chứa frame chạy xong)
+
+        Args:
+            frame: Frame BGR (numpy array)
+            timeout: Thời gian chờ tối đa (giây)
+
+        Returns:
+            Mảng detection (DETECTION_DTYPE)
+        """
+        return self.submit(frame).wait(timeout)
+
+    def _collect_batch(self):
+        """Lấy frame đầu tiên rồi gom thêm cho tới khi đủ batch hoặc hết max wait"""
+        try:
+            first = self._queue.get(timeout=0.5)
+        except queue.Empty:
+            return []
+
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait
+
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining <= 0:
+                    # Hết thời gian chờ, chỉ lấy thêm những frame đã có sẵn
+                    batch.append(self._queue.get_nowait())
+                else:
+                    batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+
+        return batch
+
+    def _worker_loop(self):
+        """Loop của worker: gom batch và chạy inference"""
+        while self.is_running:
+            batch = self._collect_batch()
+            if batch:
+                self._run_batch(batch)
+
+    def _run_batch(self, batch):
+        """
+        Chạy predict cho cả batch và trả kết quả về từng request
+
+        Args:
+            batch: List of InferenceRequest
+        """
+        try:
+            start_time = time.time()
+            frames = [request.frame for request in batch]
+            if self.runtime is not None:
+                parsed = self.runtime.predict(frames, self.conf_threshold, classes=self.class_filter)
+            else:
+                results = self.model.predict(
+                    frames, conf=self.conf_threshold, imgsz=self.imgsz, classes=self.class_filter, verbose=False
+                )
+                parsed = [from_ultralytics(result) for result in results]
+            self.last_batch_time = time.time() - start_time
+
+            for request, detections in zip(batch, parsed):
+                request.detections = detections
+
+            self.batch_count += 1
+            self.frame_total += len(batch)
+            self.last_batch_size = len(batch)
+
+            # Chi phí trung bình mỗi frame (EMA) để các processor tự điều chỉnh tần suất detect
+            per_frame = self.last_batch_time / len(batch)
+            self.frame_time = per_frame if self.frame_time == 0 else 0.8 * self.frame_time + 0.2 * per_frame
+
+        except Exception as e:
+            logger.error(f"Error in batch inference: {e}")
+            for request in batch:
+                request.error = e
+        finally:
+            for request in batch:
+                # Giải phóng frame sớm, không giữ ảnh trong request
+                request.frame = None
+                request.event.set()
+
+    def get_stats(self):
+        """
+        Lấy thống kê của engine
+
+        Returns:
+            Dict thống kê batch inference
+        """
+        avg_batch = self.frame_total / self.batch_count if self.batch_count else 0.0
+        return {
+            "model_path": self.model_path,
+            "backend": self.backend,
+            "precision": self.precision,
+            "device": self.gpu_info,
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+            "batches": self.batch_count,
+            "frames": self.frame_total,
+            "avg_batch_size": avg_batch,
+            "last_batch_size": self.last_batch_size,
+            "last_batch_time_ms": self.last_batch_time * 1000,
+            "frame_time_ms": self.frame_time * 1000,
+            "active_streams": len(self._streams),
+            "pending": self._queue.qsize(),
+        }
+
+
+# Mỗi model_path chỉ có 1 engine (dùng chung cho mọi stream)
+_engine_instances = {}
+_engine_lock = threading.Lock()
+
+
+def get_engine(model_path=None):
+    """
+    Lấy hoặc tạo inference engine dùng chung cho model_path
+
+    Args:
+        model_path: Đường dẫn model YOLO (mặc định lấy từ config)
+
+    Returns:
+        InferenceEngine instance
+    """
+    model_path = model_path or config.YOLO_MODEL_PATH
+
+    with _engine_lock:
+        if model_path not in _engine_instances:
+            logger.info(f"Creating shared inference engine for model: {model_path}")
+            _engine_instances[model_path] = InferenceEngine(
+                model_path,
+                max_batch_size=config.YOLO_MAX_BATCH_SIZE,
+                max_wait_ms=config.YOLO_MAX_WAIT_MS,
+                conf_threshold=config.YOLO_CONF_THRESHOLD,
+                backend=config.YOLO_BACKEND,
+                imgsz=config.YOLO_IMGSZ,
+                num_threads=config.YOLO_NUM_THREADS,
+                cache_dir=config.YOLO_EXPORT_CACHE_DIR,
+                precision=config.YOLO_PRECISION,
+            )
+
+    return _engine_instances[model_path]
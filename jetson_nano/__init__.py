@@ -6,21 +6,44 @@ Module cho streaming camera qua HTTP với Flask
 from .camera_utils import (
     cameras,
     camera_locks,
+    broadcasters,
+    CameraBroadcaster,
     find_available_cameras,
     init_cameras,
     get_frame,
+    get_jpeg,
+    get_snapshot,
     generate_frames,
     cleanup,
 )
-from .routes import register_routes
+from .camera_discovery import discover_cameras, list_v4l2_devices
+from .frame_reader import LatestFrameReader
+from .frame_sources import JpegDirSource, SyntheticSource, VideoFileSource, parse_source_specs
+from .metrics import Histogram, MetricFamily, MetricsRegistry
+from .shm_ring import ShmCapture, ShmRing
 
 __all__ = [
     "cameras",
     "camera_locks",
+    "broadcasters",
+    "CameraBroadcaster",
     "find_available_cameras",
     "init_cameras",
     "get_frame",
+    "get_jpeg",
+    "get_snapshot",
     "generate_frames",
     "cleanup",
-    "register_routes",
+    "discover_cameras",
+    "list_v4l2_devices",
+    "LatestFrameReader",
+    "VideoFileSource",
+    "JpegDirSource",
+    "SyntheticSource",
+    "parse_source_specs",
+    "ShmRing",
+    "ShmCapture",
+    "Histogram",
+    "MetricFamily",
+    "MetricsRegistry",
 ]
@@ -0,0 +1,219 @@
+"""
+Camera Discovery - Tìm camera nhanh khi khởi động camera_stream_server
+Chức năng:
+- Linux: liệt kê thiết bị V4L2 trực tiếp (/sys/class/video4linux + VIDIOC_QUERYCAP), bỏ qua node metadata
+- Probe các ứng viên song song, mỗi probe có timeout (probe lỗi không chặn cả quá trình)
+- Giữ lại handle đã mở (đã set độ phân giải / FPS) để dùng luôn, không mở camera lần hai
+- Cache danh sách camera tìm được: lần khởi động sau chỉ probe các camera đã biết
+"""
+
+import glob
+import json
+import os
+import struct
+import sys
+import threading
+import time
+
+import cv2
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+# ioctl VIDIOC_QUERYCAP = _IOR('V', 0, struct v4l2_capability) (104 bytes)
+VIDIOC_QUERYCAP = 0x80685600
+V4L2_CAP_VIDEO_CAPTURE = 0x00000001
+V4L2_CAP_DEVICE_CAPS = 0x80000000
+_V4L2_CAPABILITY = struct.Struct("16s32s32sIII12x")
+
+DEFAULT_CACHE_FILE = os.path.join(os.path.expanduser("~"), ".cache", "live_cam", "cameras.json")
+
+
+def default_backend():
+    """Backend OpenCV theo hệ điều hành (CAP_DSHOW chỉ dùng được trên Windows)"""
+    if sys.platform.startswith("linux"):
+        return cv2.CAP_V4L2
+    if sys.platform == "win32":
+        return cv2.CAP_DSHOW
+    return cv2.CAP_ANY
+
+
+def query_v4l2_capture(device_path):
+    """
+    Đọc capabilities của một node /dev/videoN
+
+    Returns:
+        Tên card nếu node hỗ trợ video capture, None nếu không (hoặc không mở được)
+    """
+    if fcntl is None:
+        return None
+    try:
+        fd = os.open(device_path, os.O_RDWR | os.O_NONBLOCK)
+    except OSError:
+        return None
+    try:
+        buffer = bytearray(_V4L2_CAPABILITY.size)
+        fcntl.ioctl(fd, VIDIOC_QUERYCAP, buffer)
+    except OSError:
+        return None
+    finally:
+        os.close(fd)
+
+    _, card, _, _, capabilities, device_caps = _V4L2_CAPABILITY.unpack(buffer)
+    caps = device_caps if capabilities & V4L2_CAP_DEVICE_CAPS else capabilities
+    if not caps & V4L2_CAP_VIDEO_CAPTURE:
+        return None
+    return card.split(b"\0", 1)[0].decode("utf-8", errors="replace")
+
+
+def list_v4l2_devices():
+    """
+    Liệt kê node V4L2 có thể capture (Linux), không cần mở bằng OpenCV
+
+    Returns:
+        Dict index -> tên thiết bị, None nếu không phải Linux / không có sysfs
+    """
+    if not sys.platform.startswith("linux") or not os.path.isdir("/sys/class/video4linux"):
+        return None
+
+    devices = {}
+    for node in sorted(glob.glob("/sys/class/video4linux/video*")):
+        name = os.path.basename(node)
+        index = int(name[len("video") :])
+
+        card = query_v4l2_capture(f"/dev/{name}")
+        if card is None:
+            # Không đọc được capabilities: dùng sysfs (node metadata của UVC có index != 0)
+            try:
+                with open(os.path.join(node, "index")) as f:
+                    if f.read().strip() != "0":
+                        continue
+                with open(os.path.join(node, "name")) as f:
+                    card = f.read().strip()
+            except OSError:
+                continue
+        devices[index] = card
+    return devices
+
+
+def probe_camera(index, backend, width=640, height=480, fps=30):
+    """
+    Mở camera, set độ phân giải / FPS và đọc thử một frame
+
+    Returns:
+        cv2.VideoCapture đã sẵn sàng hoặc None
+    """
+    cap = cv2.VideoCapture(index, backend)
+    if not cap.isOpened():
+        cap.release()
+        return None
+
+    cap.set(cv2.CAP_PROP_FRAME_WIDTH, width)
+    cap.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+    cap.set(cv2.CAP_PROP_FPS, fps)
+
+    ret, frame = cap.read()
+    if not ret or frame is None:
+        cap.release()
+        return None
+    return cap
+
+
+def _probe_all(indices, backend, timeout, **kwargs):
+    """
+    Probe song song, bỏ các probe quá timeout (handle mở muộn sẽ tự được release)
+
+    Returns:
+        Dict index -> cv2.VideoCapture
+    """
+    results = {}
+    lock = threading.Lock()
+    state = {"closed": False}
+
+    def worker(index):
+        cap = probe_camera(index, backend, **kwargs)
+        with lock:
+            if cap is not None and state["closed"]:
+                cap.release()
+            elif cap is not None:
+                results[index] = cap
+
+    threads = [threading.Thread(target=worker, args=(i,), name=f"probe-{i}", daemon=True) for i in indices]
+    for thread in threads:
+        thread.start()
+
+    deadline = time.time() + timeout
+    for thread in threads:
+        thread.join(max(0.0, deadline - time.time()))
+
+    with lock:
+        state["closed"] = True
+        timed_out = [t.name for t in threads if t.is_alive()]
+        found = dict(results)
+
+    if timed_out:
+        print(f"[WARNING] Probe quá {timeout}s, bỏ qua: {', '.join(timed_out)}")
+    return found
+
+
+def _load_cache(cache_file):
+    try:
+        with open(cache_file) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _save_cache(cache_file, devices, found):
+    try:
+        os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+        with open(cache_file, "w") as f:
+            json.dump({"devices": devices, "cameras": sorted(found)}, f)
+    except OSError as e:
+        print(f"[WARNING] Không ghi được cache camera {cache_file}: {e}")
+
+
+def discover_cameras(max_cameras=10, timeout=3.0, cache_file=DEFAULT_CACHE_FILE, use_cache=True, **kwargs):
+    """
+    Tìm camera khả dụng và trả luôn handle đã mở
+
+    Args:
+        max_cameras: Số index tối đa cần thử khi không liệt kê được thiết bị (không phải Linux)
+        timeout: Thời gian tối đa (giây) cho mỗi lượt probe song song
+        cache_file: File cache kết quả (None để tắt)
+        use_cache: Dùng cache nếu danh sách thiết bị không đổi
+        **kwargs: width / height / fps truyền cho probe_camera
+
+    Returns:
+        Dict camera_id -> cv2.VideoCapture (đã set độ phân giải / FPS)
+    """
+    start = time.time()
+    backend = default_backend()
+
+    v4l2 = list_v4l2_devices()
+    devices = {str(k): v for k, v in v4l2.items()} if v4l2 is not None else None
+    candidates = sorted(v4l2) if v4l2 is not None else list(range(max_cameras))
+
+    # Cache hợp lệ khi danh sách thiết bị không đổi: chỉ mở lại các camera đã biết
+    cache = _load_cache(cache_file) if cache_file and use_cache else None
+    if cache and cache.get("devices") == devices and cache.get("cameras"):
+        cached = cache["cameras"]
+        found = _probe_all(cached, backend, timeout, **kwargs)
+        if len(found) == len(cached):
+            print(f"[OK] Camera (cache): {sorted(found)} trong {time.time() - start:.2f}s")
+            return found
+        print("[WARNING] Cache camera không còn đúng, quét lại...")
+        for cap in found.values():
+            cap.release()
+
+    found = _probe_all(candidates, backend, timeout, **kwargs)
+    for cam_id in sorted(found):
+        name = f" ({v4l2[cam_id]})" if v4l2 else ""
+        print(f"[OK] Tìm thấy camera {cam_id}{name}")
+    print(f"[INFO] Quét {len(candidates)} ứng viên trong {time.time() - start:.2f}s")
+
+    if cache_file:
+        _save_cache(cache_file, devices, found)
+    return found
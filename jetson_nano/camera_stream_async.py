@@ -0,0 +1,251 @@
+"""
+Camera Stream Server (async) - Chế độ phục vụ bằng asyncio (aiohttp) cho hàng trăm viewer
+Chức năng:
+- Cùng route / template với camera_stream_server.py (/, /cameras, /camera-<id>, /video_feed/<id>, /snapshot/<id>)
+- Viewer không chiếm thread: mỗi camera một asyncio.Event, thread capture báo frame mới qua call_soon_threadsafe
+- Mọi viewer ghi chung một JPEG đã encode (CameraBroadcaster), viewer chậm tự bỏ frame cũ (chỉ lấy JPEG mới nhất)
+- /metrics: metrics dạng Prometheus giống chế độ threaded
+
+Chạy:
+  CAMERA_SERVER_MODE=async python camera_stream_server.py
+  python camera_stream_async.py
+
+Cần aiohttp (pip install aiohttp).
+"""
+
+import asyncio
+import os
+
+import jinja2
+from aiohttp import web
+
+try:
+    from .camera_utils import broadcasters, cameras, cleanup, collect_metrics, init_cameras
+    from .metrics import CONTENT_TYPE, MetricsRegistry
+except ImportError:  # Chạy trực tiếp trong thư mục jetson_nano
+    from camera_utils import broadcasters, cameras, cleanup, collect_metrics, init_cameras
+    from metrics import CONTENT_TYPE, MetricsRegistry
+
+TEMPLATE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "templates")
+
+NO_CACHE_HEADERS = {
+    "Cache-Control": "no-cache, no-store, must-revalidate",
+    "Pragma": "no-cache",
+    "Expires": "0",
+}
+
+
+class FrameHub:
+    """Cầu nối thread capture -> event loop: giữ JPEG mới nhất và đánh thức viewer của từng camera"""
+
+    def __init__(self, loop):
+        self.loop = loop
+        self._latest = {}
+        self._events = {}
+        self._listeners = {}
+
+    def attach(self, camera_id, broadcaster):
+        """Nhận JPEG mới từ thread capture (một callback mỗi camera, không phụ thuộc số viewer)"""
+
+        def on_frame(seq, jpeg_bytes):
+            self.loop.call_soon_threadsafe(self._publish, camera_id, seq, jpeg_bytes)
+
+        broadcaster.add_listener(on_frame)
+        self._listeners[camera_id] = (broadcaster, on_frame)
+
+    def detach_all(self):
+        for broadcaster, on_frame in self._listeners.values():
+            broadcaster.remove_listener(on_frame)
+        self._listeners.clear()
+
+    def _publish(self, camera_id, seq, jpeg_bytes):
+        self._latest[camera_id] = (seq, jpeg_bytes)
+        event = self._events.pop(camera_id, None)
+        if event is not None:
+            event.set()
+
+    async def wait(self, camera_id, last_seq=0, timeout=1.0):
+        """
+        Đợi JPEG mới hơn last_seq
+
+        Returns:
+            (seq, jpeg_bytes) hoặc None nếu hết timeout
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while True:
+            latest = self._latest.get(camera_id)
+            if latest is not None and latest[0] > last_seq:
+                return latest
+
+            # JPEG publish trước đó có thể còn nằm trong hàng đợi của loop (seq cũ): đợi tiếp tới deadline
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                return None
+            event = self._events.get(camera_id)
+            if event is None:
+                event = self._events[camera_id] = asyncio.Event()
+            try:
+                await asyncio.wait_for(event.wait(), remaining)
+            except asyncio.TimeoutError:
+                return None
+
+
+def _render(request, template, **context):
+    html = request.app["jinja"].get_template(template).render(**context)
+    return web.Response(text=html, content_type="text/html")
+
+
+async def index(request):
+    """Trang chủ"""
+    return _render(
+        request,
+        "index.html",
+        cameras=list(cameras.keys()),
+        camera_count=len(cameras),
+        camera_list=str(list(cameras.keys())),
+    )
+
+
+async def list_cameras(request):
+    """API trả về danh sách camera"""
+    return web.json_response(
+        {
+            "cameras": list(cameras.keys()),
+            "count": len(cameras),
+            "stats": {cam_id: broadcaster.get_stats() for cam_id, broadcaster in broadcasters.items()},
+        }
+    )
+
+
+async def camera_page(request):
+    """Trang xem camera cụ thể"""
+    camera_id = int(request.match_info["camera_id"])
+    if camera_id not in cameras:
+        return web.Response(text=f"Camera {camera_id} không tồn tại!", status=404)
+    return _render(request, "camera_view.html", camera_id=camera_id)
+
+
+async def video_feed(request):
+    """Stream video từ camera (MJPEG), không tạo thread cho viewer"""
+    camera_id = int(request.match_info["camera_id"])
+    broadcaster = broadcasters.get(camera_id)
+    if broadcaster is None:
+        return web.Response(text=f"Camera {camera_id} không tồn tại!", status=404)
+
+    response = web.StreamResponse(headers={"Content-Type": "multipart/x-mixed-replace; boundary=frame", **NO_CACHE_HEADERS})
+    await response.prepare(request)
+
+    hub = request.app["hub"]
+    broadcaster.add_viewer()
+    last_seq = 0
+    try:
+        while not broadcaster.stopped:
+            latest = await hub.wait(camera_id, last_seq, timeout=1.0)
+            if latest is None:
+                continue
+            last_seq, frame_bytes = latest
+            broadcaster.bytes_sent += len(frame_bytes)
+
+            # write() chờ socket drain: viewer chậm bỏ qua các frame đến trong lúc chờ
+            await response.write(
+                b"--frame\r\n"
+                b"Content-Type: image/jpeg\r\n"
+                b"Content-Length: " + str(len(frame_bytes)).encode() + b"\r\n\r\n" + frame_bytes + b"\r\n"
+            )
+    except (ConnectionResetError, asyncio.CancelledError):
+        # Viewer ngắt kết nối
+        pass
+    finally:
+        broadcaster.remove_viewer()
+    return response
+
+
+async def snapshot(request):
+    """Lấy một frame tĩnh (snapshot) từ camera"""
+    camera_id = int(request.match_info["camera_id"])
+    broadcaster = broadcasters.get(camera_id)
+    if broadcaster is None:
+        return web.Response(text=f"Camera {camera_id} không tồn tại!", status=404)
+
+    # Đợi JPEG encode sau request (JPEG còn giữ có thể đã cũ nếu camera vừa idle)
+    cached = broadcaster.latest_jpeg()
+    broadcaster.request_frame()
+    latest = await request.app["hub"].wait(camera_id, cached[0] if cached else 0, timeout=2.0)
+    if latest is None:
+        return web.Response(text="Không thể lấy frame từ camera!", status=500)
+
+    broadcaster.bytes_sent += len(latest[1])
+    return web.Response(body=latest[1], content_type="image/jpeg", headers=NO_CACHE_HEADERS)
+
+
+async def metrics_endpoint(request):
+    """Metrics dạng Prometheus (FPS, thời gian đọc / encode, viewer, byte đã gửi của từng camera)"""
+    return web.Response(body=request.app["metrics"].render().encode(), headers={"Content-Type": CONTENT_TYPE})
+
+
+@web.middleware
+async def cors_middleware(request, handler):
+    """CORS cho tất cả routes (giống flask_cors ở chế độ threaded)"""
+    if request.method == "OPTIONS":
+        response = web.Response()
+    else:
+        response = await handler(request)
+    response.headers["Access-Control-Allow-Origin"] = "*"
+    response.headers["Access-Control-Allow-Methods"] = "GET, POST, OPTIONS"
+    response.headers["Access-Control-Allow-Headers"] = "Content-Type"
+    return response
+
+
+async def _on_startup(app):
+    hub = FrameHub(asyncio.get_running_loop())
+    for camera_id, broadcaster in broadcasters.items():
+        hub.attach(camera_id, broadcaster)
+    app["hub"] = hub
+
+
+async def _on_cleanup(app):
+    app["hub"].detach_all()
+
+
+def create_app():
+    """
+    Tạo aiohttp app (camera phải được init_cameras() trước)
+
+    Returns:
+        web.Application
+    """
+    app = web.Application(middlewares=[cors_middleware])
+    app["metrics"] = MetricsRegistry()
+    app["metrics"].register(collect_metrics)
+    app["jinja"] = jinja2.Environment(loader=jinja2.FileSystemLoader(TEMPLATE_DIR), autoescape=True)
+    app.router.add_get("/", index)
+    app.router.add_get("/cameras", list_cameras)
+    app.router.add_get(r"/camera-{camera_id:\d+}", camera_page)
+    app.router.add_get(r"/video_feed/{camera_id:\d+}", video_feed)
+    app.router.add_get(r"/snapshot/{camera_id:\d+}", snapshot)
+    app.router.add_get("/metrics", metrics_endpoint)
+    app.on_startup.append(_on_startup)
+    app.on_cleanup.append(_on_cleanup)
+    return app
+
+
+def run(host="0.0.0.0", port=5000):
+    """Chạy server async (blocking tới khi Ctrl+C)"""
+    web.run_app(create_app(), host=host, port=port, print=None, shutdown_timeout=2.0)
+
+
+if __name__ == "__main__":
+    host = os.environ.get("HOST", "0.0.0.0")
+    port = int(os.environ.get("PORT", "5000"))
+
+    available_cameras = init_cameras(shm_port=port)
+    if not available_cameras:
+        print("[ERROR] Không tìm thấy camera nào!")
+        exit(1)
+
+    print(f"[OK] Async server với {len(available_cameras)} camera: http://localhost:{port}/")
+    try:
+        run(host, port)
+    finally:
+        cleanup()
@@ -4,7 +4,8 @@ import socket
 from flask import Flask, Response, jsonify, render_template
 from flask_cors import CORS
 
-from camera_utils import generate_frames, get_frame, init_cameras, cleanup, cameras
+from camera_utils import generate_frames, get_snapshot, init_cameras, cleanup, cameras, broadcasters, collect_metrics
+from metrics import CONTENT_TYPE, MetricsRegistry
 from routes import register_routes
 
 # Tắt log cảnh báo của OpenCV
@@ -17,6 +18,10 @@ app = Flask(__name__, template_folder="templates")
 # Enable CORS cho tất cả routes
 CORS(app, resources={r"/*": {"origins": "*", "methods": ["GET", "POST", "OPTIONS"], "allow_headers": ["Content-Type"]}})
 
+# Metrics dạng Prometheus cho /metrics
+metrics = MetricsRegistry()
+metrics.register(collect_metrics)
+
 @app.route("/")
 def index():
     """Trang chủ"""
@@ -30,7 +35,13 @@ def index():
 @app.route("/cameras")
 def list_cameras():
     """API trả về danh sách camera"""
-    return jsonify({"cameras": list(cameras.keys()), "count": len(cameras)})
+    return jsonify(
+        {
+            "cameras": list(cameras.keys()),
+            "count": len(cameras),
+            "stats": {cam_id: broadcaster.get_stats() for cam_id, broadcaster in broadcasters.items()},
+        }
+    )
 
 @app.route("/camera-<int:camera_id>")
 def camera_page(camera_id):
@@ -54,20 +65,17 @@ def snapshot(camera_id):
     if camera_id not in cameras:
         return f"Camera {camera_id} không tồn tại!", 404
 
-    frame = get_frame(camera_id)
+    # JPEG từ thread capture dùng chung (không đọc camera / encode riêng), đợi frame đọc sau request
+    # để không trả JPEG cũ còn giữ từ trước khi camera idle
+    latest = get_snapshot(camera_id, timeout=2.0)
 
-    if frame is None:
+    if latest is None:
         return "Không thể lấy frame từ camera!", 500
 
-    # Encode frame thành JPEG
-    import cv2
-
-    ret, buffer = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, 95])
-    if not ret:
-        return "Lỗi encode frame!", 500
+    broadcasters[camera_id].bytes_sent += len(latest[1])
 
     # Trả về ảnh JPEG
-    response = Response(buffer.tobytes(), mimetype="image/jpeg")
+    response = Response(latest[1], mimetype="image/jpeg")
     # Thêm CORS headers
     response.headers["Access-Control-Allow-Origin"] = "*"
     response.headers["Access-Control-Allow-Methods"] = "GET"
@@ -78,6 +86,12 @@ def snapshot(camera_id):
     return response
 
 
+@app.route("/metrics")
+def metrics_endpoint():
+    """Metrics dạng Prometheus (FPS, thời gian đọc / encode, viewer, byte đã gửi của từng camera)"""
+    return Response(metrics.render(), content_type=CONTENT_TYPE)
+
+
 def is_port_available(host: str, port: int) -> bool:
     """Kiểm tra xem port có thể bind được hay không (True nếu rảnh)."""
     try:
@@ -101,6 +115,9 @@ if __name__ == "__main__":
     host = os.environ.get("HOST", "0.0.0.0")
     port = int(os.environ.get("PORT", "5000"))
 
+    # "threaded": Flask, mỗi viewer một thread; "async": aiohttp, viewer không chiếm thread (hàng trăm viewer)
+    server_mode = os.environ.get("CAMERA_SERVER_MODE", "threaded")
+
     # Kiểm tra port có thể bind được trước khi mở camera
     if not is_port_available(host, port):
         print(f"[ERROR] Port {port} trên host {host} không thể sử dụng.")
@@ -109,7 +126,7 @@ if __name__ == "__main__":
         exit(1)
 
     # Khởi tạo camera
-    available_cameras = init_cameras()
+    available_cameras = init_cameras(shm_port=port)
 
     if not available_cameras:
         print("[ERROR] Không tìm thấy camera nào!")
@@ -129,12 +146,18 @@ if __name__ == "__main__":
         print(f"   - Snapshot {cam_id}: http://localhost:{port}/snapshot/{cam_id}")
 
     print()
+    print(f"[INFO] Chế độ server: {server_mode}")
     print("[WARNING] Nhấn Ctrl+C để dừng server")
     print("=" * 60)
     print()
 
     try:
-        app.run(host=host, port=port, debug=False, threaded=True)
+        if server_mode == "async":
+            from camera_stream_async import run as run_async
+
+            run_async(host, port)
+        else:
+            app.run(host=host, port=port, debug=False, threaded=True)
     except KeyboardInterrupt:
         print("\n[STOP] Đang dừng server...")
     finally:
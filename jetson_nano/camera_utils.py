@@ -1,89 +1,422 @@
-import cv2
+import os
 import threading
 import time
 
+import cv2
+
+try:
+    from .camera_discovery import DEFAULT_CACHE_FILE, discover_cameras
+    from .frame_sources import create_source, parse_source_specs
+    from .metrics import Histogram, MetricFamily
+    from .shm_ring import ShmRing, shm_ring_name
+except ImportError:  # Chạy trực tiếp trong thư mục jetson_nano (camera_stream_server.py)
+    from camera_discovery import DEFAULT_CACHE_FILE, discover_cameras
+    from frame_sources import create_source, parse_source_specs
+    from metrics import Histogram, MetricFamily
+    from shm_ring import ShmRing, shm_ring_name
+
 # Dictionary lưu trữ camera instances
 cameras = {}
 camera_locks = {}
+broadcasters = {}  # Thread capture + encode của từng camera
+_discovered = {}  # Handle đã mở lúc probe, chờ init_cameras dùng lại
+
+# Discovery: timeout mỗi lượt probe song song, file cache ("" để tắt cache)
+DISCOVERY_TIMEOUT = float(os.environ.get("CAMERA_DISCOVERY_TIMEOUT", "3.0"))
+DISCOVERY_CACHE_FILE = os.environ.get("CAMERA_CACHE_FILE", DEFAULT_CACHE_FILE)
+
+# Nguồn frame: "device" (camera thật) hoặc source ảo để test không cần camera, xem frame_sources.py
+# Ví dụ: CAMERA_SOURCES="synthetic*24" hoặc "device;file:/data/cabin.mp4?speed=2"
+CAMERA_SOURCES = os.environ.get("CAMERA_SOURCES", "device")
+
+# Publish frame thô vào shared memory (shm://camera/<id>) cho admin_app chạy cùng máy:
+# bỏ qua encode JPEG + HTTP + decode, chỉ ghi khi có reader
+CAMERA_SHM = os.environ.get("CAMERA_SHM", "1") == "1"
+
+
+def _discover_devices(max_cameras):
+    """Probe camera thật (song song, có cache)"""
+    return discover_cameras(
+        max_cameras=max_cameras,
+        timeout=DISCOVERY_TIMEOUT,
+        cache_file=DISCOVERY_CACHE_FILE or None,
+        width=640,
+        height=480,
+        fps=30,
+    )
 
 
 def find_available_cameras(max_cameras=10):
-    """Tìm tất cả camera khả dụng"""
-    available_cameras = []
+    """Tìm tất cả camera khả dụng theo CAMERA_SOURCES (giữ lại handle đã mở cho init_cameras)"""
     print("Đang quét camera...")
+    for cap in _discovered.values():
+        cap.release()
+    _discovered.clear()
+
+    specs = parse_source_specs(CAMERA_SOURCES)
+    if [kind for kind, _, _ in specs] == ["device"]:
+        # Chỉ có camera thật: giữ nguyên ID theo index thiết bị
+        _discovered.update(_discover_devices(max_cameras))
+        return sorted(_discovered)
+
+    # Có source ảo: đánh ID liên tiếp theo thứ tự trong CAMERA_SOURCES
+    sources = []
+    for kind, target, options in specs:
+        if kind == "device":
+            devices = _discover_devices(max_cameras)
+            sources.extend(devices[index] for index in sorted(devices))
+            continue
+        source = create_source(kind, target, options, index=len(sources))
+        if source.isOpened():
+            sources.append(source)
+            print(f"[OK] Source {len(sources) - 1}: {kind} {target}".rstrip())
 
-    for i in range(max_cameras):
-        cap = cv2.VideoCapture(i, cv2.CAP_DSHOW)
-        if cap.isOpened():
-            ret, frame = cap.read()
-            if ret and frame is not None:
-                available_cameras.append(i)
-                print(f"[OK] Tìm thấy camera {i}")
-            cap.release()
+    _discovered.update(enumerate(sources))
+    return sorted(_discovered)
 
-    return available_cameras
 
+def init_cameras(shm_port=None):
+    """
+    Khởi tạo tất cả camera (dùng lại handle từ lúc probe, không mở lại)
 
-def init_cameras():
-    """Khởi tạo tất cả camera"""
-    available = find_available_cameras()
+    Args:
+        shm_port: Port của server, dùng đặt tên ring shared memory (None = không publish shm)
+    """
+    if not _discovered:
+        find_available_cameras()
 
-    for cam_id in available:
-        cap = cv2.VideoCapture(cam_id, cv2.CAP_DSHOW)
-        if cap.isOpened():
-            cap.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
-            cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
-            cap.set(cv2.CAP_PROP_FPS, 30)
-            cameras[cam_id] = cap
-            camera_locks[cam_id] = threading.Lock()
-            print(f"[OK] Camera {cam_id} đã sẵn sàng")
+    for cam_id in sorted(_discovered):
+        cap = _discovered.pop(cam_id)
+        cameras[cam_id] = cap
+        camera_locks[cam_id] = threading.Lock()
+        shm_name = shm_ring_name(cam_id, shm_port) if CAMERA_SHM and shm_port is not None else None
+        broadcasters[cam_id] = CameraBroadcaster(cam_id, cap, shm_name=shm_name).start()
+        print(f"[OK] Camera {cam_id} đã sẵn sàng")
 
     return list(cameras.keys())
 
 
+class CameraBroadcaster:
+    """
+    Một thread capture + encode cho mỗi camera, publish JPEG mới nhất kèm sequence number
+    Mọi viewer (/video_feed, /snapshot) đọc chung buffer này: camera giữ nguyên FPS với bất kỳ số viewer nào,
+    mỗi frame chỉ encode một lần
+    """
+
+    def __init__(self, camera_id, cap, jpeg_quality=85, idle_timeout=2.0, shm_name=None):
+        """
+        Args:
+            camera_id: ID camera
+            cap: cv2.VideoCapture đã mở
+            jpeg_quality: Chất lượng JPEG
+            idle_timeout: Không có viewer nào đọc trong khoảng này (giây) thì chỉ đọc frame, không encode
+            shm_name: Tên ring shared memory để publish frame thô (None = tắt)
+        """
+        self.camera_id = camera_id
+        self.cap = cap
+        self.jpeg_quality = jpeg_quality
+        self.idle_timeout = idle_timeout
+        self.shm_name = shm_name
+        self.shm_ring = None
+        self.frames_shared = 0
+
+        self.stopped = False
+        self._thread = None
+        self._cond = threading.Condition()
+
+        # Frame / JPEG mới nhất
+        self._frame = None
+        self._jpeg = None
+        self._seq = 0
+        self._jpeg_seq = 0
+        self._timestamp = 0.0
+        self._last_request = 0.0
+        self.viewers = 0
+        self._listeners = []  # Callback (seq, jpeg_bytes) khi có JPEG mới (ví dụ server async)
+
+        # Thống kê
+        self.frames_read = 0
+        self.frames_encoded = 0
+        self.read_failures = 0
+        self.bytes_sent = 0  # Byte JPEG đã gửi cho viewer MJPEG / snapshot
+        self.read_time = Histogram()
+        self.encode_time = Histogram()
+        self.fps = 0.0
+        self._fps_start = time.time()
+        self._fps_count = 0
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name=f"camera-{self.camera_id}", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.stopped = True
+        with self._cond:
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout=2.0)
+        if self.shm_ring is not None:
+            self.shm_ring.close()
+            self.shm_ring = None
+
+    def _publish_shm(self, frame):
+        """Ghi frame thô vào ring (tạo ring theo kích thước frame, tạo lại nếu frame lớn hơn slot)"""
+        if self.shm_ring is None or frame.nbytes > self.shm_ring.slot_size:
+            if self.shm_ring is not None:
+                self.shm_ring.close()
+            self.shm_ring = ShmRing(self.shm_name, slots=4, slot_size=frame.nbytes, create=True, replace=True)
+            print(f"[OK] Camera {self.camera_id} publish shared memory: {self.shm_name}")
+        elif not self.shm_ring.has_readers(self.idle_timeout):
+            return
+        self.shm_ring.write(frame, shape=frame.shape)
+        self.frames_shared += 1
+
+    def _run(self):
+        failures = 0
+        while not self.stopped:
+            read_start = time.perf_counter()
+            with camera_locks[self.camera_id]:
+                ret, frame = self.cap.read()
+            self.read_time.observe(time.perf_counter() - read_start)
+
+            if not ret or frame is None:
+                failures += 1
+                self.read_failures += 1
+                time.sleep(min(0.1 * failures, 1.0))
+                continue
+            failures = 0
+
+            # Thêm info camera
+            cv2.putText(
+                frame,
+                f"Camera {self.camera_id}",
+                (10, frame.shape[0] - 10),
+                cv2.FONT_HERSHEY_SIMPLEX,
+                0.6,
+                (255, 255, 255),
+                2,
+            )
+
+            if self.shm_name is not None:
+                self._publish_shm(frame)
+
+            # Chỉ encode khi có người xem (viewer đang stream hoặc vừa lấy snapshot)
+            jpeg = None
+            if self.viewers > 0 or time.time() - self._last_request < self.idle_timeout:
+                encode_start = time.perf_counter()
+                ret, buffer = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality])
+                if ret:
+                    jpeg = buffer.tobytes()
+                    self.frames_encoded += 1
+                self.encode_time.observe(time.perf_counter() - encode_start)
+
+            with self._cond:
+                self._frame = frame
+                self._seq += 1
+                self._timestamp = time.time()
+                if jpeg is not None:
+                    self._jpeg = jpeg
+                    self._jpeg_seq = self._seq
+                self._cond.notify_all()
+                listeners = list(self._listeners) if jpeg is not None else ()
+                seq = self._seq
+
+            for listener in listeners:
+                listener(seq, jpeg)
+
+            self.frames_read += 1
+            self._fps_count += 1
+            elapsed = time.time() - self._fps_start
+            if elapsed >= 1.0:
+                self.fps = self._fps_count / elapsed
+                self._fps_count = 0
+                self._fps_start = time.time()
+
+    def get_frame(self):
+        """
+        Returns:
+            Bản copy frame mới nhất hoặc None
+        """
+        with self._cond:
+            return None if self._frame is None else self._frame.copy()
+
+    def get_jpeg(self, last_seq=0, timeout=1.0):
+        """
+        Đợi tới khi có JPEG mới hơn last_seq
+
+        Args:
+            last_seq: Sequence number viewer đã nhận
+            timeout: Thời gian chờ tối đa (giây)
+
+        Returns:
+            (seq, jpeg_bytes) hoặc None nếu hết timeout
+        """
+        self.request_frame()
+        with self._cond:
+            ready = self._cond.wait_for(lambda: self._jpeg_seq > last_seq or self.stopped, timeout)
+            if not ready or self._jpeg_seq <= last_seq:
+                return None
+            return self._jpeg_seq, self._jpeg
+
+    def snapshot(self, timeout=2.0):
+        """
+        JPEG của một frame đọc sau thời điểm gọi (không trả JPEG cũ còn giữ từ lần encode trước khi idle)
+
+        Args:
+            timeout: Thời gian chờ tối đa (giây)
+
+        Returns:
+            (seq, jpeg_bytes) hoặc None nếu hết timeout
+        """
+        with self._cond:
+            last_seq = self._jpeg_seq
+        return self.get_jpeg(last_seq, timeout)
+
+    def request_frame(self):
+        """Đánh dấu có người cần JPEG: nếu đang idle thì frame kế tiếp sẽ được encode"""
+        self._last_request = time.time()
+
+    def latest_jpeg(self):
+        """
+        Returns:
+            (seq, jpeg_bytes) mới nhất hoặc None (không chờ)
+        """
+        with self._cond:
+            return (self._jpeg_seq, self._jpeg) if self._jpeg is not None else None
+
+    def add_listener(self, callback):
+        """
+        Đăng ký callback(seq, jpeg_bytes) gọi trên thread capture mỗi khi có JPEG mới
+        Callback phải trả về ngay (ví dụ loop.call_soon_threadsafe)
+        """
+        with self._cond:
+            self._listeners.append(callback)
+
+    def remove_listener(self, callback):
+        with self._cond:
+            if callback in self._listeners:
+                self._listeners.remove(callback)
+
+    def add_viewer(self):
+        with self._cond:
+            self.viewers += 1
+
+    def remove_viewer(self):
+        with self._cond:
+            self.viewers -= 1
+
+    def get_stats(self):
+        """
+        Returns:
+            Dict thống kê camera
+        """
+        return {
+            "camera_id": self.camera_id,
+            "fps": round(self.fps, 2),
+            "frames_read": self.frames_read,
+            "frames_encoded": self.frames_encoded,
+            "frames_shared": self.frames_shared,
+            "bytes_sent": self.bytes_sent,
+            "viewers": self.viewers,
+            "seq": self._seq,
+        }
+
+
 def get_frame(camera_id):
-    """Đọc frame từ camera"""
-    if camera_id not in cameras:
+    """Lấy frame mới nhất của camera (từ thread capture dùng chung)"""
+    broadcaster = broadcasters.get(camera_id)
+    if broadcaster is None:
         return None
+    return broadcaster.get_frame()
 
-    with camera_locks[camera_id]:
-        cap = cameras[camera_id]
-        ret, frame = cap.read()
 
-        if not ret or frame is None:
-            return None
+def get_jpeg(camera_id, last_seq=0, timeout=1.0):
+    """
+    Lấy JPEG mới nhất của camera (đã encode sẵn, dùng chung cho mọi viewer)
 
-        # Thêm info camera
-        cv2.putText(
-            frame, f"Camera {camera_id}", (10, frame.shape[0] - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2
-        )
+    Returns:
+        (seq, jpeg_bytes) hoặc None
+    """
+    broadcaster = broadcasters.get(camera_id)
+    if broadcaster is None:
+        return None
+    return broadcaster.get_jpeg(last_seq, timeout)
 
-        return frame
+
+def get_snapshot(camera_id, timeout=2.0):
+    """
+    Lấy JPEG mới (encode sau thời điểm gọi) cho snapshot
+
+    Returns:
+        (seq, jpeg_bytes) hoặc None
+    """
+    broadcaster = broadcasters.get(camera_id)
+    if broadcaster is None:
+        return None
+    return broadcaster.snapshot(timeout)
 
 
 def generate_frames(camera_id):
-    """Generator cho video streaming"""
-    while True:
-        frame = get_frame(camera_id)
+    """Generator cho video streaming (đọc JPEG dùng chung, không encode riêng cho từng viewer)"""
+    broadcaster = broadcasters.get(camera_id)
+    if broadcaster is None:
+        return
 
-        if frame is None:
-            time.sleep(0.1)
-            continue
+    broadcaster.add_viewer()
+    last_seq = 0
+    try:
+        while not broadcaster.stopped:
+            latest = broadcaster.get_jpeg(last_seq, timeout=1.0)
+            if latest is None:
+                continue
+            last_seq, frame_bytes = latest
+            broadcaster.bytes_sent += len(frame_bytes)
 
-        # Encode frame thành JPEG
-        ret, buffer = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, 85])
-        if not ret:
-            continue
+            # Yield frame theo format multipart (Content-Length giúp client tách frame không cần dò byte)
+            yield (
+                b"--frame\r\n"
+                b"Content-Type: image/jpeg\r\n"
+                b"Content-Length: " + str(len(frame_bytes)).encode() + b"\r\n\r\n" + frame_bytes + b"\r\n"
+            )
+    finally:
+        # Viewer ngắt kết nối (GeneratorExit)
+        broadcaster.remove_viewer()
+
+
+def collect_metrics():
+    """
+    Collector cho MetricsRegistry: metrics của từng camera (đọc từ bộ đếm của CameraBroadcaster)
 
-        frame_bytes = buffer.tobytes()
+    Returns:
+        List MetricFamily
+    """
+    read_time = MetricFamily("camera_read_seconds", "histogram", "Thời gian đọc một frame từ camera")
+    encode_time = MetricFamily("camera_encode_seconds", "histogram", "Thời gian encode JPEG một frame")
+    fps = MetricFamily("camera_fps", "gauge", "FPS đọc camera")
+    frames = MetricFamily("camera_frames_total", "counter", "Số frame theo loại (read, encoded, shared, failed)")
+    viewers = MetricFamily("camera_viewers", "gauge", "Số viewer MJPEG đang kết nối")
+    bytes_sent = MetricFamily("camera_bytes_sent_total", "counter", "Số byte JPEG đã gửi cho viewer")
 
-        # Yield frame theo format multipart
-        yield (b"--frame\r\n" b"Content-Type: image/jpeg\r\n\r\n" + frame_bytes + b"\r\n")
+    for cam_id, broadcaster in list(broadcasters.items()):
+        camera = str(cam_id)
+        read_time.add(broadcaster.read_time, camera=camera)
+        encode_time.add(broadcaster.encode_time, camera=camera)
+        fps.add(broadcaster.fps, camera=camera)
+        frames.add(broadcaster.frames_read, camera=camera, kind="read")
+        frames.add(broadcaster.frames_encoded, camera=camera, kind="encoded")
+        frames.add(broadcaster.frames_shared, camera=camera, kind="shared")
+        frames.add(broadcaster.read_failures, camera=camera, kind="failed")
+        viewers.add(broadcaster.viewers, camera=camera)
+        bytes_sent.add(broadcaster.bytes_sent, camera=camera)
+    return [read_time, encode_time, fps, frames, viewers, bytes_sent]
 
 
 def cleanup():
     """Giải phóng tài nguyên khi tắt server"""
     print("\nĐang đóng tất cả camera...")
+    for broadcaster in broadcasters.values():
+        broadcaster.stop()
     for cam_id, cap in cameras.items():
         cap.release()
     print("[OK] Đã đóng tất cả camera")
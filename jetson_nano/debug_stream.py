@@ -1,7 +1,9 @@
 import requests
 import sys
 
-def debug_stream(url):
+from mjpeg_stream import MJPEGDemuxer, parse_boundary
+
+def debug_stream(url, max_frames=3, max_bytes=2 * 1024 * 1024):
     """Debug xem stream trả về gì"""
     print(f"[DEBUG] Đang kiểm tra stream: {url}")
     print("=" * 70)
@@ -20,28 +22,37 @@ def debug_stream(url):
         for key, value in response.headers.items():
             print(f"   {key}: {value}")
         
-        print("\n[DEBUG] Đang đọc 10KB dữ liệu đầu tiên...")
-        
-        data = b''
+        boundary = parse_boundary(response.headers.get('Content-Type', ''))
+        print(f"\n[DEBUG] Boundary: {boundary!r}" + ("" if boundary else " (không có, tự nhận từ dữ liệu)"))
+        print(f"[DEBUG] Đang tách tối đa {max_frames} frame (đọc tối đa {max_bytes // 1024}KB)...")
+
+        # Tách frame theo boundary / Content-Length (không dò marker 0xFFD8 / 0xFFD9)
+        demuxer = MJPEGDemuxer(boundary)
+        head = bytearray()
+        frames = []
         for chunk in response.iter_content(chunk_size=1024):
-            data += chunk
-            if len(data) >= 10240:  # 10KB
+            if len(head) < 100:
+                head += chunk[: 100 - len(head)]
+            frames += demuxer.feed(chunk)
+            if len(frames) >= max_frames or demuxer.bytes_in >= max_bytes:
                 break
-        
-        print(f"\n[OK] Đã đọc {len(data)} bytes")
-        
-        # Tìm JPEG markers
-        jpeg_start = data.find(b'\xff\xd8')
-        jpeg_end = data.find(b'\xff\xd9')
-        
+        response.close()
+        data = bytes(head)
+
+        print(f"\n[OK] Đã đọc {demuxer.bytes_in} bytes")
+
         print(f"\n[DEBUG] Phân tích dữ liệu:")
-        print(f"   JPEG start marker (\\xff\\xd8) tại vị trí: {jpeg_start}")
-        print(f"   JPEG end marker (\\xff\\xd9) tại vị trí: {jpeg_end}")
-        
-        if jpeg_start != -1 and jpeg_end != -1:
-            print(f"   [OK] Tìm thấy JPEG image! Kích thước: {jpeg_end - jpeg_start + 2} bytes")
+        for i, frame in enumerate(frames):
+            valid = frame.startswith(b'\xff\xd8') and frame.rstrip(b'\r\n').endswith(b'\xff\xd9')
+            status = "[OK]" if valid else "[WARNING] không phải JPEG hoàn chỉnh"
+            print(f"   Frame {i}: {len(frame)} bytes {status}")
+
+        if frames:
+            print(f"   [OK] Tìm thấy {len(frames)} JPEG image!")
         else:
-            print(f"   [ERROR] Không tìm thấy JPEG markers!")
+            print(f"   [ERROR] Không tách được frame JPEG nào!")
+        if demuxer.discarded:
+            print(f"   [WARNING] Bỏ {demuxer.discarded} part lỗi / quá lớn")
         
         # Hiển thị 200 bytes đầu tiên (hex)
         print(f"\n[DEBUG] 100 bytes đầu tiên (hex):")
@@ -1,16 +1,17 @@
 import cv2
-import numpy as np
 import requests
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
 import argparse
 import sys
-from threading import Thread
 import time
 import urllib3
 from bs4 import BeautifulSoup
 import re
 
+from frame_reader import LatestFrameReader
+from mjpeg_stream import MJPEGCapture
+
 # Tắt warning SSL cho dev tunnels
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
@@ -170,6 +171,26 @@ class SessionManager:
         return response
 
 
+class MJPEGResponseCapture(MJPEGCapture):
+    """
+    Đọc frame JPEG từ HTTP multipart response (đã bypass warning)
+    Tách frame bằng MJPEGDemuxer (boundary / Content-Length), decode thành frame BGR
+    """
+
+    def __init__(self, response, chunk_size=8192, max_no_jpeg=100):
+        super().__init__(response=response, chunk_size=chunk_size, decode=True, max_empty_chunks=max_no_jpeg)
+        self.first_frame_received = False
+
+    def read(self):
+        """Đọc tới khi decode được một frame JPEG hoàn chỉnh"""
+        ret, frame = super().read()
+        if ret and not self.first_frame_received:
+            self.first_frame_received = True
+            print(f"[OK] Đã nhận frame đầu tiên! Kích thước: {frame.shape}")
+            print(f"   Bắt đầu stream...\n")
+        return ret, frame
+
+
 class VideoStreamDetector:
     """
     Class xử lý video stream và face detection với session management
@@ -181,6 +202,7 @@ class VideoStreamDetector:
         self.stopped = False
         self.frame = None
         self.grabbed = False
+        self.reader = None  # LatestFrameReader: đọc liên tục, chỉ giữ frame mới nhất
 
         # Session manager
         self.session_manager = SessionManager(stream_url)
@@ -194,82 +216,43 @@ class VideoStreamDetector:
         self.start_time = time.time()
 
     def start(self):
-        """Bắt đầu thread đọc stream"""
-        Thread(target=self.update, args=(), daemon=True).start()
+        """Bắt đầu thread đọc stream (chỉ giữ frame mới nhất)"""
+        self.reader = LatestFrameReader(self._open_stream, name="MJPEG", reconnect=False, max_failures=1)
+        self.reader.start()
         return self
 
-    def update(self):
-        """Thread liên tục đọc frame từ stream"""
-        try:
-            print(f"\n{'='*70}")
-            print("BẮT ĐẦU KẾT NỐI VÀ BYPASS WARNING")
-            print("=" * 70)
-
-            # Sử dụng session manager để bypass warning
-            stream = self.session_manager.get_stream_response(self.stream_url)
-
-            if stream is None:
-                self.stopped = True
-                return
-
-            print("\n" + "=" * 70)
-            print("BẮT ĐẦU ĐỌC VIDEO STREAM")
-            print("=" * 70 + "\n")
-
-            bytes_data = bytes()
-            first_frame_received = False
-            no_jpeg_count = 0
-            max_no_jpeg = 100
-
-            for chunk in stream.iter_content(chunk_size=8192):
-                if self.stopped:
-                    break
-
-                bytes_data += chunk
-
-                # Tìm JPEG boundary
-                a = bytes_data.find(b"\xff\xd8")  # JPEG start
-                b = bytes_data.find(b"\xff\xd9")  # JPEG end
-
-                if a != -1 and b != -1:
-                    jpg = bytes_data[a : b + 2]
-                    bytes_data = bytes_data[b + 2 :]
-
-                    no_jpeg_count = 0
-
-                    # Decode frame
-                    frame = cv2.imdecode(np.frombuffer(jpg, dtype=np.uint8), cv2.IMREAD_COLOR)
+    def _open_stream(self):
+        """Kết nối (tự bypass warning) và trả về capture đọc JPEG từ HTTP response"""
+        print(f"\n{'='*70}")
+        print("BẮT ĐẦU KẾT NỐI VÀ BYPASS WARNING")
+        print("=" * 70)
 
-                    if frame is not None:
-                        self.frame = frame
-                        self.grabbed = True
-                        self.frame_count += 1
+        # Sử dụng session manager để bypass warning
+        stream = self.session_manager.get_stream_response(self.stream_url)
 
-                        if not first_frame_received:
-                            first_frame_received = True
-                            print(f"[OK] Đã nhận frame đầu tiên! Kích thước: {frame.shape}")
-                            print(f"   Bắt đầu stream...\n")
-                else:
-                    no_jpeg_count += 1
-                    if no_jpeg_count >= max_no_jpeg and not first_frame_received:
-                        print(f"[ERROR] Không nhận được JPEG data sau {max_no_jpeg} chunks!")
-                        self.stopped = True
-                        break
+        if stream is None:
+            return None
 
-        except Exception as e:
-            print(f"[ERROR] Lỗi: {e}")
-            import traceback
+        print("\n" + "=" * 70)
+        print("BẮT ĐẦU ĐỌC VIDEO STREAM")
+        print("=" * 70 + "\n")
 
-            traceback.print_exc()
-            self.stopped = True
+        return MJPEGResponseCapture(stream)
 
     def read(self):
-        """Đọc frame hiện tại"""
+        """Đọc frame mới nhất"""
+        if self.reader is not None:
+            self.grabbed, self.frame = self.reader.read()
+            self.frame_count = self.reader.frames_read
+            if self.reader.stopped:
+                self.stopped = True
         return self.grabbed, self.frame
 
     def stop(self):
         """Dừng stream"""
         self.stopped = True
+        if self.reader is not None:
+            self.reader.stop()
 
     def detect_faces(self, frame):
         """Phát hiện khuôn mặt trong frame"""
@@ -300,7 +283,12 @@ class VideoStreamDetector:
         cv2.rectangle(overlay, (0, 0), (width, 100), (0, 0, 0), -1)
         cv2.addWeighted(overlay, 0.6, frame, 0.4, 0, frame)
 
-        info_texts = [f"Faces Detected: {len(faces)}", f"FPS: {self.fps:.1f}", f"Stream: {self.stream_url[:50]}..."]
+        dropped = self.reader.frames_dropped if self.reader else 0
+        info_texts = [
+            f"Faces Detected: {len(faces)}",
+            f"FPS: {self.fps:.1f} | Dropped: {dropped}",
+            f"Stream: {self.stream_url[:50]}...",
+        ]
 
         y_offset = 25
         for i, text in enumerate(info_texts):
@@ -327,7 +315,10 @@ class VideoStreamDetector:
         wait_count = 0
         max_wait = 150
 
-        while not self.grabbed and not self.stopped and wait_count < max_wait:
+        while wait_count < max_wait:
+            self.read()
+            if self.grabbed or self.stopped:
+                break
             time.sleep(0.1)
             wait_count += 1
 
@@ -3,7 +3,8 @@ import numpy as np
 import argparse
 import sys
 import time
-from threading import Thread
+
+from frame_reader import LatestFrameReader
 
 
 class RTSPFaceDetector:
@@ -17,7 +18,7 @@ class RTSPFaceDetector:
         self.stopped = False
         self.frame = None
         self.grabbed = False
-        self.cap = None
+        self.reader = None  # LatestFrameReader: đọc liên tục, chỉ giữ frame mới nhất
 
         # Load Haar Cascade cho face detection
         self.face_cascade = cv2.CascadeClassifier(
@@ -39,14 +40,12 @@ class RTSPFaceDetector:
         print(f"URL: {self.rtsp_url}")
 
         try:
-            # Khởi tạo VideoCapture với RTSP URL
-            self.cap = cv2.VideoCapture(self.rtsp_url)
-
-            # Cấu hình buffer để giảm độ trễ
-            self.cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+            # Reader đọc liên tục trên thread riêng để drain buffer của FFmpeg
+            # (CAP_PROP_BUFFERSIZE bị bỏ qua ở hầu hết backend nên không đủ để giảm độ trễ)
+            self.reader = LatestFrameReader(self.rtsp_url, name="RTSP")
 
             # Kiểm tra kết nối
-            if not self.cap.isOpened():
+            if not self.reader.open():
                 print("\n[ERROR] Không thể mở RTSP stream!")
                 print("\n[INFO] Kiểm tra:")
                 print("   - URL RTSP có đúng không?")
@@ -54,17 +53,17 @@ class RTSPFaceDetector:
                 print("   - Mạng có kết nối được không?")
                 return False
 
-            # Đọc thử frame đầu tiên
-            ret, frame = self.cap.read()
-            if ret and frame is not None:
+            # Đợi frame đầu tiên
+            self.reader.start()
+            if self.reader.wait_for_frame(timeout=10.0):
+                self.grabbed, self.frame = self.reader.read()
                 print(f"\n[OK] Kết nối thành công!")
-                print(f"   - Kích thước frame: {frame.shape}")
-                print(f"   - FPS: {self.cap.get(cv2.CAP_PROP_FPS):.1f}")
-                self.frame = frame
-                self.grabbed = True
+                print(f"   - Kích thước frame: {self.frame.shape}")
+                print(f"   - FPS: {self.reader.source_fps:.1f}")
                 return True
             else:
                 print("\n[ERROR] Không thể đọc frame từ stream!")
+                self.reader.stop()
                 return False
 
         except Exception as e:
@@ -74,49 +73,25 @@ class RTSPFaceDetector:
             return False
 
     def start(self):
-        """Bắt đầu thread đọc stream"""
-        Thread(target=self.update, args=(), daemon=True).start()
+        """Bắt đầu thread đọc stream (reader tự kết nối lại khi mất stream)"""
+        if self.reader is not None:
+            self.reader.start()
         return self
 
-    def update(self):
-        """Thread liên tục đọc frame từ RTSP stream"""
-        try:
-            while not self.stopped:
-                if self.cap is None or not self.cap.isOpened():
-                    print("[WARNING] Stream bị ngắt kết nối!")
-                    time.sleep(1)
-                    # Thử kết nối lại
-                    print("[INFO] Đang thử kết nối lại...")
-                    if not self.connect():
-                        self.stopped = True
-                        break
-                    continue
-
-                ret, frame = self.cap.read()
-
-                if ret and frame is not None:
-                    self.frame = frame
-                    self.grabbed = True
-                    self.frame_count += 1
-                else:
-                    print("[WARNING] Không đọc được frame, đang thử lại...")
-                    time.sleep(0.1)
-
-        except Exception as e:
-            print(f"[ERROR] Lỗi trong thread update: {e}")
-            import traceback
-            traceback.print_exc()
-            self.stopped = True
-
     def read(self):
-        """Đọc frame hiện tại"""
+        """Đọc frame mới nhất"""
+        if self.reader is not None:
+            if self.reader.stopped and not self.stopped:
+                self.stopped = True
+            self.grabbed, self.frame = self.reader.read()
+            self.frame_count = self.reader.frames_read
         return self.grabbed, self.frame
 
     def stop(self):
         """Dừng stream"""
         self.stopped = True
-        if self.cap is not None:
-            self.cap.release()
+        if self.reader is not None:
+            self.reader.stop()
 
     def detect_faces(self, frame):
         """Phát hiện khuôn mặt trong frame"""
@@ -183,7 +158,7 @@ class RTSPFaceDetector:
         info_texts = [
             f"Faces Detected: {len(faces)}",
             f"FPS: {current_fps:.1f}",
-            f"Total Frames: {self.frame_count}",
+            f"Total Frames: {self.frame_count} | Dropped: {self.reader.frames_dropped if self.reader else 0}",
         ]
 
         y_offset = 25
@@ -0,0 +1,261 @@
+"""
+Frame Reader - Đọc stream theo kiểu "latest frame wins"
+Chức năng:
+- Thread riêng liên tục đọc (drain) buffer của OpenCV/FFmpeg để không bị trễ
+- Chỉ giữ frame mới nhất + thời điểm capture + sequence number
+- Đếm số frame bị bỏ (đọc về nhưng consumer chưa kịp lấy)
+- Tự kết nối lại khi mất stream
+
+Dùng chung cho YOLO processor (admin app) và các client trên Jetson Nano.
+"""
+
+import threading
+import time
+
+import cv2
+
+try:
+    from .metrics import Histogram
+except ImportError:  # Chạy trực tiếp trong thư mục jetson_nano
+    from metrics import Histogram
+
+
+class LatestFrameReader:
+    """
+    Đọc frame liên tục trên thread riêng, chỉ giữ frame mới nhất
+
+    source có thể là:
+    - URL / đường dẫn / index camera: mở bằng cv2.VideoCapture
+    - Callable không tham số trả về object giống cv2.VideoCapture (có read/isOpened/release)
+    """
+
+    def __init__(self, source, name=None, reconnect=True, reconnect_delay=1.0, max_failures=50):
+        """
+        Args:
+            source: URL, index camera hoặc factory tạo capture
+            name: Tên hiển thị trong log
+            reconnect: Tự mở lại source khi đọc lỗi liên tục
+            reconnect_delay: Thời gian chờ (giây) trước khi mở lại
+            max_failures: Số lần đọc lỗi liên tiếp trước khi mở lại source
+        """
+        self.source = source
+        self.name = name or str(source)
+        self.reconnect = reconnect
+        self.reconnect_delay = reconnect_delay
+        self.max_failures = max_failures
+
+        self.cap = None
+        self.stopped = False
+        self._thread = None
+        self._cond = threading.Condition()
+
+        # Frame mới nhất
+        self._frame = None
+        self._timestamp = 0.0
+        self._seq = 0
+        self._consumed_seq = 0
+
+        # Thống kê
+        self.frames_read = 0
+        self.frames_dropped = 0
+        self.reconnects = 0
+        self.read_time = Histogram()  # Thời gian mỗi lần cap.read() (giây)
+        self.on_read = None  # Callback (seq, start, end) theo perf_counter sau mỗi frame đọc được (trace)
+        self.fps = 0.0
+        self._fps_start = time.time()
+        self._fps_count = 0
+
+    # ==================== Source ====================
+
+    def open(self):
+        """
+        Mở source (có thể gọi trước start() để kiểm tra kết nối)
+
+        Returns:
+            True nếu mở thành công
+        """
+        self._release_cap()
+        try:
+            if callable(self.source):
+                cap = self.source()
+            else:
+                cap = cv2.VideoCapture(self.source)
+        except Exception as e:
+            print(f"[ERROR] [{self.name}] Không thể mở source: {e}")
+            return False
+
+        if cap is None or not cap.isOpened():
+            if cap is not None:
+                cap.release()
+            return False
+
+        self.cap = cap
+        return True
+
+    def _release_cap(self):
+        if self.cap is not None:
+            try:
+                self.cap.release()
+            except Exception:
+                pass
+            self.cap = None
+
+    def is_opened(self):
+        """Source đang mở hay không"""
+        return self.cap is not None and self.cap.isOpened()
+
+    @property
+    def source_fps(self):
+        """FPS khai báo bởi source (0 nếu không biết)"""
+        if self.cap is None or not hasattr(self.cap, "get"):
+            return 0.0
+        try:
+            return float(self.cap.get(cv2.CAP_PROP_FPS) or 0.0)
+        except Exception:
+            return 0.0
+
+    # ==================== Thread ====================
+
+    def start(self):
+        """Bắt đầu thread đọc frame (gọi nhiều lần không sao)"""
+        if self._thread is not None and self._thread.is_alive():
+            return self
+        self.stopped = False
+        self._thread = threading.Thread(target=self._update, name="reader", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Dừng thread và giải phóng source"""
+        self.stopped = True
+        with self._cond:
+            self._cond.notify_all()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout=2.0)
+        self._release_cap()
+
+    def _update(self):
+        """Thread liên tục đọc frame, ghi đè frame cũ"""
+        failures = 0
+        attempts = 0
+        opened_once = self.is_opened()
+        while not self.stopped:
+            if not self.is_opened():
+                if opened_once or attempts:
+                    if not self.reconnect:
+                        break
+                    if opened_once:
+                        print(f"[WARNING] [{self.name}] Mất kết nối, đang thử kết nối lại...")
+                    time.sleep(self.reconnect_delay)
+                    if self.stopped:
+                        break
+                attempts += 1
+                if not self.open():
+                    continue
+                if opened_once:
+                    self.reconnects += 1
+                opened_once = True
+                failures = 0
+
+            read_start = time.perf_counter()
+            try:
+                ret, frame = self.cap.read()
+            except Exception as e:
+                print(f"[ERROR] [{self.name}] Lỗi đọc frame: {e}")
+                ret, frame = False, None
+            self.read_time.observe(time.perf_counter() - read_start)
+
+            if not ret or frame is None:
+                failures += 1
+                if failures >= self.max_failures:
+                    self._release_cap()
+                    if not self.reconnect:
+                        break
+                    continue
+                time.sleep(0.01)
+                continue
+
+            failures = 0
+            self._publish(frame, time.time())
+            if self.on_read is not None:
+                self.on_read(self._seq, read_start, time.perf_counter())
+
+        self.stopped = True
+        with self._cond:
+            self._cond.notify_all()
+
+    def _publish(self, frame, timestamp):
+        """Ghi frame mới nhất, đếm frame cũ bị bỏ nếu consumer chưa lấy"""
+        with self._cond:
+            if self._seq > self._consumed_seq:
+                self.frames_dropped += 1
+            self._frame = frame
+            self._timestamp = timestamp
+            self._seq += 1
+            self.frames_read += 1
+            self._cond.notify_all()
+
+        self._fps_count += 1
+        elapsed = timestamp - self._fps_start
+        if elapsed >= 1.0:
+            self.fps = self._fps_count / elapsed
+            self._fps_start = timestamp
+            self._fps_count = 0
+
+    # ==================== Consumer API ====================
+
+    def read(self):
+        """
+        Lấy frame mới nhất (không block, giao diện giống cv2.VideoCapture.read)
+
+        Returns:
+            (grabbed, frame)
+        """
+        with self._cond:
+            if self._frame is None:
+                return False, None
+            self._consumed_seq = self._seq
+            return True, self._frame
+
+    def read_latest(self, last_seq=0, timeout=None):
+        """
+        Đợi frame mới hơn last_seq rồi trả về frame mới nhất
+
+        Args:
+            last_seq: Sequence của frame consumer đã xử lý
+            timeout: Thời gian chờ tối đa (giây)
+
+        Returns:
+            (seq, timestamp, frame) hoặc None nếu hết timeout / reader đã dừng
+        """
+        with self._cond:
+            ready = self._cond.wait_for(lambda: self._seq > last_seq or self.stopped, timeout)
+            if not ready or self._seq <= last_seq:
+                return None
+            self._consumed_seq = self._seq
+            return self._seq, self._timestamp, self._frame
+
+    def wait_for_frame(self, timeout=10.0):
+        """
+        Đợi frame đầu tiên
+
+        Returns:
+            True nếu đã có frame
+        """
+        with self._cond:
+            return self._cond.wait_for(lambda: self._frame is not None or self.stopped, timeout) and (
+                self._frame is not None
+            )
+
+    def get_stats(self):
+        """
+        Returns:
+            Dict thống kê của reader
+        """
+        return {
+            "frames_read": self.frames_read,
+            "frames_dropped": self.frames_dropped,
+            "reconnects": self.reconnects,
+            "fps": round(self.fps, 2),
+            "last_frame_age_ms": round((time.time() - self._timestamp) * 1000, 1) if self._timestamp else None,
+        }
@@ -0,0 +1,277 @@
+"""
+Frame Sources - Nguồn frame thay thế camera thật cho camera_stream_server
+Chức năng:
+- device: camera thật (cv2.VideoCapture, qua camera_discovery)
+- file: video file phát lặp theo FPS gốc hoặc tăng tốc (speed), speed=0 là nhanh nhất có thể
+- jpegdir: thư mục ảnh JPEG phát lặp theo FPS cấu hình
+- synthetic: frame tự sinh (hình chuyển động, timestamp, số frame) để load test không cần camera
+
+Mọi source có giao diện giống cv2.VideoCapture (read / isOpened / get / set / release) nên dùng thẳng
+được với CameraBroadcaster và LatestFrameReader.
+
+Cấu hình bằng CAMERA_SOURCES, các source cách nhau bởi ";", "*N" để nhân bản, tùy chọn dạng query string:
+  CAMERA_SOURCES="synthetic*24"
+  CAMERA_SOURCES="device;file:/data/cabin.mp4?speed=2;jpegdir:/data/frames?fps=15"
+  CAMERA_SOURCES="synthetic?size=1280x720&fps=60*4"
+"""
+
+import glob
+import os
+import time
+from abc import ABC, abstractmethod
+from urllib.parse import parse_qsl
+
+import cv2
+import numpy as np
+
+SOURCE_KINDS = ("device", "file", "jpegdir", "synthetic")
+
+
+class _Pacer:
+    """Giữ nhịp đọc frame theo FPS (không trôi dần theo thời gian xử lý)"""
+
+    def __init__(self, fps):
+        self.interval = 1.0 / fps if fps and fps > 0 else 0.0
+        self._next = None
+
+    def wait(self):
+        if not self.interval:
+            return
+        now = time.perf_counter()
+        if self._next is None or now - self._next > 1.0:
+            # Lần đầu hoặc bị chậm quá nhiều: đặt lại mốc thay vì đọc dồn để đuổi kịp
+            self._next = now
+        elif self._next > now:
+            time.sleep(self._next - now)
+        self._next += self.interval
+
+
+class FrameSource(ABC):
+    """Lớp cơ sở cho source không phải camera thật (lớp con cài đặt _next_frame)"""
+
+    def __init__(self, fps, width, height):
+        self.fps = fps
+        self.width = width
+        self.height = height
+        self.opened = True
+        self.frames_read = 0
+        self._pacer = _Pacer(fps)
+
+    def isOpened(self):
+        return self.opened
+
+    def read(self):
+        """
+        Returns:
+            (True, frame) hoặc (False, None)
+        """
+        if not self.opened:
+            return False, None
+        self._pacer.wait()
+        frame = self._next_frame()
+        if frame is None:
+            return False, None
+        self.frames_read += 1
+        return True, frame
+
+    @abstractmethod
+    def _next_frame(self):
+        """Frame kế tiếp (BGR) hoặc None khi hết / lỗi"""
+
+    def get(self, prop):
+        if prop == cv2.CAP_PROP_FPS:
+            return float(self.fps)
+        if prop == cv2.CAP_PROP_FRAME_WIDTH:
+            return float(self.width)
+        if prop == cv2.CAP_PROP_FRAME_HEIGHT:
+            return float(self.height)
+        return 0.0
+
+    def set(self, prop, value):
+        # Độ phân giải / FPS cố định theo cấu hình source
+        return False
+
+    def release(self):
+        self.opened = False
+
+
+class VideoFileSource(FrameSource):
+    """Phát video file theo FPS gốc nhân speed, tự quay lại đầu khi hết"""
+
+    def __init__(self, path, speed=1.0, loop=True):
+        """
+        Args:
+            path: Đường dẫn video
+            speed: Hệ số tốc độ so với FPS gốc (0 = không giới hạn)
+            loop: Phát lặp khi hết file
+        """
+        self.path = path
+        self.loop = loop
+        self.cap = cv2.VideoCapture(path)
+        native_fps = self.cap.get(cv2.CAP_PROP_FPS) or 30.0
+        super().__init__(
+            native_fps * speed if speed > 0 else 0,
+            int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+            int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+        )
+        self.opened = self.cap.isOpened()
+        if not self.opened:
+            print(f"[ERROR] Không mở được video {path}")
+
+    def _next_frame(self):
+        ret, frame = self.cap.read()
+        if not ret and self.loop:
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            ret, frame = self.cap.read()
+        return frame if ret else None
+
+    def release(self):
+        super().release()
+        self.cap.release()
+
+
+class JpegDirSource(FrameSource):
+    """Phát lần lượt các ảnh JPEG trong thư mục (sắp theo tên)"""
+
+    def __init__(self, directory, fps=30.0, loop=True, cache=True):
+        """
+        Args:
+            directory: Thư mục chứa *.jpg / *.jpeg
+            fps: Tốc độ phát
+            loop: Phát lặp khi hết ảnh
+            cache: Giữ frame đã decode trong RAM (tránh decode lại mỗi vòng)
+        """
+        self.paths = sorted(
+            path for pattern in ("*.jpg", "*.jpeg", "*.JPG") for path in glob.glob(os.path.join(directory, pattern))
+        )
+        self.loop = loop
+        self.cache = {} if cache else None
+        self.index = 0
+
+        first = cv2.imread(self.paths[0]) if self.paths else None
+        height, width = first.shape[:2] if first is not None else (0, 0)
+        super().__init__(fps, width, height)
+        self.opened = first is not None
+        if not self.opened:
+            print(f"[ERROR] Không có ảnh JPEG hợp lệ trong {directory}")
+
+    def _next_frame(self):
+        if self.index >= len(self.paths):
+            if not self.loop:
+                return None
+            self.index = 0
+
+        path = self.paths[self.index]
+        self.index += 1
+        frame = self.cache.get(path) if self.cache is not None else None
+        if frame is None:
+            frame = cv2.imread(path)
+            if frame is not None and self.cache is not None:
+                self.cache[path] = frame
+        # Trả bản copy vì consumer vẽ thêm lên frame
+        return None if frame is None else frame.copy()
+
+
+class SyntheticSource(FrameSource):
+    """Sinh frame có hình chuyển động, timestamp và số frame (dùng để load test / đo latency end-to-end)"""
+
+    def __init__(self, width=640, height=480, fps=30.0, seed=0, label=None):
+        """
+        Args:
+            width, height: Kích thước frame
+            fps: Tốc độ sinh frame (0 = không giới hạn)
+            seed: Seed cho màu / quỹ đạo (mỗi camera ảo một seed)
+            label: Chữ hiển thị trên frame
+        """
+        super().__init__(fps, width, height)
+        self.label = label or f"synthetic-{seed}"
+        rng = np.random.default_rng(seed)
+
+        # Nền gradient cố định, chỉ vẽ lại phần chuyển động mỗi frame
+        gradient = np.linspace(40, 110, width, dtype=np.uint8)
+        self.background = np.empty((height, width, 3), dtype=np.uint8)
+        self.background[:] = gradient[None, :, None]
+        self.background[..., 0] = rng.integers(30, 90)
+
+        self.shapes = [
+            {
+                "pos": rng.uniform([0, 0], [width, height]),
+                "vel": rng.uniform(-4, 4, 2) * 30 / max(fps, 1),
+                "size": int(rng.integers(30, 80)),
+                "color": tuple(int(c) for c in rng.integers(80, 255, 3)),
+                "circle": bool(i % 2),
+            }
+            for i in range(3)
+        ]
+
+    def _next_frame(self):
+        frame = self.background.copy()
+        for shape in self.shapes:
+            pos, vel = shape["pos"], shape["vel"]
+            pos += vel
+            for axis, limit in ((0, self.width), (1, self.height)):
+                if not 0 <= pos[axis] <= limit:
+                    vel[axis] = -vel[axis]
+                    pos[axis] = min(max(pos[axis], 0), limit)
+            x, y, size = int(pos[0]), int(pos[1]), shape["size"]
+            if shape["circle"]:
+                cv2.circle(frame, (x, y), size // 2, shape["color"], -1)
+            else:
+                cv2.rectangle(frame, (x - size // 2, y - size // 2), (x + size // 2, y + size // 2), shape["color"], -1)
+
+        # Timestamp (ms) + số frame để đo độ trễ / frame bị bỏ phía client
+        text = f"{self.label} #{self.frames_read} {time.time() * 1000:.0f}"
+        cv2.putText(frame, text, (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
+        return frame
+
+
+def _parse_size(value, default):
+    if not value:
+        return default
+    width, _, height = value.lower().partition("x")
+    return int(width), int(height)
+
+
+def parse_source_specs(spec):
+    """
+    Tách chuỗi CAMERA_SOURCES thành danh sách source
+
+    Returns:
+        List of (kind, target, options) (đã nhân bản theo "*N")
+    """
+    entries = []
+    for item in filter(None, (part.strip() for part in (spec or "").split(";"))):
+        count = 1
+        head, star, times = item.rpartition("*")
+        if star and times.isdigit():
+            item, count = head, int(times)
+
+        item, _, query = item.partition("?")
+        kind, _, target = item.partition(":")
+        kind = kind.strip().lower()
+        if kind not in SOURCE_KINDS:
+            raise ValueError(f"Source không hợp lệ: {kind} (hỗ trợ: {', '.join(SOURCE_KINDS)})")
+        options = dict(parse_qsl(query))
+        entries.extend([(kind, target, options)] * count)
+    return entries
+
+
+def create_source(kind, target, options, index=0):
+    """
+    Tạo một source (không gồm "device", camera thật đi qua camera_discovery)
+
+    Args:
+        kind: "file", "jpegdir" hoặc "synthetic"
+        target: Đường dẫn (file / jpegdir)
+        options: Dict tùy chọn (speed, loop, fps, size)
+        index: Số thứ tự camera ảo (seed cho synthetic)
+    """
+    loop = options.get("loop", "1") != "0"
+    if kind == "file":
+        return VideoFileSource(target, speed=float(options.get("speed", "1")), loop=loop)
+    if kind == "jpegdir":
+        return JpegDirSource(target, fps=float(options.get("fps", "30")), loop=loop)
+    if kind == "synthetic":
+        width, height = _parse_size(options.get("size"), (640, 480))
+        return SyntheticSource(width, height, fps=float(options.get("fps", "30")), seed=index, label=f"cam{index}")
+    raise ValueError(f"Source không hợp lệ: {kind}")
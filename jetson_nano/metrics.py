@@ -0,0 +1,150 @@
+"""
+Metrics - Registry metrics nhỏ theo định dạng text của Prometheus (không cần prometheus_client)
+Chức năng:
+- Histogram: đếm thời gian xử lý theo bucket cố định, observe() rẻ để gọi trong hot path
+- MetricFamily: một metric (counter / gauge / histogram) với nhiều bộ label
+- MetricsRegistry: gom các collector, mỗi lần scrape gọi collector để đọc giá trị hiện tại rồi render text
+
+Giá trị counter / gauge được đọc từ các bộ đếm sẵn có (frames_read, dropped, viewers, ...) lúc scrape,
+hot path chỉ tốn thêm Histogram.observe().
+"""
+
+import bisect
+import math
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Bucket (giây) cho thời gian đọc / inference / vẽ / encode một frame
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+
+class Histogram:
+    """Histogram theo bucket cố định (mỗi histogram chỉ nên được một thread ghi)"""
+
+    __slots__ = ("bounds", "counts", "sum", "count")
+
+    def __init__(self, bounds=DEFAULT_BUCKETS):
+        self.bounds = tuple(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)  # Bucket cuối là +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def snapshot(self):
+        """
+        Returns:
+            Dict {"buckets": [(le, số lần cộng dồn)], "sum", "count"} (picklable, gửi được qua process)
+        """
+        counts = list(self.counts)
+        cumulative, total = [], 0
+        for bound, count in zip(self.bounds + (math.inf,), counts):
+            total += count
+            cumulative.append((bound, total))
+        return {"buckets": cumulative, "sum": self.sum, "count": total}
+
+
+def _format_value(value):
+    if value == math.inf:
+        return "+Inf"
+    if isinstance(value, bool):
+        return "1" if value else "0"
+    if isinstance(value, int):
+        return str(value)
+    return repr(float(value))
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + "}"
+
+
+class MetricFamily:
+    """Một metric và các sample của nó (theo label)"""
+
+    def __init__(self, name, kind, help_text):
+        """
+        Args:
+            name: Tên metric (counter nên kết thúc bằng _total)
+            kind: "counter", "gauge" hoặc "histogram"
+            help_text: Mô tả ngắn
+        """
+        self.name = name
+        self.kind = kind
+        self.help_text = help_text
+        self.samples = []
+
+    def add(self, value, **labels):
+        """
+        Thêm một sample
+
+        Args:
+            value: Số (counter / gauge) hoặc Histogram / Histogram.snapshot() (histogram)
+            **labels: Label của sample
+        """
+        if value is None:
+            return self
+        if isinstance(value, Histogram):
+            value = value.snapshot()
+        self.samples.append((labels, value))
+        return self
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.kind}"]
+        for labels, value in self.samples:
+            if self.kind == "histogram":
+                for bound, count in value["buckets"]:
+                    bucket_labels = dict(labels, le=_format_value(bound))
+                    lines.append(f"{self.name}_bucket{_format_labels(bucket_labels)} {count}")
+                lines.append(f"{self.name}_sum{_format_labels(labels)} {_format_value(value['sum'])}")
+                lines.append(f"{self.name}_count{_format_labels(labels)} {value['count']}")
+            else:
+                lines.append(f"{self.name}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines)
+
+
+class MetricsRegistry:
+    """Gom collector, render toàn bộ metrics khi được scrape"""
+
+    def __init__(self):
+        self._collectors = []
+
+    def register(self, collector):
+        """
+        Đăng ký collector
+
+        Args:
+            collector: Hàm không tham số trả về list MetricFamily
+        """
+        self._collectors.append(collector)
+        return collector
+
+    def collect(self):
+        """
+        Returns:
+            List MetricFamily (family cùng tên từ nhiều collector được gộp lại)
+        """
+        families = {}
+        for collector in self._collectors:
+            for family in collector():
+                existing = families.get(family.name)
+                if existing is None:
+                    families[family.name] = family
+                else:
+                    existing.samples.extend(family.samples)
+        return list(families.values())
+
+    def render(self):
+        """
+        Returns:
+            Text theo định dạng exposition của Prometheus
+        """
+        return "\n".join(family.render() for family in self.collect() if family.samples) + "\n"
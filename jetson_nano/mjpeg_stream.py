@@ -0,0 +1,398 @@
+"""
+MJPEG Stream - Đọc trực tiếp HTTP multipart (MJPEG) mà không qua cv2.VideoCapture
+Chức năng:
+- Tách từng part JPEG theo boundary trong Content-Type (dùng Content-Length nếu server gửi),
+  không tích lũy bytes / quét lại từ đầu sau mỗi chunk
+- Trả về bytes JPEG gốc (không decode) để forward nguyên vẹn cho viewer
+- Chỉ decode khi cần (frame được chọn để inference / vẽ overlay)
+- Giao diện giống cv2.VideoCapture (read / isOpened / release) để dùng với LatestFrameReader
+"""
+
+import re
+
+import cv2
+import numpy as np
+import requests
+
+_BOUNDARY_RE = re.compile(rb'boundary="?([^";,]+)"?', re.IGNORECASE)
+
+
+def parse_boundary(content_type):
+    """
+    Lấy boundary từ header Content-Type của multipart response
+
+    Args:
+        content_type: Giá trị header Content-Type
+
+    Returns:
+        Boundary (bytes, không có tiền tố --) hoặc None
+    """
+    if isinstance(content_type, str):
+        content_type = content_type.encode("latin-1")
+    match = _BOUNDARY_RE.search(content_type or b"")
+    if not match:
+        return None
+    boundary = match.group(1).strip()
+    # Một số server khai báo boundary kèm sẵn "--"
+    return boundary[2:] if boundary.startswith(b"--") else boundary
+
+
+def decode_jpeg(jpeg_bytes):
+    """
+    Decode bytes JPEG thành frame BGR
+
+    Returns:
+        Frame hoặc None nếu dữ liệu hỏng
+    """
+    if not jpeg_bytes:
+        return None
+    return cv2.imdecode(np.frombuffer(jpeg_bytes, dtype=np.uint8), cv2.IMREAD_COLOR)
+
+
+class MJPEGDemuxer:
+    """
+    Tách multipart MJPEG thành các frame JPEG, nhận dữ liệu theo từng chunk
+
+    Mỗi part: --boundary CRLF, header CRLF, CRLF, body. Body kết thúc theo Content-Length
+    (nếu có) hoặc tại CRLF--boundary của part kế tiếp. Không dò marker 0xFFD8 / 0xFFD9 nên
+    không bị cắt sai khi JPEG chứa thumbnail EXIF.
+
+    Buffer là một bytearray với vị trí đọc (_start) và vị trí tiếp tục tìm kiếm (_scan): mỗi
+    byte chỉ được quét một lần, phần đã đọc chỉ bị xóa khi chiếm quá nửa buffer.
+    """
+
+    _SEEK, _HEADERS, _BODY = range(3)
+    _MAX_HEADER_SIZE = 16384
+
+    def __init__(self, boundary=None, max_frame_size=8 * 1024 * 1024):
+        """
+        Args:
+            boundary: Boundary của multipart (bytes hoặc str, không có tiền tố --).
+                None để tự nhận từ dòng "--..." đầu tiên của stream
+            max_frame_size: Kích thước part tối đa (theo Content-Length hoặc theo dữ liệu đã nhận), vượt quá thì
+                bỏ part và đồng bộ lại ở boundary kế tiếp (tránh buffer phình vô hạn)
+        """
+        self.max_frame_size = max_frame_size
+        self.delimiter = None
+        self.body_end = None
+        if boundary is not None:
+            self._set_boundary(boundary)
+
+        self._buffer = bytearray()
+        self._start = 0  # Đầu phần dữ liệu chưa xử lý
+        self._scan = 0  # Vị trí tiếp tục tìm kiếm (không quét lại từ đầu)
+        self._state = self._SEEK
+        self._content_length = None
+
+        # Thống kê
+        self.frames = 0
+        self.bytes_in = 0
+        self.discarded = 0
+
+    def _set_boundary(self, boundary):
+        if isinstance(boundary, str):
+            boundary = boundary.encode("latin-1")
+        self.boundary = boundary
+        self.delimiter = b"--" + boundary
+        self.body_end = b"\r\n" + self.delimiter
+
+    def feed(self, data):
+        """
+        Đưa thêm dữ liệu vào demuxer
+
+        Args:
+            data: Chunk bytes vừa nhận
+
+        Returns:
+            List bytes JPEG của các frame đã hoàn chỉnh
+        """
+        self.bytes_in += len(data)
+        self._buffer += data
+        frames = []
+
+        while True:
+            if self._state == self._SEEK:
+                if not self._seek_part():
+                    break
+                self._state = self._HEADERS
+
+            elif self._state == self._HEADERS:
+                if not self._read_headers():
+                    break
+                self._state = self._BODY
+
+            else:
+                frame = self._read_body()
+                if frame is None:
+                    break
+                if frame:
+                    self.frames += 1
+                    frames.append(frame)
+                self._state = self._SEEK
+                self._content_length = None
+
+        self._compact()
+        return frames
+
+    def iter_frames(self, chunks):
+        """
+        Tách frame từ một iterable chunk (ví dụ response.iter_content())
+
+        Yields:
+            Bytes JPEG của từng frame
+        """
+        for chunk in chunks:
+            yield from self.feed(chunk)
+
+    def _seek_part(self):
+        """Tìm dòng --boundary mở đầu part, trả False nếu cần thêm dữ liệu"""
+        buffer = self._buffer
+        if self.delimiter is None:
+            # Chưa biết boundary: lấy từ dòng đầu tiên bắt đầu bằng "--"
+            index = buffer.find(b"--", self._scan)
+            if index < 0:
+                self._skip_to(len(buffer) - 1)
+                return False
+            line_end = buffer.find(b"\r\n", index)
+            if line_end < 0:
+                self._skip_to(index)
+                return False
+            self._set_boundary(bytes(buffer[index + 2 : line_end]).strip())
+            self._skip_to(line_end + 2)
+            return True
+
+        index = buffer.find(self.delimiter, self._scan)
+        if index < 0:
+            # Giữ lại phần đuôi có thể là đầu của delimiter
+            self._skip_to(len(buffer) - len(self.delimiter) + 1)
+            return False
+        line_end = buffer.find(b"\r\n", index + len(self.delimiter))
+        if line_end < 0:
+            self._skip_to(index)
+            return False
+        self._skip_to(line_end + 2)
+        return True
+
+    def _read_headers(self):
+        """Đọc header của part (lấy Content-Length), trả False nếu cần thêm dữ liệu"""
+        buffer = self._buffer
+        if buffer.startswith(b"\r\n", self._start):
+            self._content_length = None  # Part không có header
+            self._skip_to(self._start + 2)
+            return True
+
+        end = buffer.find(b"\r\n\r\n", self._scan)
+        if end < 0:
+            self._scan = max(self._start, len(buffer) - 3)
+            if len(buffer) - self._start > self._MAX_HEADER_SIZE:
+                self.discarded += 1
+                self._reset()
+            return False
+
+        self._content_length = self._parse_content_length(memoryview(buffer)[self._start : end])
+        self._skip_to(end + 4)
+        return True
+
+    def _read_body(self):
+        """Trả bytes của body nếu đã đủ, b"" nếu part bị bỏ, None nếu cần thêm dữ liệu"""
+        buffer = self._buffer
+        if self._content_length is not None:
+            if not 0 <= self._content_length <= self.max_frame_size:
+                # Content-Length vượt giới hạn (hoặc âm): bỏ part, SEEK bỏ qua body tới boundary kế tiếp
+                # mà không giữ body trong buffer
+                self.discarded += 1
+                return b""
+            end = self._start + self._content_length
+            if len(buffer) < end:
+                return None
+            frame = bytes(memoryview(buffer)[self._start : end])
+            self._skip_to(end)
+            return frame
+
+        index = buffer.find(self.body_end, self._scan)
+        if index < 0:
+            if len(buffer) - self._start > self.max_frame_size:
+                self.discarded += 1
+                self._reset()
+                return b""
+            self._scan = max(self._start, len(buffer) - len(self.body_end) + 1)
+            return None
+
+        frame = bytes(memoryview(buffer)[self._start : index])
+        self._skip_to(index + 2)  # Giữ "--boundary" cho bước SEEK
+        return frame
+
+    @staticmethod
+    def _parse_content_length(headers):
+        for line in bytes(headers).split(b"\r\n"):
+            name, _, value = line.partition(b":")
+            if name.strip().lower() == b"content-length":
+                try:
+                    return int(value.strip())
+                except ValueError:
+                    return None
+        return None
+
+    def _skip_to(self, position):
+        """Đánh dấu dữ liệu trước position là đã xử lý"""
+        self._start = self._scan = max(self._start, position)
+
+    def _compact(self):
+        """Xóa phần đã xử lý khi chiếm quá nửa buffer (tránh memmove sau mỗi frame)"""
+        if self._start and self._start * 2 >= len(self._buffer):
+            del self._buffer[: self._start]
+            self._scan -= self._start
+            self._start = 0
+
+    def _reset(self):
+        self._buffer.clear()
+        self._start = 0
+        self._scan = 0
+        self._state = self._SEEK
+        self._content_length = None
+
+
+class MJPEGCapture:
+    """
+    Đọc MJPEG qua HTTP, trả bytes JPEG gốc (hoặc frame đã decode nếu decode=True)
+    Giao diện giống cv2.VideoCapture để dùng với LatestFrameReader
+    """
+
+    # Số chunk liên tiếp không tách được frame nào trước khi coi stream là hỏng
+    # (mặc định 256 chunk x 64KB = 16MB, gấp đôi max_frame_size của demuxer)
+    DEFAULT_MAX_EMPTY_CHUNKS = 256
+
+    def __init__(
+        self,
+        url=None,
+        timeout=5.0,
+        chunk_size=65536,
+        decode=False,
+        response=None,
+        max_empty_chunks=DEFAULT_MAX_EMPTY_CHUNKS,
+        max_frame_size=8 * 1024 * 1024,
+    ):
+        """
+        Args:
+            url: URL của MJPEG stream (ví dụ http://jetson:5000/video_feed/0)
+            timeout: Timeout kết nối / đọc (giây)
+            chunk_size: Kích thước mỗi lần đọc socket
+            decode: True để read() trả frame BGR thay vì bytes JPEG
+            response: Response streaming đã mở sẵn (ví dụ sau khi bypass ngrok), dùng thay cho url
+            max_empty_chunks: Số chunk liên tiếp tối đa không tách được frame nào (None = không giới hạn)
+            max_frame_size: Kích thước part tối đa (bytes), part lớn hơn bị bỏ
+        """
+        self.url = url if response is None else response.url
+        self.decode = decode
+        self.max_empty_chunks = max_empty_chunks
+        self.response = None
+        self._pending = []
+
+        if response is None:
+            try:
+                response = requests.get(url, stream=True, timeout=timeout)
+                response.raise_for_status()
+            except requests.RequestException as e:
+                print(f"[ERROR] Không thể kết nối MJPEG stream {url}: {e}")
+                return
+
+        # Chỉ nhận multipart/x-mixed-replace, hoặc body bắt đầu bằng dòng "--boundary"
+        # (server khai báo sai Content-Type). Còn lại (HLS, MP4, trang HTML, ...) để caller
+        # mở bằng cv2.VideoCapture
+        content_type = response.headers.get("Content-Type", "")
+        boundary = parse_boundary(content_type)
+        chunks = response.iter_content(chunk_size=chunk_size)
+        first_chunk = b""
+        if "multipart/x-mixed-replace" not in content_type.lower():
+            try:
+                first_chunk = next(chunks, b"")
+            except requests.RequestException as e:
+                print(f"[ERROR] Lỗi đọc MJPEG stream {self.url}: {e}")
+                response.close()
+                return
+            if not is_multipart_start(first_chunk, boundary):
+                print(f"[WARNING] {self.url} không phải multipart MJPEG (Content-Type: {content_type or 'không có'})")
+                response.close()
+                return
+
+        self.response = response
+        # Không có boundary trong header: demuxer tự nhận từ dòng "--..." đầu tiên
+        self.demuxer = MJPEGDemuxer(boundary, max_frame_size=max_frame_size)
+        self._chunks = chunks
+        if first_chunk:
+            self._pending = self.demuxer.feed(first_chunk)
+
+    def isOpened(self):
+        return self.response is not None
+
+    def read(self):
+        """
+        Đọc frame tiếp theo (block tới khi có một part hoàn chỉnh)
+
+        Returns:
+            (True, jpeg_bytes hoặc frame) hoặc (False, None) khi stream kết thúc
+        """
+        if self.response is None:
+            return False, None
+
+        empty_chunks = 0
+        try:
+            while not self._pending:
+                chunk = next(self._chunks, None)
+                if chunk is None:
+                    self.release()
+                    return False, None
+                self._pending = self.demuxer.feed(chunk)
+
+                empty_chunks += 1
+                if self.max_empty_chunks and not self._pending and empty_chunks >= self.max_empty_chunks:
+                    print(f"[ERROR] Không nhận được JPEG data sau {empty_chunks} chunks!")
+                    self.release()
+                    return False, None
+        except requests.RequestException as e:
+            print(f"[ERROR] Lỗi đọc MJPEG stream {self.url}: {e}")
+            self.release()
+            return False, None
+
+        # Chỉ lấy part mới nhất trong các part vừa tách được
+        jpeg_bytes = self._pending[-1]
+        self._pending = []
+
+        if not self.decode:
+            return True, jpeg_bytes
+        frame = decode_jpeg(jpeg_bytes)
+        return frame is not None, frame
+
+    def get(self, prop):
+        # Tương thích cv2.VideoCapture.get (MJPEG qua HTTP không khai báo FPS)
+        return 0.0
+
+    def release(self):
+        if self.response is not None:
+            self.response.close()
+            self.response = None
+
+
+def is_multipart_start(data, boundary=None):
+    """
+    Kiểm tra bytes đầu của body có phải mở đầu một part multipart không
+
+    Args:
+        data: Chunk đầu tiên của body
+        boundary: Boundary từ Content-Type (None nếu không có)
+
+    Returns:
+        True nếu (sau CRLF / khoảng trắng đầu) là dòng "--boundary"
+    """
+    data = bytes(data[:1024]).lstrip()
+    if boundary is not None:
+        return data.startswith(b"--" + boundary)
+    line_end = data.find(b"\r\n")
+    # Dòng boundary: "--" + token không rỗng, không chứa khoảng trắng / ký tự điều khiển
+    token = data[2:line_end] if line_end > 2 else b""
+    return data.startswith(b"--") and bool(token) and all(33 <= byte < 127 for byte in token)
+
+
+def is_mjpeg_url(url):
+    """URL HTTP(S) có thể là MJPEG stream (MJPEGCapture kiểm tra Content-Type / boundary khi mở)"""
+    return isinstance(url, str) and url.lower().startswith(("http://", "https://"))
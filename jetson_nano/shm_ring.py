@@ -0,0 +1,325 @@
+"""
+Shared Memory Ring - Vòng slot trong shared memory để chuyển frame / JPEG giữa các process
+Chức năng:
+- Một writer, nhiều reader; mỗi slot chứa một payload (JPEG hoặc frame thô) kèm seq / timestamp / shape
+- Reader copy payload một lần, kiểm tra seq trước và sau khi copy (seqlock) để phát hiện slot bị ghi đè
+- Reader chỉ cần tên shared memory (không truyền bytes qua pipe / socket)
+- Reader ghi heartbeat vào header: writer bỏ qua việc ghi khi không còn reader nào
+- ShmCapture: đọc frame thô của camera_stream_server (shm://camera/<id>) với giao diện giống cv2.VideoCapture
+
+Layout:
+    header (64 bytes): magic, số slot, kích thước slot, seq mới nhất, heartbeat của reader
+    slot i: header slot (40 bytes: seq, length, timestamp, width, height, channels) + payload
+"""
+
+import re
+import struct
+import time
+from multiprocessing import resource_tracker, shared_memory
+from urllib.parse import parse_qsl, urlsplit
+
+import numpy as np
+
+_MAGIC = b"LCRING01"
+_HEADER = struct.Struct("<8sIIQ")  # magic, slots, slot_size, latest_seq
+_HEADER_SIZE = 64
+_SLOT_HEADER = struct.Struct("<QQdIII4x")  # seq, length, timestamp, width, height, channels
+_LATEST_OFFSET = 16
+_HEARTBEAT_OFFSET = 24
+
+SHM_SCHEME = "shm://"
+DEFAULT_CAMERA_PORT = 5000
+_LOCAL_FEED = re.compile(r"^http://(?:localhost|127\.0\.0\.1)(?::(\d+))?/video_feed/(\d+)/?$")
+
+
+def _attach(name, shared_tracker=False):
+    """
+    Gắn vào segment có sẵn (reader không sở hữu segment)
+
+    Args:
+        name: Tên shared memory
+        shared_tracker: True nếu reader dùng chung resource_tracker với writer (cùng process, hoặc process con
+            tạo bằng multiprocessing từ writer): đăng ký khi gắn trùng với của writer, không được gỡ
+
+    Returns:
+        SharedMemory
+    """
+    shm = shared_memory.SharedMemory(name=name)
+    if not shared_tracker:
+        # SharedMemory luôn đăng ký segment khi gắn: tracker của reader sẽ unlink segment khi reader thoát
+        resource_tracker.unregister(shm._name, "shared_memory")
+    return shm
+
+
+class ShmRing:
+    """Vòng slot trong multiprocessing.shared_memory"""
+
+    def __init__(self, name=None, slots=4, slot_size=2 * 1024 * 1024, create=False, replace=False, shared_tracker=False):
+        """
+        Args:
+            name: Tên shared memory (None khi create=True để hệ thống tự đặt)
+            slots: Số slot (chỉ dùng khi create)
+            slot_size: Kích thước payload tối đa mỗi slot (chỉ dùng khi create)
+            create: True để tạo mới (writer), False để gắn vào ring có sẵn (reader)
+            replace: Khi create, xóa segment cùng tên còn sót lại (writer trước bị kill) rồi tạo lại
+            shared_tracker: Reader dùng chung resource_tracker với writer (xem _attach)
+        """
+        if create:
+            size = _HEADER_SIZE + slots * (_SLOT_HEADER.size + slot_size)
+            try:
+                self.shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+            except FileExistsError:
+                if not replace:
+                    raise
+                # Gắn có đăng ký: unlink() gỡ đăng ký tương ứng
+                stale = shared_memory.SharedMemory(name=name)
+                stale.close()
+                stale.unlink()
+                self.shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+            self.shm.buf[:_HEADER_SIZE] = bytes(_HEADER_SIZE)
+            _HEADER.pack_into(self.shm.buf, 0, _MAGIC, slots, slot_size, 0)
+        else:
+            self.shm = _attach(name, shared_tracker)
+            magic, slots, slot_size, _ = _HEADER.unpack_from(self.shm.buf, 0)
+            if magic != _MAGIC:
+                self.shm.close()
+                raise ValueError(f"Shared memory {name} không phải ShmRing")
+
+        self.name = self.shm.name
+        self.slots = slots
+        self.slot_size = slot_size
+        self.owner = create
+        self._stride = _SLOT_HEADER.size + slot_size
+
+    def _slot_offset(self, seq):
+        return _HEADER_SIZE + (seq % self.slots) * self._stride
+
+    @property
+    def latest_seq(self):
+        return struct.unpack_from("<Q", self.shm.buf, _LATEST_OFFSET)[0]
+
+    @property
+    def last_heartbeat(self):
+        """Thời điểm reader đọc gần nhất (0 nếu chưa có reader)"""
+        return struct.unpack_from("<d", self.shm.buf, _HEARTBEAT_OFFSET)[0]
+
+    def heartbeat(self):
+        """Reader báo vẫn đang đọc"""
+        struct.pack_into("<d", self.shm.buf, _HEARTBEAT_OFFSET, time.time())
+
+    def has_readers(self, timeout=2.0):
+        """Có reader heartbeat trong timeout giây gần đây"""
+        return time.time() - self.last_heartbeat < timeout
+
+    def write(self, payload, timestamp=None, shape=(0, 0, 0)):
+        """
+        Ghi payload vào slot kế tiếp
+
+        Args:
+            payload: bytes / bytearray / memoryview / np.ndarray liên tục
+            timestamp: Thời điểm capture (mặc định time.time())
+            shape: (height, width, channels) nếu payload là frame thô
+
+        Returns:
+            seq của payload hoặc None nếu payload lớn hơn slot
+        """
+        data = memoryview(payload).cast("B")
+        if data.nbytes > self.slot_size:
+            return None
+
+        seq = self.latest_seq + 1
+        offset = self._slot_offset(seq)
+        height, width, channels = (tuple(shape) + (1,))[:3] if len(shape) == 2 else shape
+
+        # seq = 0 trong lúc ghi: reader đang copy slot này sẽ thấy seq đổi và bỏ kết quả
+        _SLOT_HEADER.pack_into(self.shm.buf, offset, 0, 0, 0.0, 0, 0, 0)
+        start = offset + _SLOT_HEADER.size
+        self.shm.buf[start : start + data.nbytes] = data
+        _SLOT_HEADER.pack_into(
+            self.shm.buf,
+            offset,
+            seq,
+            data.nbytes,
+            time.time() if timestamp is None else timestamp,
+            width,
+            height,
+            channels,
+        )
+        struct.pack_into("<Q", self.shm.buf, _LATEST_OFFSET, seq)
+        return seq
+
+    def read(self, seq=None):
+        """
+        Đọc payload theo seq (mặc định mới nhất)
+
+        Returns:
+            (seq, bytes, timestamp, (height, width, channels)) hoặc None nếu slot đã bị ghi đè / chưa có dữ liệu
+        """
+        seq = self.latest_seq if seq is None else seq
+        if seq == 0:
+            return None
+        offset = self._slot_offset(seq)
+
+        slot_seq, length, timestamp, width, height, channels = _SLOT_HEADER.unpack_from(self.shm.buf, offset)
+        if slot_seq != seq:
+            return None
+        start = offset + _SLOT_HEADER.size
+        payload = bytes(self.shm.buf[start : start + length])
+
+        # Seqlock: slot bị ghi đè trong lúc copy thì bỏ
+        if _SLOT_HEADER.unpack_from(self.shm.buf, offset)[0] != seq:
+            return None
+        return seq, payload, timestamp, (height, width, channels)
+
+    def read_frame(self, seq=None):
+        """
+        Đọc payload là frame thô (uint8)
+
+        Returns:
+            (seq, frame, timestamp) hoặc None
+        """
+        seq = self.latest_seq if seq is None else seq
+        if seq == 0:
+            return None
+        offset = self._slot_offset(seq)
+
+        slot_seq, length, timestamp, width, height, channels = _SLOT_HEADER.unpack_from(self.shm.buf, offset)
+        if slot_seq != seq or length != width * height * channels:
+            return None
+        # Copy thẳng từ shared memory vào array mới (một lần copy, array ghi được để vẽ overlay)
+        frame = np.frombuffer(self.shm.buf, dtype=np.uint8, count=length, offset=offset + _SLOT_HEADER.size).copy()
+
+        if _SLOT_HEADER.unpack_from(self.shm.buf, offset)[0] != seq:
+            return None
+        return seq, frame.reshape(height, width, channels), timestamp
+
+    def close(self):
+        """Đóng ring (writer sở hữu segment thì xóa luôn)"""
+        try:
+            self.shm.close()
+            if self.owner:
+                self.shm.unlink()
+        except FileNotFoundError:
+            pass
+
+
+def shm_ring_name(camera_id, port=DEFAULT_CAMERA_PORT):
+    """Tên ring frame thô của camera camera_id trên camera_stream_server chạy ở port"""
+    return f"live_cam_{port}_cam{camera_id}"
+
+
+def is_shm_url(url):
+    return isinstance(url, str) and url.startswith(SHM_SCHEME)
+
+
+def parse_shm_url(url):
+    """
+    Tách URL shm://camera/<id>[?port=<port>] thành tên ring
+
+    Returns:
+        Tên shared memory
+
+    Raises:
+        ValueError: URL không đúng dạng
+    """
+    parts = urlsplit(url)
+    camera_id = parts.path.strip("/")
+    if parts.scheme != "shm" or parts.netloc != "camera" or not camera_id.isdigit():
+        raise ValueError(f"URL shared memory không hợp lệ: {url} (dạng shm://camera/<id>[?port=<port>])")
+    port = int(dict(parse_qsl(parts.query)).get("port", DEFAULT_CAMERA_PORT))
+    return shm_ring_name(int(camera_id), port)
+
+
+def local_shm_url(stream_url):
+    """
+    URL shm:// tương ứng với http://localhost:<port>/video_feed/<id> (camera_stream_server cùng máy)
+
+    Returns:
+        URL shm:// hoặc None nếu stream_url không phải camera server local
+    """
+    match = _LOCAL_FEED.match(stream_url or "")
+    if match is None:
+        return None
+    port, camera_id = match.group(1) or "80", match.group(2)
+    return f"{SHM_SCHEME}camera/{camera_id}?port={port}"
+
+
+def ring_exists(name):
+    """Có ring đang được publish với tên này không"""
+    try:
+        ring = ShmRing(name)
+    except (FileNotFoundError, ValueError):
+        return False
+    ring.close()
+    return True
+
+
+class ShmCapture:
+    """
+    Đọc frame thô từ ring (giao diện giống cv2.VideoCapture, dùng được với LatestFrameReader)
+    Không encode / decode JPEG: frame được copy một lần từ shared memory
+    """
+
+    def __init__(self, name, timeout=1.0, stale_timeout=3.0, poll_interval=0.002):
+        """
+        Args:
+            name: Tên ring (xem shm_ring_name / parse_shm_url)
+            timeout: Thời gian chờ frame mới tối đa mỗi lần read (giây)
+            stale_timeout: Không có frame mới quá thời gian này thì coi như mất kết nối
+                (camera server khởi động lại sẽ tạo ring mới, reader cần mở lại)
+            poll_interval: Chu kỳ kiểm tra seq mới (giây)
+        """
+        self.name = name
+        self.timeout = timeout
+        self.stale_timeout = stale_timeout
+        self.poll_interval = poll_interval
+        try:
+            self.ring = ShmRing(name)
+        except (FileNotFoundError, ValueError) as e:
+            print(f"[ERROR] Không mở được shared memory {name}: {e}")
+            self.ring = None
+        self.last_seq = self.ring.latest_seq if self.ring is not None else 0
+        self.last_frame_time = time.time()
+        self.frames_read = 0
+        if self.ring is not None:
+            self.ring.heartbeat()
+
+    def isOpened(self):
+        return self.ring is not None and time.time() - self.last_frame_time < self.stale_timeout
+
+    def read(self):
+        """
+        Đợi frame mới hơn frame đã đọc
+
+        Returns:
+            (True, frame) hoặc (False, None) nếu hết timeout
+        """
+        if self.ring is None:
+            return False, None
+        deadline = time.time() + self.timeout
+        while True:
+            self.ring.heartbeat()
+            seq = self.ring.latest_seq
+            if seq > self.last_seq:
+                item = self.ring.read_frame(seq)
+                if item is not None:
+                    self.last_seq, frame, _ = item
+                    self.last_frame_time = time.time()
+                    self.frames_read += 1
+                    return True, frame
+                # Slot đang được ghi / vừa bị ghi đè: thử lại với seq mới nhất sau poll_interval
+                # (vẫn kiểm tra deadline, không quay vòng liên tục nếu slot hỏng)
+            if time.time() >= deadline:
+                return False, None
+            time.sleep(self.poll_interval)
+
+    def get(self, prop):
+        return 0.0
+
+    def set(self, prop, value):
+        return False
+
+    def release(self):
+        if self.ring is not None:
+            self.ring.close()
+            self.ring = None
@@ -2,10 +2,21 @@
 API Routes - RESTful API endpoints
 """
 
+import json
 from flask import Blueprint, request, jsonify, Response
 from datetime import datetime
 from utils.data_manager import load_drivers_data, save_drivers_data
-from yolo_processor import get_processor, remove_processor, get_active_streams
+from utils.outbox import get_metadata_outbox_registry, get_outbox_registry, get_raw_outbox_registry
+from yolo_processor import (
+    StreamLimitError,
+    export_trace,
+    find_processor,
+    get_active_streams,
+    get_processor,
+    get_registry,
+    remove_processor,
+    set_tracing,
+)
 
 api_bp = Blueprint("api", __name__, url_prefix="/api")
 
@@ -118,6 +129,9 @@ def start_yolo_detection():
 
         return jsonify({"message": "Đã bắt đầu YOLO detection", "stream_url": stream_url}), 200
 
+    except StreamLimitError as e:
+        # Quá số stream đồng thời: báo rõ cho client thử lại sau thay vì làm quá tải máy
+        return jsonify({"error": str(e)}), 503, {"Retry-After": "10"}
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -161,6 +175,7 @@ def yolo_video_stream():
 
     Query params:
         stream_url: URL của stream gốc
+        overlay: "0" để nhận JPEG gốc không vẽ overlay (passthrough, mặc định "1")
 
     Returns:
         Response chứa video stream (MJPEG format)
@@ -171,12 +186,13 @@ def yolo_video_stream():
         if not stream_url:
             return jsonify({"error": "Thiếu stream_url trong query params"}), 400
         
-        processor = get_processor(stream_url)
-        
-        if not processor.is_running:
+        processor = find_processor(stream_url)
+
+        if processor is None or not processor.is_running:
             return jsonify({"error": "Stream chưa được khởi động"}), 400
-        
-        return Response(processor.generate_frames(), mimetype="multipart/x-mixed-replace; boundary=frame")
+
+        raw = request.args.get("overlay", "1") == "0"
+        return Response(processor.generate_frames(raw=raw), mimetype="multipart/x-mixed-replace; boundary=frame")
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -193,7 +209,111 @@ def get_yolo_active_streams():
         active_streams = get_active_streams()
         return jsonify({
             "active_streams": active_streams,
-            "count": len(active_streams)
+            "count": len(active_streams),
+            "registry": get_registry().get_stats(),
         }), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 500
+
+
+@api_bp.route("/yolo/stats", methods=["GET"])
+def get_yolo_stats():
+    """
+    API lấy thống kê pipeline của một stream (FPS từng stage, tần suất detect đã chọn, ...)
+
+    Query params:
+        stream_url: URL của stream gốc
+
+    Returns:
+        JSON thống kê của processor
+    """
+    try:
+        stream_url = request.args.get("stream_url")
+
+        if not stream_url:
+            return jsonify({"error": "Thiếu stream_url trong query params"}), 400
+
+        processor = find_processor(stream_url)
+
+        if processor is None:
+            return jsonify({"error": "Stream chưa được khởi động"}), 404
+
+        return jsonify(processor.get_stats()), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@api_bp.route("/yolo/clients", methods=["GET"])
+def get_yolo_clients():
+    """
+    API thống kê flow control theo từng client WebSocket
+
+    Query params:
+        stream_url: (tùy chọn) chỉ lấy client của stream này
+
+    Returns:
+        JSON {clients | metadata_clients | raw_clients: {stream_url: {sid: {sent, acked, dropped, ack_timeouts, bytes_sent,
+        in_flight, last_rtt_ms}}}}
+    """
+    try:
+        stream_url = request.args.get("stream_url")
+        return (
+            jsonify(
+                {
+                    "clients": get_outbox_registry().get_stats(stream_url),
+                    "metadata_clients": get_metadata_outbox_registry().get_stats(stream_url),
+                    "raw_clients": get_raw_outbox_registry().get_stats(stream_url),
+                }
+            ),
+            200,
+        )
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@api_bp.route("/yolo/trace", methods=["POST"])
+def control_yolo_trace():
+    """
+    API bật / tắt trace span theo frame của pipeline
+
+    Request body:
+        {
+            "action": "enable" | "disable" | "clear",
+            "capacity": 50000  (tùy chọn, số span tối đa giữ trong RAM)
+        }
+
+    Returns:
+        JSON trạng thái tracer {enabled, capacity, buffered, recorded}
+    """
+    try:
+        request_data = request.get_json() or {}
+        action = request_data.get("action")
+        if action not in ("enable", "disable", "clear"):
+            return jsonify({"error": "action phải là enable, disable hoặc clear"}), 400
+
+        capacity = request_data.get("capacity")
+        return jsonify(set_tracing(action, int(capacity) if capacity else None)), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@api_bp.route("/yolo/trace", methods=["GET"])
+def get_yolo_trace():
+    """
+    API xuất span đã ghi thành file Chrome trace (mở bằng chrome://tracing hoặc https://ui.perfetto.dev)
+
+    Query params:
+        stream_url: (tùy chọn) chỉ lấy span của stream này
+
+    Returns:
+        JSON theo Trace Event Format (tải về yolo_trace.json)
+    """
+    try:
+        trace = export_trace(request.args.get("stream_url"))
+        return Response(
+            json.dumps(trace),
+            mimetype="application/json",
+            headers={"Content-Disposition": "attachment; filename=yolo_trace.json"},
+        )
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
@@ -1,17 +1,43 @@
 /**
  * WebSocket YOLO Streaming Module
  * Sử dụng Socket.IO để stream video với latency thấp
+ *
+ * Ba chế độ (STREAM_MODES trong admin_app.py):
+ * - 'pixels': server gửi JPEG đã vẽ overlay (event yolo_frame), vẽ lên canvas
+ * - 'metadata': server chỉ gửi detections (event yolo_detections), client vẽ overlay
+ *   lên canvas trong suốt đặt trên stream camera gốc
+ * - 'passthrough': server forward JPEG gốc của camera (yolo_frame, không overlay) kèm
+ *   detections (yolo_detections), client vẽ overlay lên canvas frame
  */
 
+// Màu theo class (giống màu BGR phía server, đổi sang CSS)
+const YOLO_CLASS_COLORS = {
+    sleepy_eye: 'rgb(255, 0, 0)',
+    yawn: 'rgb(255, 140, 0)',
+    look_away: 'rgb(255, 255, 0)',
+    phone: 'rgb(255, 0, 255)',
+    rub_eye: 'rgb(255, 180, 60)',
+    natural: 'rgb(0, 255, 0)'
+};
+
 class YOLOWebSocketStreamer {
-    constructor(streamUrl) {
+    constructor(streamUrl, options = {}) {
         this.streamUrl = streamUrl;
+        this.mode = options.mode || 'pixels';
         this.socket = null;
         this.canvas = null;
         this.ctx = null;
         this.isStreaming = false;
         this.lastObjectURL = null;  // Track last URL to revoke
         this.isRendering = false;    // Prevent frame backlog
+
+        // Chế độ metadata: element hiển thị stream gốc + canvas overlay phía trên
+        this.videoElement = null;
+        this.overlayCanvas = null;
+        this.overlayCtx = null;
+        this.classNames = {};
+        this.lastDetections = null;
+        this.onResize = () => this.drawDetections(this.lastDetections);
     }
 
     /**
@@ -38,13 +64,20 @@ class YOLOWebSocketStreamer {
         });
 
         // Event: Nhận frame từ server (binary data)
-        this.socket.on('yolo_frame', (frameBytes) => {
-            this.renderFrame(frameBytes);
+        // Ack sau khi render xong để server chỉ gửi frame tiếp theo khi client đã sẵn sàng
+        this.socket.on('yolo_frame', (frameBytes, ack) => {
+            this.renderFrame(frameBytes, ack);
+        });
+
+        // Event: Nhận metadata detection (chế độ metadata), ack sau khi vẽ overlay
+        this.socket.on('yolo_detections', (payload, ack) => {
+            this.renderDetections(payload, ack);
         });
 
         // Event: Stream started
         this.socket.on('stream_started', (data) => {
-            console.log('[WebSocket] Stream started:', data.stream_url);
+            console.log('[WebSocket] Stream started:', data.stream_url, `(${data.mode || 'pixels'})`);
+            this.classNames = data.class_names || {};
             this.isStreaming = true;
         });
 
@@ -52,6 +85,7 @@ class YOLOWebSocketStreamer {
         this.socket.on('stream_stopped', (data) => {
             console.log('[WebSocket] Stream stopped:', data.stream_url);
             this.isStreaming = false;
+            this.clearOverlay();
         });
 
         // Event: Error
@@ -69,17 +103,124 @@ class YOLOWebSocketStreamer {
         this.ctx = this.canvas.getContext('2d');
     }
 
+    /**
+     * Khởi tạo overlay cho chế độ metadata
+     * @param {HTMLElement} videoElement - Element hiển thị stream gốc (img MJPEG, hoặc canvas frame ở chế độ passthrough)
+     * @param {HTMLCanvasElement} overlayCanvas - Canvas trong suốt đặt chồng lên videoElement
+     */
+    initOverlay(videoElement, overlayCanvas) {
+        this.videoElement = videoElement;
+        this.overlayCanvas = overlayCanvas;
+        this.overlayCtx = overlayCanvas.getContext('2d');
+        window.addEventListener('resize', this.onResize);
+    }
+
+    /**
+     * Nhận metadata detection và vẽ overlay
+     * @param {string|Object} payload - JSON {frame_id, ts, width, height, boxes: [[x1, y1, x2, y2, conf, class_id, track_id]]}
+     * @param {Function} [ack] - Gọi khi vẽ xong (flow control phía server)
+     */
+    renderDetections(payload, ack) {
+        try {
+            const data = typeof payload === 'string' ? JSON.parse(payload) : payload;
+            this.lastDetections = data;
+            this.drawDetections(data);
+        } catch (error) {
+            console.error('[WebSocket] Error rendering detections:', error);
+        }
+
+        if (typeof ack === 'function') {
+            ack();
+        }
+    }
+
+    /**
+     * Vẽ box lên canvas overlay, scale theo vùng ảnh thực tế hiển thị (object-fit: contain)
+     */
+    drawDetections(data) {
+        if (!data || !this.overlayCanvas || !this.videoElement) {
+            return;
+        }
+
+        const canvas = this.overlayCanvas;
+        const ctx = this.overlayCtx;
+        const elementWidth = this.videoElement.clientWidth;
+        const elementHeight = this.videoElement.clientHeight;
+
+        if (canvas.width !== elementWidth || canvas.height !== elementHeight) {
+            canvas.width = elementWidth;
+            canvas.height = elementHeight;
+        }
+        // Đặt overlay trùng vị trí element (canvas frame có thể được căn giữa)
+        canvas.style.left = `${this.videoElement.offsetLeft}px`;
+        canvas.style.top = `${this.videoElement.offsetTop}px`;
+        ctx.clearRect(0, 0, canvas.width, canvas.height);
+
+        if (!data.width || !data.height || !data.boxes.length) {
+            return;
+        }
+
+        // Vùng ảnh bên trong element khi object-fit: contain
+        const scale = Math.min(elementWidth / data.width, elementHeight / data.height);
+        const offsetX = (elementWidth - data.width * scale) / 2;
+        const offsetY = (elementHeight - data.height * scale) / 2;
+
+        ctx.font = '12px sans-serif';
+        ctx.lineWidth = 1;
+        ctx.textBaseline = 'bottom';
+
+        for (const [x1, y1, x2, y2, conf, classId, trackId] of data.boxes) {
+            const className = this.classNames[classId] || String(classId);
+            const color = YOLO_CLASS_COLORS[className] || 'rgb(255, 255, 255)';
+            const left = offsetX + x1 * scale;
+            const top = offsetY + y1 * scale;
+
+            ctx.strokeStyle = color;
+            ctx.strokeRect(left, top, (x2 - x1) * scale, (y2 - y1) * scale);
+
+            let label = `${className}: ${conf.toFixed(2)}`;
+            if (trackId !== null && trackId !== undefined) {
+                label = `#${trackId} ${label}`;
+            }
+            const textWidth = ctx.measureText(label).width;
+            ctx.fillStyle = color;
+            ctx.fillRect(left, top - 16, textWidth + 6, 16);
+            ctx.fillStyle = className === 'look_away' ? '#000' : '#fff';
+            ctx.fillText(label, left + 3, top - 2);
+        }
+    }
+
+    /**
+     * Xóa overlay metadata
+     */
+    clearOverlay() {
+        this.lastDetections = null;
+        if (this.overlayCanvas && this.overlayCtx) {
+            this.overlayCtx.clearRect(0, 0, this.overlayCanvas.width, this.overlayCanvas.height);
+        }
+    }
+
     /**
      * Render frame lên canvas
+     * @param {ArrayBuffer} frameBytes - JPEG bytes
+     * @param {Function} [ack] - Gọi khi render xong (flow control phía server)
      */
-    renderFrame(frameBytes) {
+    renderFrame(frameBytes, ack) {
+        const done = () => {
+            if (typeof ack === 'function') {
+                ack();
+            }
+        };
+
         if (!this.canvas || !this.ctx) {
             console.error('[WebSocket] Canvas not initialized');
+            done();
             return;
         }
 
         // Skip frame nếu đang render (tránh backlog)
         if (this.isRendering) {
+            done();
             return;
         }
 
@@ -108,11 +249,13 @@ class YOLOWebSocketStreamer {
             this.ctx.drawImage(img, 0, 0);
             
             this.isRendering = false;
+            done();
         };
 
         img.onerror = (error) => {
             console.error('[WebSocket] Error loading frame:', error);
             this.isRendering = false;
+            done();
         };
 
         // Set image source
@@ -133,9 +276,10 @@ class YOLOWebSocketStreamer {
             return;
         }
 
-        console.log('[WebSocket] Starting stream:', this.streamUrl);
+        console.log('[WebSocket] Starting stream:', this.streamUrl, `(${this.mode})`);
         this.socket.emit('start_yolo_stream', {
-            stream_url: this.streamUrl
+            stream_url: this.streamUrl,
+            mode: this.mode
         });
     }
 
@@ -154,12 +298,16 @@ class YOLOWebSocketStreamer {
         });
 
         this.isStreaming = false;
+        this.clearOverlay();
     }
 
     /**
      * Ngắt kết nối WebSocket
      */
     disconnect() {
+        window.removeEventListener('resize', this.onResize);
+        this.clearOverlay();
+
         // Clean up object URL
         if (this.lastObjectURL) {
             URL.revokeObjectURL(this.lastObjectURL);
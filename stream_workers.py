@@ -0,0 +1,638 @@
+"""
+Stream Workers - Chạy YOLOStreamProcessor trong process riêng (YOLO_WORKER_MODE=process)
+Chức năng:
+- Mỗi worker process chứa một hoặc vài stream (YOLO_STREAMS_PER_WORKER): decode, vẽ, encode JPEG, hậu xử lý
+  của các stream không còn tranh nhau GIL của process web
+- JPEG trả về process web qua shared memory (ShmRing), pipe chỉ mang thông báo seq nhỏ
+- Điều khiển bằng kênh lệnh (start / subscribe / viewers / stats / close) qua multiprocessing.Pipe
+- Process web giữ RemoteStreamProcessor có cùng giao diện YOLOStreamProcessor: admin_app / api_routes không đổi
+
+Lưu ý: mỗi worker load model riêng (InferenceEngine theo process), batch chỉ gom được trong cùng worker.
+"""
+
+import itertools
+import multiprocessing as mp
+import os
+import threading
+import time
+
+from loguru import logger
+
+import config
+from jetson_nano.shm_ring import ShmRing
+from utils.tracing import get_tracer
+
+CHANNELS = ("pixels", "raw")
+
+
+# ---------------------------------------------------------------------------
+# Phía worker process
+# ---------------------------------------------------------------------------
+
+
+class _HostedStream:
+    """Một processor thật chạy trong worker, đẩy JPEG vào shared memory và báo seq về process web"""
+
+    def __init__(self, stream_url, ring_names, send):
+        from yolo_processor import YOLOStreamProcessor
+
+        self.stream_url = stream_url
+        self.send = send
+        self.closed = False
+        self.started = False  # Đã nhận lệnh start, chưa báo "stopped" về process web
+        # Worker là process con của process web tạo ring: dùng chung resource_tracker
+        self.rings = {channel: ShmRing(name, shared_tracker=True) for channel, name in ring_names.items()}
+
+        self.processor = YOLOStreamProcessor()
+        self.processor.set_stream_url(stream_url)
+        self.processor.set_detection_callback(lambda payload: send(("detections", stream_url, payload)))
+
+        # Callback khác None để subscriber được tính là viewer; JPEG được gửi bởi thread publish bên dưới
+        self.processor.set_frame_callback(lambda frame_bytes: None)
+        self.processor.set_raw_frame_callback(lambda jpeg_bytes: None)
+
+        self.threads = [
+            threading.Thread(target=self._publish_loop, args=(channel,), name=f"publish-{channel}", daemon=True)
+            for channel in CHANNELS
+        ]
+        for thread in self.threads:
+            thread.start()
+
+    def _publish_loop(self, channel):
+        """Đợi JPEG mới của processor và ghi vào ring của channel"""
+        raw = channel == "raw"
+        ring = self.rings[channel]
+        last_version = 0
+        while not self.closed:
+            if not self.processor.is_running:
+                if self.started and not raw:
+                    # Processor tự dừng (không mở được stream, reader dừng): báo process web
+                    self.started = False
+                    self.send(("stopped", self.stream_url))
+                time.sleep(0.1)
+                continue
+            latest = self.processor.get_jpeg(last_version, timeout=0.5, raw=raw)
+            if latest is None:
+                continue
+            last_version, jpeg_bytes = latest
+
+            seq = ring.write(jpeg_bytes)
+            if seq is None:
+                # JPEG lớn hơn slot: gửi thẳng qua pipe (hiếm)
+                self.send(("jpeg", self.stream_url, channel, None, jpeg_bytes))
+            else:
+                self.send(("jpeg", self.stream_url, channel, seq, None))
+
+    def set_viewers(self, mjpeg_viewers, raw_mjpeg_viewers):
+        with self.processor.jpeg_cond:
+            self.processor.mjpeg_viewers = mjpeg_viewers
+            self.processor.raw_mjpeg_viewers = raw_mjpeg_viewers
+
+    def start(self):
+        self.processor.start_processing()
+        self.started = True
+
+    def close(self):
+        self.closed = True
+        self.processor.stop_processing()
+        for thread in self.threads:
+            thread.join(timeout=1.0)
+        for ring in self.rings.values():
+            ring.close()
+
+
+def _worker_main(worker_id, cmd_conn, event_conn):
+    """
+    Vòng lệnh của worker process: mỗi lệnh (request_id, op, args) được trả lời bằng
+    (request_id, "ok", result) / (request_id, "error", message)
+    """
+    send_lock = threading.Lock()
+
+    def send(message):
+        with send_lock:
+            event_conn.send(message)
+
+    hosted = {}
+    cpu_budget = config.YOLO_CPU_BUDGET  # Phần CPU budget của worker này (WorkerPool chia theo số worker)
+    logger.info(f"Stream worker {worker_id} started (pid={os.getpid()})")
+
+    while True:
+        try:
+            request_id, op, args = cmd_conn.recv()
+        except (EOFError, OSError):
+            break
+
+        try:
+            if op == "open":
+                stream_url, ring_names = args
+                stream = hosted[stream_url] = _HostedStream(stream_url, ring_names, send)
+                stream.processor.rate_controller.cpu_budget = cpu_budget
+                result = {"class_names": stream.processor.class_names, "pid": os.getpid()}
+            elif op == "start":
+                hosted[args[0]].start()
+                result = True
+            elif op == "subscribe":
+                stream_url, subscriber_id, mode = args
+                result = hosted[stream_url].processor.add_subscriber(subscriber_id, mode)
+            elif op == "unsubscribe":
+                stream_url, subscriber_id = args
+                result = hosted[stream_url].processor.remove_subscriber(subscriber_id)
+            elif op == "viewers":
+                stream_url, mjpeg_viewers, raw_mjpeg_viewers = args
+                hosted[stream_url].set_viewers(mjpeg_viewers, raw_mjpeg_viewers)
+                result = True
+            elif op == "cpu_budget":
+                cpu_budget = args[0]
+                for stream in hosted.values():
+                    stream.processor.rate_controller.cpu_budget = cpu_budget
+                result = True
+            elif op == "stats":
+                result = hosted[args[0]].processor.get_stats()
+            elif op == "metrics":
+                result = hosted[args[0]].processor.metrics_snapshot()
+            elif op == "trace":
+                action, capacity = args
+                tracer = get_tracer()
+                if action == "enable":
+                    tracer.enable(capacity)
+                elif action == "disable":
+                    tracer.disable()
+                elif action == "clear":
+                    tracer.clear()
+                result = tracer.get_stats()
+            elif op == "trace_spans":
+                result = get_tracer().spans(args[0])
+            elif op == "close":
+                stream = hosted.pop(args[0], None)
+                if stream is not None:
+                    stream.close()
+                result = True
+            elif op == "shutdown":
+                cmd_conn.send((request_id, "ok", True))
+                break
+            else:
+                raise ValueError(f"Unknown command: {op}")
+            cmd_conn.send((request_id, "ok", result))
+        except Exception as e:
+            logger.error(f"Stream worker {worker_id} command {op} failed: {e}")
+            cmd_conn.send((request_id, "error", str(e)))
+
+    for stream in hosted.values():
+        stream.close()
+    logger.info(f"Stream worker {worker_id} stopped")
+
+
+# ---------------------------------------------------------------------------
+# Phía process web
+# ---------------------------------------------------------------------------
+
+
+class WorkerHandle:
+    """Một worker process cùng kênh lệnh / kênh sự kiện của nó"""
+
+    def __init__(self, worker_id, start_method="spawn"):
+        ctx = mp.get_context(start_method)
+        self.worker_id = worker_id
+        self.cmd_conn, child_cmd = ctx.Pipe()
+        event_recv, event_send = ctx.Pipe(duplex=False)
+        self.event_conn = event_recv
+
+        self.process = ctx.Process(
+            target=_worker_main,
+            args=(worker_id, child_cmd, event_send),
+            name=f"stream-worker-{worker_id}",
+            daemon=True,
+        )
+        self.process.start()
+        child_cmd.close()
+        event_send.close()
+
+        self.streams = {}  # stream_url -> RemoteStreamProcessor
+        self.alive = True
+        self._cmd_lock = threading.Lock()
+        self._request_ids = itertools.count(1)
+        self._listener = threading.Thread(target=self._listen, name=f"worker-{worker_id}-events", daemon=True)
+        self._listener.start()
+
+    def call(self, op, *args, timeout=10.0):
+        """
+        Gửi lệnh và đợi kết quả
+        Mỗi lệnh mang request id: trả lời muộn của lệnh đã timeout trước đó bị bỏ qua
+
+        Raises:
+            RuntimeError: Worker báo lỗi / không trả lời / đã chết
+        """
+        with self._cmd_lock:
+            if not self.alive:
+                raise RuntimeError(f"Stream worker {self.worker_id} đã dừng")
+            request_id = next(self._request_ids)
+            self.cmd_conn.send((request_id, op, args))
+            deadline = time.monotonic() + timeout
+            while True:
+                if not self.cmd_conn.poll(max(0.0, deadline - time.monotonic())):
+                    raise RuntimeError(f"Stream worker {self.worker_id} không trả lời lệnh {op} sau {timeout}s")
+                try:
+                    reply_id, status, result = self.cmd_conn.recv()
+                except (EOFError, OSError):
+                    raise RuntimeError(f"Stream worker {self.worker_id} đã dừng")
+                if reply_id == request_id:
+                    break
+                logger.debug(f"Stream worker {self.worker_id}: dropping late reply to request #{reply_id}")
+        if status != "ok":
+            raise RuntimeError(result)
+        return result
+
+    def _listen(self):
+        """Nhận thông báo JPEG / detections / stopped từ worker và chuyển cho proxy tương ứng"""
+        while True:
+            try:
+                message = self.event_conn.recv()
+            except (EOFError, OSError):
+                break
+            kind, stream_url = message[0], message[1]
+            proxy = self.streams.get(stream_url)
+            if proxy is None:
+                continue
+            try:
+                if kind == "jpeg":
+                    proxy._on_jpeg(*message[2:])
+                elif kind == "detections":
+                    proxy._on_detections(message[2])
+                elif kind == "stopped":
+                    proxy._on_stopped()
+            except Exception as e:
+                logger.error(f"Error dispatching {kind} for {stream_url}: {e}")
+
+        self.alive = False
+        if self.streams:
+            logger.error(f"Stream worker {self.worker_id} exited with {len(self.streams)} stream(s) attached")
+        for proxy in list(self.streams.values()):
+            proxy._on_worker_exit()
+
+    def shutdown(self, timeout=5.0):
+        try:
+            self.call("shutdown", timeout=timeout)
+        except Exception:
+            pass
+        self.process.join(timeout)
+        if self.process.is_alive():
+            self.process.terminate()
+        self.alive = False
+
+
+class RemoteStreamProcessor:
+    """
+    Proxy trong process web cho processor chạy ở worker
+    Cùng giao diện YOLOStreamProcessor mà admin_app / api_routes / ProcessorRegistry dùng
+    """
+
+    def __init__(self, stream_url, worker, pool):
+        self.stream_url = stream_url
+        self.worker = worker
+        self.pool = pool
+        self.is_running = False
+        self.class_names = {}
+
+        self.frame_callback = None
+        self.detection_callback = None
+        self.raw_frame_callback = None
+        self.subscribers = set()
+        self.metadata_subscribers = set()
+        self.raw_subscribers = set()
+        self.subscribers_lock = threading.Lock()
+
+        # JPEG mới nhất nhận từ worker (seq của ring làm version)
+        self.jpeg_bytes = None
+        self.jpeg_version = 0
+        self.raw_jpeg_bytes = None
+        self.raw_jpeg_version = 0
+        self.jpeg_cond = threading.Condition()
+        self.mjpeg_viewers = 0
+        self.raw_mjpeg_viewers = 0
+        self.mjpeg_bytes_sent = 0
+        self.last_viewer_seen = time.time()
+
+        self.rings = {
+            channel: ShmRing(slots=config.YOLO_SHM_SLOTS, slot_size=config.YOLO_SHM_SLOT_SIZE, create=True)
+            for channel in CHANNELS
+        }
+
+    def open(self):
+        """Tạo processor trong worker (đợi load model)"""
+        info = self.worker.call(
+            "open",
+            self.stream_url,
+            {channel: ring.name for channel, ring in self.rings.items()},
+            timeout=config.YOLO_WORKER_START_TIMEOUT,
+        )
+        self.class_names = info["class_names"]
+        logger.info(f"Stream {self.stream_url} placed on worker {self.worker.worker_id} (pid={info['pid']})")
+        return self
+
+    def set_stream_url(self, url):
+        # stream_url cố định khi tạo trong worker
+        pass
+
+    def set_frame_callback(self, callback):
+        self.frame_callback = callback
+
+    def set_detection_callback(self, callback):
+        self.detection_callback = callback
+
+    def set_raw_frame_callback(self, callback):
+        self.raw_frame_callback = callback
+
+    def add_subscriber(self, subscriber_id, mode="pixels"):
+        with self.subscribers_lock:
+            if mode == "metadata":
+                self.metadata_subscribers.add(subscriber_id)
+            elif mode == "passthrough":
+                self.raw_subscribers.add(subscriber_id)
+            else:
+                self.subscribers.add(subscriber_id)
+        return self.worker.call("subscribe", self.stream_url, subscriber_id, mode)
+
+    def remove_subscriber(self, subscriber_id):
+        with self.subscribers_lock:
+            self.subscribers.discard(subscriber_id)
+            self.metadata_subscribers.discard(subscriber_id)
+            self.raw_subscribers.discard(subscriber_id)
+        self.last_viewer_seen = time.time()
+        try:
+            return self.worker.call("unsubscribe", self.stream_url, subscriber_id)
+        except RuntimeError as e:
+            logger.warning(f"Unsubscribe {subscriber_id} from {self.stream_url}: {e}")
+            return self.subscriber_count()
+
+    def subscriber_count(self):
+        return len(self.subscribers) + len(self.metadata_subscribers) + len(self.raw_subscribers)
+
+    def viewer_count(self):
+        return self.subscriber_count() + self.mjpeg_viewers + self.raw_mjpeg_viewers
+
+    def touch(self):
+        self.last_viewer_seen = time.time()
+
+    def idle_seconds(self, now=None):
+        now = time.time() if now is None else now
+        if self.viewer_count() > 0:
+            self.last_viewer_seen = now
+            return 0.0
+        return now - self.last_viewer_seen
+
+    def start_processing(self):
+        if self.is_running:
+            return
+        self.worker.call("start", self.stream_url)
+        self.is_running = True
+
+    def stop_processing(self):
+        self.is_running = False
+        with self.jpeg_cond:
+            self.jpeg_cond.notify_all()
+        try:
+            self.worker.call("close", self.stream_url)
+        except RuntimeError as e:
+            logger.warning(f"Close {self.stream_url} on worker: {e}")
+        self.pool.release(self)
+        for ring in self.rings.values():
+            ring.close()
+
+    def _on_jpeg(self, channel, seq, jpeg_bytes):
+        """JPEG mới từ worker: copy một lần khỏi shared memory rồi phát cho viewer"""
+        if jpeg_bytes is None:
+            item = self.rings[channel].read(seq)
+            if item is None:
+                return  # Slot đã bị ghi đè bởi JPEG mới hơn (sẽ có thông báo kế tiếp)
+            jpeg_bytes = item[1]
+
+        with self.jpeg_cond:
+            if channel == "raw":
+                self.raw_jpeg_bytes = jpeg_bytes
+                self.raw_jpeg_version += 1
+            else:
+                self.jpeg_bytes = jpeg_bytes
+                self.jpeg_version += 1
+            self.jpeg_cond.notify_all()
+
+        if channel == "raw":
+            if self.raw_frame_callback is not None and self.raw_subscribers:
+                self.raw_frame_callback(jpeg_bytes)
+        elif self.frame_callback is not None and self.subscribers:
+            self.frame_callback(jpeg_bytes)
+
+    def _on_detections(self, payload):
+        if self.detection_callback is not None:
+            self.detection_callback(payload)
+
+    def _on_stopped(self):
+        """Processor trong worker đã tự dừng: viewer MJPEG thoát, registry thấy stream không còn chạy"""
+        logger.warning(f"Stream {self.stream_url} stopped on worker {self.worker.worker_id}")
+        self.is_running = False
+        with self.jpeg_cond:
+            self.jpeg_cond.notify_all()
+
+    def _on_worker_exit(self):
+        self.is_running = False
+        with self.jpeg_cond:
+            self.jpeg_cond.notify_all()
+
+    def get_jpeg(self, last_version=0, timeout=None, raw=False):
+        def current():
+            if raw:
+                return self.raw_jpeg_version, self.raw_jpeg_bytes
+            return self.jpeg_version, self.jpeg_bytes
+
+        with self.jpeg_cond:
+            ready = self.jpeg_cond.wait_for(lambda: current()[0] > last_version or not self.is_running, timeout)
+            version, jpeg_bytes = current()
+            if not ready or version <= last_version:
+                return None
+            return version, jpeg_bytes
+
+    def _sync_viewers(self):
+        try:
+            self.worker.call("viewers", self.stream_url, self.mjpeg_viewers, self.raw_mjpeg_viewers)
+        except RuntimeError as e:
+            logger.warning(f"Sync MJPEG viewers for {self.stream_url}: {e}")
+
+    def generate_frames(self, raw=False):
+        """Generator MJPEG từ JPEG worker gửi về (worker chỉ render khi có viewer)"""
+        with self.jpeg_cond:
+            if raw:
+                self.raw_mjpeg_viewers += 1
+            else:
+                self.mjpeg_viewers += 1
+        self._sync_viewers()
+
+        try:
+            last_version = 0
+            while self.is_running:
+                latest = self.get_jpeg(last_version, timeout=1.0, raw=raw)
+                if latest is None:
+                    continue
+                last_version, frame_bytes = latest
+                with self.jpeg_cond:
+                    self.mjpeg_bytes_sent += len(frame_bytes)
+                yield b"--frame\r\nContent-Type: image/jpeg\r\nContent-Length: %d\r\n\r\n" % len(frame_bytes)
+                yield frame_bytes
+                yield b"\r\n"
+        finally:
+            with self.jpeg_cond:
+                if raw:
+                    self.raw_mjpeg_viewers -= 1
+                else:
+                    self.mjpeg_viewers -= 1
+            self.last_viewer_seen = time.time()
+            if self.is_running:
+                self._sync_viewers()
+
+    def metrics_snapshot(self):
+        """Metrics của processor trong worker, viewer MJPEG / byte đã gửi lấy ở process web"""
+        snapshot = self.worker.call("metrics", self.stream_url)
+        snapshot["viewers"].update(mjpeg=self.mjpeg_viewers, raw_mjpeg=self.raw_mjpeg_viewers)
+        snapshot["mjpeg_bytes_sent"] = self.mjpeg_bytes_sent
+        return snapshot
+
+    def get_stats(self):
+        stats = self.worker.call("stats", self.stream_url)
+        stats["worker"] = {
+            "id": self.worker.worker_id,
+            "pid": self.worker.process.pid,
+            "streams": len(self.worker.streams),
+        }
+        return stats
+
+
+class WorkerPool:
+    """Đặt stream vào worker process: ưu tiên worker còn chỗ, tạo worker mới tới max_workers"""
+
+    def __init__(self, max_workers=0, streams_per_worker=1, start_method="spawn"):
+        """
+        Args:
+            max_workers: Số worker tối đa (0 = số CPU)
+            streams_per_worker: Số stream mỗi worker trước khi mở worker mới
+            start_method: Cách tạo process ("spawn" để không kế thừa thread / model của process web)
+        """
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.streams_per_worker = max(1, streams_per_worker)
+        self.start_method = start_method
+        self.workers = []
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+
+    def _place(self, stream_url):
+        spawned = False
+        with self._lock:
+            self.workers = [w for w in self.workers if w.alive]
+            candidates = [w for w in self.workers if len(w.streams) < self.streams_per_worker]
+            if candidates:
+                worker = min(candidates, key=lambda w: len(w.streams))
+            elif len(self.workers) < self.max_workers:
+                worker = WorkerHandle(next(self._ids), self.start_method)
+                self.workers.append(worker)
+                spawned = True
+            else:
+                # Đủ worker: dồn vào worker ít stream nhất
+                worker = min(self.workers, key=lambda w: len(w.streams))
+            proxy = RemoteStreamProcessor(stream_url, worker, self)
+            worker.streams[stream_url] = proxy
+        if spawned:
+            # Gọi worker mới sau khi nhả lock (không chặn _place / release / broadcast của stream khác)
+            self._enable_trace(worker)
+            self._share_cpu_budget()
+        return proxy
+
+    def _enable_trace(self, worker):
+        """Bật trace ở worker mới nếu process web đang trace (lỗi chỉ log, không làm hỏng việc đặt stream)"""
+        tracer = get_tracer()
+        if not tracer.enabled:
+            return
+        try:
+            worker.call("trace", "enable", tracer.capacity)
+        except RuntimeError as e:
+            logger.warning(f"Worker {worker.worker_id} trace: {e}")
+
+    def _share_cpu_budget(self):
+        """
+        Chia YOLO_CPU_BUDGET cho các worker đang chạy
+        Mỗi worker có engine và DetectionRateController riêng: nếu mỗi worker dùng nguyên budget thì tổng
+        thời gian inference của máy là (số worker x budget)
+        """
+        with self._lock:
+            workers = [w for w in self.workers if w.alive]
+        if not workers:
+            return
+        budget = config.YOLO_CPU_BUDGET / len(workers)
+        for worker in workers:
+            try:
+                worker.call("cpu_budget", budget)
+            except RuntimeError as e:
+                logger.warning(f"Worker {worker.worker_id} cpu_budget: {e}")
+
+    def create(self, stream_url):
+        """
+        Factory cho ProcessorRegistry: tạo processor của stream_url trong một worker
+
+        Returns:
+            RemoteStreamProcessor
+        """
+        proxy = self._place(stream_url)
+        try:
+            return proxy.open()
+        except Exception:
+            proxy.stop_processing()
+            raise
+
+    def release(self, proxy):
+        """Gỡ stream khỏi worker, dừng worker không còn stream nào"""
+        with self._lock:
+            worker = proxy.worker
+            if worker.streams.get(proxy.stream_url) is proxy:
+                del worker.streams[proxy.stream_url]
+            idle = not worker.streams and worker in self.workers
+            if idle:
+                self.workers.remove(worker)
+        if idle:
+            threading.Thread(target=worker.shutdown, daemon=True).start()
+            self._share_cpu_budget()
+
+    def broadcast(self, op, *args):
+        """
+        Gửi lệnh tới mọi worker đang chạy
+
+        Returns:
+            List kết quả (bỏ qua worker lỗi)
+        """
+        with self._lock:
+            workers = [w for w in self.workers if w.alive]
+        results = []
+        for worker in workers:
+            try:
+                results.append(worker.call(op, *args))
+            except RuntimeError as e:
+                logger.warning(f"Worker {worker.worker_id} {op}: {e}")
+        return results
+
+    def shutdown(self):
+        with self._lock:
+            workers, self.workers = self.workers, []
+        for worker in workers:
+            worker.shutdown()
+
+
+_worker_pool = None
+_worker_pool_lock = threading.Lock()
+
+
+def get_worker_pool():
+    """Lấy WorkerPool dùng chung (tạo khi dùng lần đầu)"""
+    global _worker_pool
+    with _worker_pool_lock:
+        if _worker_pool is None:
+            _worker_pool = WorkerPool(
+                max_workers=config.YOLO_MAX_WORKERS,
+                streams_per_worker=config.YOLO_STREAMS_PER_WORKER,
+                start_method=config.YOLO_WORKER_START_METHOD,
+            )
+        return _worker_pool
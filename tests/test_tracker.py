@@ -0,0 +1,54 @@
+"""
+Test BoxTracker: chỉ hiển thị track được ghép ở lần detect gần nhất
+"""
+
+import numpy as np
+
+from utils.detections import empty_detections, make_detections
+from utils.tracker import BoxTracker
+
+
+def _detection(x, y, size=40, class_id=0, conf=0.9):
+    return make_detections([[x, y, x + size, y + size]], [conf], [class_id])
+
+
+def test_fast_moving_box_shows_single_track():
+    """Object đi nhanh (IoU giữa hai lần detect < iou_threshold): tạo track mới nhưng không để lại box ma"""
+    tracker = BoxTracker(iou_threshold=0.3, max_age=1.5)
+    for step in range(8):
+        timestamp = step * 0.2
+        tracker.update(_detection(step * 60, 100), timestamp)
+        tracked = tracker.predict(timestamp + 0.1)
+        assert len(tracked) == 1
+        assert tracked["x1"][0] >= step * 60 - 1
+
+    # Track cũ vẫn được giữ để ghép lại, chỉ không hiển thị
+    assert tracker.snapshot()["tracks"] > 1
+    assert tracker.snapshot()["visible"] == 1
+
+
+def test_disappearing_box_is_hidden_immediately():
+    """Object rời khung hình / đổi class: box cũ biến mất ngay ở lần detect kế tiếp"""
+    tracker = BoxTracker(iou_threshold=0.3, max_age=1.5)
+    tracker.update(_detection(100, 100, class_id=0), 0.0)
+    assert len(tracker.predict(0.05)) == 1
+
+    tracker.update(empty_detections(), 0.2)
+    assert len(tracker.predict(0.25)) == 0
+
+    # Đổi class tại cùng vị trí: chỉ còn box của class mới
+    tracker.update(_detection(100, 100, class_id=0), 0.4)
+    tracker.update(_detection(100, 100, class_id=1), 0.6)
+    tracked = tracker.predict(0.65)
+    assert tracked["class_id"].tolist() == [1]
+
+
+def test_hold_keeps_only_visible_tracks():
+    """Motion gate bỏ qua inference: giữ box đang hiển thị, không làm sống lại track đã mất detection"""
+    tracker = BoxTracker(iou_threshold=0.3, max_age=1.5)
+    tracker.update(_detection(100, 100), 0.0)
+    tracker.update(_detection(300, 300), 0.2)
+    tracker.hold(0.4)
+    tracked = tracker.predict(0.45)
+    assert len(tracked) == 1
+    assert np.isclose(tracked["x1"][0], 300, atol=1)
@@ -0,0 +1,258 @@
+"""
+Quantize Model - Calibrate model YOLO sang INT8 và báo cáo độ lệch mAP / tốc độ so với FP32
+
+Chức năng:
+- Chạy model trên thư mục ảnh cabin mẫu để calibrate, tạo model INT8 tĩnh (ONNX Runtime)
+- So sánh INT8 với FP32 trên cùng tập ảnh:
+  + mAP@0.5 và mAP@0.5:0.95 (dùng detections của FP32 làm tham chiếu,
+    hoặc nhãn YOLO .txt nếu truyền --labels)
+  + ms/frame và speedup
+- Lưu báo cáo JSON cạnh model INT8
+
+Ví dụ:
+  python tools/quantize_model.py --calib ./samples/cabin
+  python tools/quantize_model.py --calib ./samples/cabin --eval ./samples/cabin_eval --labels ./samples/labels
+
+Sau khi có model INT8, bật bằng:
+  YOLO_BACKEND=onnx YOLO_PRECISION=int8 python admin_app.py
+"""
+
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import config  # noqa: E402
+from inference_backends import create_backend, quantize_int8  # noqa: E402
+
+
+def load_images(images_dir, limit=None):
+    """
+    Đọc ảnh trong thư mục
+
+    Returns:
+        List of (stem, frame)
+    """
+    paths = sorted(
+        p for ext in ("*.jpg", "*.jpeg", "*.png") for p in glob.glob(os.path.join(images_dir, ext))
+    )
+    images = []
+    for path in paths[:limit]:
+        frame = cv2.imread(path)
+        if frame is not None:
+            images.append((os.path.splitext(os.path.basename(path))[0], frame))
+    return images
+
+
+def load_yolo_labels(labels_dir, stem, width, height):
+    """
+    Đọc nhãn YOLO (class cx cy w h, chuẩn hóa 0-1)
+
+    Returns:
+        List of (x1, y1, x2, y2, class_id)
+    """
+    path = os.path.join(labels_dir, f"{stem}.txt")
+    if not os.path.exists(path):
+        return []
+
+    boxes = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) < 5:
+                continue
+            cls_id, cx, cy, w, h = int(parts[0]), *map(float, parts[1:5])
+            boxes.append(
+                ((cx - w / 2) * width, (cy - h / 2) * height, (cx + w / 2) * width, (cy + h / 2) * height, cls_id)
+            )
+    return boxes
+
+
+def box_iou(box, boxes):
+    """IoU giữa một box và mảng boxes (N, 4)"""
+    if len(boxes) == 0:
+        return np.zeros(0)
+    x1 = np.maximum(box[0], boxes[:, 0])
+    y1 = np.maximum(box[1], boxes[:, 1])
+    x2 = np.minimum(box[2], boxes[:, 2])
+    y2 = np.minimum(box[3], boxes[:, 3])
+    inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area = (box[2] - box[0]) * (box[3] - box[1])
+    areas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+    return inter / np.maximum(area + areas - inter, 1e-9)
+
+
+def average_precision(tp, confidences, num_refs):
+    """AP (nội suy mọi điểm, kiểu COCO/VOC) từ danh sách true positive"""
+    if num_refs == 0:
+        return None
+    if len(tp) == 0:
+        return 0.0
+
+    order = np.argsort(-np.asarray(confidences))
+    tp = np.asarray(tp, dtype=np.float64)[order]
+    tp_cum = np.cumsum(tp)
+    fp_cum = np.cumsum(1 - tp)
+    recall = tp_cum / num_refs
+    precision = tp_cum / np.maximum(tp_cum + fp_cum, 1e-9)
+
+    recall = np.concatenate(([0.0], recall, [1.0]))
+    precision = np.concatenate(([1.0], precision, [0.0]))
+    precision = np.flip(np.maximum.accumulate(np.flip(precision)))
+    return float(np.sum((recall[1:] - recall[:-1]) * precision[1:]))
+
+
+def evaluate_map(predictions, references, iou_thresholds):
+    """
+    Tính mAP của predictions so với references
+
+    Args:
+        predictions: List (theo ảnh) of list (x1, y1, x2, y2, conf, class_id)
+        references: List (theo ảnh) of list (x1, y1, x2, y2, class_id)
+        iou_thresholds: Các ngưỡng IoU
+
+    Returns:
+        mAP trung bình trên các ngưỡng IoU và các class có tham chiếu
+    """
+    classes = {ref[4] for refs in references for ref in refs}
+    if not classes:
+        return None
+
+    maps = []
+    for iou_threshold in iou_thresholds:
+        aps = []
+        for cls_id in classes:
+            tp, confidences, num_refs = [], [], 0
+            for preds, refs in zip(predictions, references):
+                ref_boxes = np.array([r[:4] for r in refs if r[4] == cls_id], dtype=np.float64).reshape(-1, 4)
+                num_refs += len(ref_boxes)
+                matched = np.zeros(len(ref_boxes), dtype=bool)
+
+                # Ghép prediction theo thứ tự confidence giảm dần
+                cls_preds = sorted((p for p in preds if p[5] == cls_id), key=lambda p: -p[4])
+                for pred in cls_preds:
+                    ious = box_iou(np.asarray(pred[:4], dtype=np.float64), ref_boxes)
+                    ious[matched] = 0
+                    best = int(ious.argmax()) if len(ious) else -1
+                    hit = best >= 0 and ious[best] >= iou_threshold
+                    if hit:
+                        matched[best] = True
+                    tp.append(1 if hit else 0)
+                    confidences.append(pred[4])
+
+            ap = average_precision(tp, confidences, num_refs)
+            if ap is not None:
+                aps.append(ap)
+        maps.append(float(np.mean(aps)) if aps else 0.0)
+
+    return float(np.mean(maps))
+
+
+def run_model(backend, frames, conf_threshold):
+    """
+    Chạy model trên từng frame
+
+    Returns:
+        (predictions, ms/frame)
+    """
+    backend.predict(frames[:1], conf_threshold)  # Warmup
+    predictions = []
+    start = time.perf_counter()
+    for frame in frames:
+        predictions.append(backend.predict([frame], conf_threshold)[0].tolist())
+    elapsed = time.perf_counter() - start
+    return predictions, elapsed / max(1, len(frames)) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Calibrate INT8 model và báo cáo mAP drift / speedup so với FP32")
+    parser.add_argument("--model", default=config.YOLO_MODEL_PATH, help="Weights YOLO (.pt)")
+    parser.add_argument("--calib", required=True, help="Thư mục ảnh cabin mẫu để calibrate")
+    parser.add_argument("--eval", default=None, help="Thư mục ảnh đánh giá (mặc định dùng --calib)")
+    parser.add_argument("--labels", default=None, help="Thư mục nhãn YOLO .txt (mặc định dùng FP32 làm tham chiếu)")
+    parser.add_argument("--max-calib", type=int, default=300, help="Số ảnh calibration tối đa")
+    parser.add_argument("--imgsz", type=int, default=config.YOLO_IMGSZ, help="Kích thước input")
+    parser.add_argument("--threads", type=int, default=config.YOLO_NUM_THREADS, help="Số thread intra-op (0 = auto)")
+    parser.add_argument("--conf", type=float, default=config.YOLO_CONF_THRESHOLD, help="Ngưỡng confidence")
+    parser.add_argument("--per-channel", action="store_true", help="Quantize weights theo từng channel")
+    parser.add_argument("--cache-dir", default=config.YOLO_EXPORT_CACHE_DIR, help="Thư mục cache model")
+    args = parser.parse_args()
+
+    calib_images = load_images(args.calib, args.max_calib)
+    if not calib_images:
+        print(f"[ERROR] Không tìm thấy ảnh trong {args.calib}")
+        sys.exit(1)
+
+    print("=" * 70)
+    print(f"[1/3] Calibrate INT8 trên {len(calib_images)} ảnh")
+    print("=" * 70)
+    int8_path = quantize_int8(
+        args.model, [frame for _, frame in calib_images], args.imgsz, args.cache_dir, args.per_channel
+    )
+
+    eval_images = load_images(args.eval) if args.eval else calib_images
+    frames = [frame for _, frame in eval_images]
+
+    print()
+    print("=" * 70)
+    print(f"[2/3] Chạy FP32 và INT8 trên {len(frames)} ảnh đánh giá")
+    print("=" * 70)
+    fp32 = create_backend("onnx", args.model, args.imgsz, args.threads, args.cache_dir)
+    int8 = create_backend("onnx", args.model, args.imgsz, args.threads, args.cache_dir, precision="int8")
+    fp32_preds, fp32_ms = run_model(fp32, frames, args.conf)
+    int8_preds, int8_ms = run_model(int8, frames, args.conf)
+
+    iou_50 = [0.5]
+    iou_50_95 = list(np.arange(0.5, 0.96, 0.05))
+    report = {
+        "model": args.model,
+        "int8_model": int8_path,
+        "calibration_images": len(calib_images),
+        "eval_images": len(frames),
+        "imgsz": args.imgsz,
+        "threads": args.threads,
+        "fp32_ms_per_frame": round(fp32_ms, 2),
+        "int8_ms_per_frame": round(int8_ms, 2),
+        "speedup": round(fp32_ms / int8_ms, 3) if int8_ms > 0 else None,
+    }
+
+    if args.labels:
+        references = [
+            load_yolo_labels(args.labels, stem, frame.shape[1], frame.shape[0]) for stem, frame in eval_images
+        ]
+        report["reference"] = "labels"
+        for name, preds in (("fp32", fp32_preds), ("int8", int8_preds)):
+            report[f"{name}_map50"] = evaluate_map(preds, references, iou_50)
+            report[f"{name}_map50_95"] = evaluate_map(preds, references, iou_50_95)
+        if report["fp32_map50"] is not None:
+            report["map50_drift"] = round(report["int8_map50"] - report["fp32_map50"], 4)
+            report["map50_95_drift"] = round(report["int8_map50_95"] - report["fp32_map50_95"], 4)
+    else:
+        # Không có nhãn: coi detections FP32 là ground truth, mAP của INT8 phản ánh độ lệch
+        references = [[(*p[:4], p[5]) for p in preds] for preds in fp32_preds]
+        report["reference"] = "fp32_predictions"
+        report["int8_map50_vs_fp32"] = evaluate_map(int8_preds, references, iou_50)
+        report["int8_map50_95_vs_fp32"] = evaluate_map(int8_preds, references, iou_50_95)
+
+    report_path = os.path.splitext(int8_path)[0] + "-report.json"
+    with open(report_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+
+    print()
+    print("=" * 70)
+    print("[3/3] Báo cáo")
+    print("=" * 70)
+    for key, value in report.items():
+        print(f"   {key}: {value}")
+    print(f"\n[OK] Đã lưu báo cáo: {report_path}")
+
+
+if __name__ == "__main__":
+    main()
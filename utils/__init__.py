@@ -4,5 +4,31 @@ Chứa các tiện ích và helper functions
 """
 
 from .data_manager import load_drivers_data, save_drivers_data, init_drivers_data
+from .pipeline import DropOldestQueue, StageCounter
+from .detections import DETECTION_DTYPE, TRACK_DTYPE, empty_detections, make_detections
+from .motion_gate import MotionGate
+from .tracker import BoxTracker
+from .tracing import FrameTracer, get_tracer, to_chrome_trace
+from .outbox import ClientOutbox, OutboxRegistry, get_outbox_registry, get_metadata_outbox_registry, get_raw_outbox_registry
 
-__all__ = ["load_drivers_data", "save_drivers_data", "init_drivers_data"]
+__all__ = [
+    "load_drivers_data",
+    "save_drivers_data",
+    "init_drivers_data",
+    "DropOldestQueue",
+    "StageCounter",
+    "DETECTION_DTYPE",
+    "TRACK_DTYPE",
+    "empty_detections",
+    "make_detections",
+    "MotionGate",
+    "BoxTracker",
+    "ClientOutbox",
+    "OutboxRegistry",
+    "get_outbox_registry",
+    "get_metadata_outbox_registry",
+    "get_raw_outbox_registry",
+    "FrameTracer",
+    "get_tracer",
+    "to_chrome_trace",
+]
@@ -0,0 +1,78 @@
+"""
+Detections - Mảng detection gọn (NumPy structured array) dùng chung giữa engine, tracker và renderer
+Chức năng:
+- Định nghĩa dtype cho detection (tọa độ, confidence, class id) và track (thêm track id)
+- Tạo mảng detection từ output YOLO trong một lần, không lặp từng box
+"""
+
+import numpy as np
+
+DETECTION_DTYPE = np.dtype(
+    [
+        ("x1", np.int32),
+        ("y1", np.int32),
+        ("x2", np.int32),
+        ("y2", np.int32),
+        ("conf", np.float32),
+        ("class_id", np.int16),
+    ]
+)
+TRACK_DTYPE = np.dtype(DETECTION_DTYPE.descr + [("track_id", np.int32)])
+
+BOX_FIELDS = ["x1", "y1", "x2", "y2"]
+
+
+def empty_detections(dtype=DETECTION_DTYPE):
+    """Mảng detection rỗng"""
+    return np.empty(0, dtype=dtype)
+
+
+def make_detections(xyxy, conf, class_ids):
+    """
+    Tạo mảng detection từ các mảng cột
+
+    Args:
+        xyxy: Mảng (N, 4) tọa độ x1, y1, x2, y2 (làm tròn xuống số nguyên)
+        conf: Mảng (N,) confidence
+        class_ids: Mảng (N,) class id
+
+    Returns:
+        Structured array dtype DETECTION_DTYPE
+    """
+    xyxy = np.asarray(xyxy).reshape(-1, 4)
+    detections = np.empty(len(xyxy), dtype=DETECTION_DTYPE)
+    for i, field in enumerate(BOX_FIELDS):
+        detections[field] = xyxy[:, i]
+    detections["conf"] = conf
+    detections["class_id"] = class_ids
+    return detections
+
+
+def from_ultralytics(result):
+    """
+    Chuyển ultralytics Results của một frame thành mảng detection (một lần copy từ tensor)
+
+    Args:
+        result: ultralytics Results
+
+    Returns:
+        Structured array dtype DETECTION_DTYPE
+    """
+    data = result.boxes.data.cpu().numpy()  # (N, 6): x1, y1, x2, y2, conf, cls
+    return make_detections(data[:, :4], data[:, -2], data[:, -1])
+
+
+def detection_boxes(detections):
+    """
+    Lấy tọa độ box dạng mảng float (N, 4)
+
+    Args:
+        detections: Structured array có các field x1, y1, x2, y2
+
+    Returns:
+        np.ndarray float64 (N, 4)
+    """
+    boxes = np.empty((len(detections), 4), dtype=np.float64)
+    for i, field in enumerate(BOX_FIELDS):
+        boxes[:, i] = detections[field]
+    return boxes
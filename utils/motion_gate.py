@@ -0,0 +1,95 @@
+"""
+Motion Gate - Bỏ qua inference khi khung hình gần như không đổi
+Chức năng:
+- So sánh frame hiện tại với frame lúc detect gần nhất trên ảnh xám thu nhỏ (rất rẻ)
+- Chỉ cho phép detect khi tỉ lệ pixel thay đổi vượt ngưỡng
+- Buộc detect lại sau một khoảng thời gian tối đa (max staleness)
+- Thống kê tỉ lệ frame bị bỏ qua
+"""
+
+import time
+
+import cv2
+
+
+class MotionGate:
+    """Quyết định có cần chạy detection cho frame hay không dựa trên frame differencing"""
+
+    def __init__(self, threshold=0.02, pixel_delta=12, max_staleness=2.0, size=(64, 48)):
+        """
+        Args:
+            threshold: Tỉ lệ pixel thay đổi tối thiểu (0-1) để coi là có chuyển động
+            pixel_delta: Độ chênh mức xám tối thiểu để một pixel được coi là thay đổi
+            max_staleness: Thời gian tối đa (giây) giữa hai lần detect dù cảnh không đổi
+            size: Kích thước ảnh thu nhỏ dùng để so sánh (w, h)
+        """
+        self.threshold = threshold
+        self.pixel_delta = pixel_delta
+        self.max_staleness = max_staleness
+        self.size = size
+
+        self._reference = None  # Thumbnail tại lần detect gần nhất
+        self._last_detect_time = 0.0
+
+        # Thống kê
+        self.checked = 0
+        self.skipped = 0
+        self.last_change = 0.0
+
+    def _thumbnail(self, frame):
+        # Thu nhỏ trước rồi mới chuyển xám để giảm chi phí
+        small = cv2.resize(frame, self.size, interpolation=cv2.INTER_AREA)
+        return cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+
+    def should_detect(self, frame, now=None):
+        """
+        Kiểm tra frame có cần detect không (nếu có thì frame trở thành tham chiếu mới)
+
+        Args:
+            frame: Frame BGR
+
+        Returns:
+            True nếu nên chạy detection
+        """
+        now = time.time() if now is None else now
+        self.checked += 1
+        thumbnail = self._thumbnail(frame)
+
+        if self._reference is not None and now - self._last_detect_time < self.max_staleness:
+            diff = cv2.absdiff(thumbnail, self._reference)
+            changed = cv2.countNonZero(cv2.threshold(diff, self.pixel_delta, 255, cv2.THRESH_BINARY)[1])
+            self.last_change = changed / diff.size
+            if self.last_change < self.threshold:
+                self.skipped += 1
+                return False
+
+        self._reference = thumbnail
+        self._last_detect_time = now
+        return True
+
+    def reset(self):
+        """Xóa tham chiếu và thống kê (lần kiểm tra tiếp theo luôn detect)"""
+        self._reference = None
+        self._last_detect_time = 0.0
+        self.checked = 0
+        self.skipped = 0
+        self.last_change = 0.0
+
+    @property
+    def skip_ratio(self):
+        """Tỉ lệ frame bị bỏ qua inference"""
+        return self.skipped / self.checked if self.checked else 0.0
+
+    def snapshot(self):
+        """
+        Returns:
+            Dict thống kê của motion gate
+        """
+        return {
+            "checked": self.checked,
+            "skipped": self.skipped,
+            "skip_ratio": round(self.skip_ratio, 3),
+            "last_change": round(self.last_change, 4),
+            "threshold": self.threshold,
+            "max_staleness": self.max_staleness,
+        }
@@ -0,0 +1,233 @@
+"""
+Outbox - Flow control khi gửi frame tới từng client
+Chức năng:
+- ClientOutbox: mỗi client chỉ có tối đa 1 frame đang gửi (chờ ack) + 1 frame chờ (luôn là frame mới nhất)
+- OutboxRegistry: quản lý outbox theo (client, stream), dispatch frame của stream tới mọi client
+- Thống kê số frame gửi / bị bỏ / độ trễ ack của từng client, tổng cộng dồn theo stream (cho /metrics)
+"""
+
+import threading
+import time
+
+TOTAL_KEYS = ("sent", "dropped", "bytes_sent")
+
+
+class ClientOutbox:
+    """Hộp thư gửi frame cho một client: gửi khi client đã ack, nếu chưa thì chỉ giữ frame mới nhất"""
+
+    def __init__(self, client_id, send, ack_timeout=2.0):
+        """
+        Args:
+            client_id: ID của client (Socket.IO sid)
+            send: Function send(payload, on_ack) thực hiện gửi, gọi on_ack() khi client xác nhận
+            ack_timeout: Sau thời gian này (giây) không có ack thì coi như ack bị mất và gửi tiếp
+        """
+        self.client_id = client_id
+        self._send = send
+        self.ack_timeout = ack_timeout
+
+        self._lock = threading.Lock()
+        self._pending = None
+        self._in_flight = False
+        self._sent_at = 0.0
+
+        # Thống kê
+        self.sent = 0
+        self.acked = 0
+        self.dropped = 0
+        self.ack_timeouts = 0
+        self.bytes_sent = 0
+        self.last_rtt = 0.0
+
+    def offer(self, payload):
+        """
+        Đưa frame mới vào outbox
+
+        Args:
+            payload: Dữ liệu frame (bytes)
+
+        Returns:
+            True nếu frame được gửi ngay, False nếu đang chờ ack (frame được giữ lại thay frame cũ)
+        """
+        with self._lock:
+            if self._in_flight:
+                if time.time() - self._sent_at < self.ack_timeout:
+                    if self._pending is not None:
+                        self.dropped += 1
+                    self._pending = payload
+                    return False
+                # Không nhận được ack quá lâu, coi như mất và gửi tiếp
+                self.ack_timeouts += 1
+            if self._pending is not None:
+                self.dropped += 1
+                self._pending = None
+            self._in_flight = True
+            self._sent_at = time.time()
+
+        self._deliver(payload)
+        return True
+
+    def ack(self, *args):
+        """Client đã nhận xong frame, gửi frame đang chờ (nếu có)"""
+        with self._lock:
+            if not self._in_flight:
+                return
+            self.acked += 1
+            self.last_rtt = time.time() - self._sent_at
+            payload = self._pending
+            self._pending = None
+            self._in_flight = payload is not None
+            if payload is not None:
+                self._sent_at = time.time()
+
+        if payload is not None:
+            self._deliver(payload)
+
+    def _deliver(self, payload):
+        # Gửi ngoài lock: callback ack có thể được gọi ngay trong send
+        self.sent += 1
+        self.bytes_sent += len(payload)
+        self._send(payload, self.ack)
+
+    def get_stats(self):
+        """
+        Returns:
+            Dict thống kê của client
+        """
+        return {
+            "sent": self.sent,
+            "acked": self.acked,
+            "dropped": self.dropped,
+            "ack_timeouts": self.ack_timeouts,
+            "bytes_sent": self.bytes_sent,
+            "in_flight": self._in_flight,
+            "last_rtt_ms": round(self.last_rtt * 1000, 1),
+        }
+
+
+class OutboxRegistry:
+    """Quản lý ClientOutbox theo client và stream"""
+
+    def __init__(self, ack_timeout=2.0):
+        self.ack_timeout = ack_timeout
+        self._lock = threading.Lock()
+        self._outboxes = {}  # stream_url -> {client_id: ClientOutbox}
+        self._retired = {}  # stream_url -> tổng thống kê của các client đã rời stream
+
+    def _retire(self, stream_url, outbox):
+        totals = self._retired.setdefault(stream_url, dict.fromkeys(TOTAL_KEYS, 0))
+        for key in TOTAL_KEYS:
+            totals[key] += getattr(outbox, key)
+
+    def add(self, client_id, stream_url, send):
+        """
+        Đăng ký client nhận frame của stream
+
+        Args:
+            client_id: ID của client
+            stream_url: URL của stream
+            send: Function send(payload, on_ack)
+        """
+        with self._lock:
+            clients = self._outboxes.setdefault(stream_url, {})
+            if client_id not in clients:
+                clients[client_id] = ClientOutbox(client_id, send, self.ack_timeout)
+
+    def remove(self, client_id, stream_url):
+        """Hủy đăng ký client khỏi một stream"""
+        with self._lock:
+            clients = self._outboxes.get(stream_url)
+            if clients is None:
+                return
+            outbox = clients.pop(client_id, None)
+            if outbox is not None:
+                self._retire(stream_url, outbox)
+            if not clients:
+                del self._outboxes[stream_url]
+
+    def remove_client(self, client_id):
+        """
+        Hủy đăng ký client khỏi mọi stream (khi disconnect)
+
+        Returns:
+            List stream_url client đã đăng ký
+        """
+        with self._lock:
+            streams = [url for url, clients in self._outboxes.items() if client_id in clients]
+        for stream_url in streams:
+            self.remove(client_id, stream_url)
+        return streams
+
+    def streams_of(self, client_id):
+        """List stream_url mà client đang xem"""
+        with self._lock:
+            return [url for url, clients in self._outboxes.items() if client_id in clients]
+
+    def dispatch(self, stream_url, payload):
+        """
+        Gửi frame của stream tới tất cả client (mỗi client theo tốc độ riêng)
+
+        Args:
+            stream_url: URL của stream
+            payload: Frame bytes
+        """
+        with self._lock:
+            outboxes = list(self._outboxes.get(stream_url, {}).values())
+        for outbox in outboxes:
+            outbox.offer(payload)
+
+    def get_stats(self, stream_url=None):
+        """
+        Thống kê theo client
+
+        Args:
+            stream_url: Chỉ lấy thống kê của stream này (None = tất cả)
+
+        Returns:
+            Dict {stream_url: {client_id: stats}}
+        """
+        with self._lock:
+            items = [
+                (url, dict(clients))
+                for url, clients in self._outboxes.items()
+                if stream_url is None or url == stream_url
+            ]
+        return {url: {cid: outbox.get_stats() for cid, outbox in clients.items()} for url, clients in items}
+
+    def totals(self):
+        """
+        Tổng cộng dồn theo stream, gồm cả client đã ngắt kết nối (không giảm khi client rời đi)
+
+        Returns:
+            Dict {stream_url: {"clients", "sent", "dropped", "bytes_sent"}}
+        """
+        with self._lock:
+            result = {url: dict(totals, clients=0) for url, totals in self._retired.items()}
+            for url, clients in self._outboxes.items():
+                totals = result.setdefault(url, dict(dict.fromkeys(TOTAL_KEYS, 0), clients=0))
+                totals["clients"] = len(clients)
+                for outbox in clients.values():
+                    for key in TOTAL_KEYS:
+                        totals[key] += getattr(outbox, key)
+        return result
+
+
+# Registry dùng chung cho Socket.IO (admin_app) và API thống kê
+_outbox_registry = OutboxRegistry()
+_metadata_outbox_registry = OutboxRegistry()
+_raw_outbox_registry = OutboxRegistry()
+
+
+def get_outbox_registry():
+    """Lấy OutboxRegistry dùng chung (client nhận JPEG)"""
+    return _outbox_registry
+
+
+def get_metadata_outbox_registry():
+    """Lấy OutboxRegistry của client chế độ metadata (chỉ nhận detections)"""
+    return _metadata_outbox_registry
+
+
+def get_raw_outbox_registry():
+    """Lấy OutboxRegistry của client chế độ passthrough (nhận JPEG gốc không overlay)"""
+    return _raw_outbox_registry
@@ -0,0 +1,168 @@
+"""
+Overlay Renderer - Vẽ overlay detection / stats không cấp phát lại mỗi frame
+Chức năng:
+- Pool buffer frame tái sử dụng (copy frame nguồn vào buffer có sẵn thay vì frame.copy())
+- Vẽ bounding box trực tiếp lên buffer
+- Cache sprite label đã render sẵn theo class / mức confidence / track ID
+- Làm tối nền stats panel chỉ trong vùng ROI (không addWeighted cả frame)
+"""
+
+import cv2
+import numpy as np
+
+
+class FramePool:
+    """Vòng buffer frame cố định, cấp lại khi kích thước frame thay đổi"""
+
+    def __init__(self, size=3):
+        """
+        Args:
+            size: Số buffer trong vòng (>= 2 để buffer đang được đọc không bị ghi đè ngay)
+        """
+        self.size = max(2, size)
+        self._buffers = []
+        self._index = 0
+
+    def acquire(self, shape, dtype=np.uint8):
+        """
+        Lấy buffer kế tiếp trong vòng
+
+        Args:
+            shape: Kích thước frame
+            dtype: Kiểu dữ liệu
+
+        Returns:
+            np.ndarray (nội dung cũ, cần ghi đè)
+        """
+        if not self._buffers or self._buffers[0].shape != shape or self._buffers[0].dtype != dtype:
+            self._buffers = [np.empty(shape, dtype=dtype) for _ in range(self.size)]
+            self._index = 0
+
+        buffer = self._buffers[self._index]
+        self._index = (self._index + 1) % self.size
+        return buffer
+
+
+class OverlayRenderer:
+    """Renderer overlay dùng lại buffer và sprite label giữa các frame"""
+
+    FONT = cv2.FONT_HERSHEY_SIMPLEX
+
+    def __init__(self, color_fn, pool_size=3, conf_step=0.05, max_sprites=512):
+        """
+        Args:
+            color_fn: Hàm class_name -> màu BGR
+            pool_size: Số buffer frame trong pool
+            conf_step: Độ rộng mỗi mức confidence trên label (sprite được cache theo mức)
+            max_sprites: Số sprite label tối đa trong cache
+        """
+        self.color_fn = color_fn
+        self.pool = FramePool(pool_size)
+        self.conf_step = conf_step
+        self.max_sprites = max_sprites
+        self._sprites = {}
+
+    def prepare(self, frame):
+        """
+        Copy frame nguồn vào buffer của pool (frame nguồn vẫn được stage infer dùng nên không vẽ trực tiếp)
+
+        Args:
+            frame: Frame từ capture
+
+        Returns:
+            Buffer để vẽ overlay
+        """
+        canvas = self.pool.acquire(frame.shape, frame.dtype)
+        np.copyto(canvas, frame)
+        return canvas
+
+    def _label_sprite(self, class_name, conf, track_id):
+        """Sprite label (nền màu class + chữ) đã render, cache theo (class, mức confidence, track ID)"""
+        bucket = round(conf / self.conf_step) * self.conf_step
+        key = (class_name, round(bucket, 2), track_id)
+        sprite = self._sprites.get(key)
+        if sprite is not None:
+            return sprite
+
+        label = f"{class_name}: {bucket:.2f}"
+        if track_id is not None:
+            label = f"#{track_id} {label}"
+        (text_w, text_h), _ = cv2.getTextSize(label, self.FONT, 0.5, 1)
+
+        # Cùng hình học với cách vẽ cũ: nền từ (x1, y1 - text_h - 8) tới (x1 + text_w, y1), chữ tại y1 - 5
+        sprite = np.empty((text_h + 9, text_w + 1, 3), dtype=np.uint8)
+        sprite[:] = self.color_fn(class_name)
+
+        # Chữ đen cho look_away (nền vàng), trắng cho các class khác
+        text_color = (0, 0, 0) if class_name == "look_away" else (255, 255, 255)
+        cv2.putText(sprite, label, (0, text_h + 3), self.FONT, 0.5, text_color, 1)
+
+        if len(self._sprites) >= self.max_sprites:
+            self._sprites.clear()
+        self._sprites[key] = sprite
+        return sprite
+
+    @staticmethod
+    def _blit(canvas, sprite, x, y):
+        """Dán sprite vào canvas tại góc trên trái (x, y), cắt phần nằm ngoài frame"""
+        h, w = canvas.shape[:2]
+        sh, sw = sprite.shape[:2]
+        x0, y0 = max(x, 0), max(y, 0)
+        x1, y1 = min(x + sw, w), min(y + sh, h)
+        if x0 >= x1 or y0 >= y1:
+            return
+        canvas[y0:y1, x0:x1] = sprite[y0 - y : y1 - y, x0 - x : x1 - x]
+
+    def draw_boxes(self, canvas, detections, class_names):
+        """
+        Vẽ bounding box và label trực tiếp lên canvas
+
+        Args:
+            canvas: Buffer từ prepare()
+            detections: Mảng DETECTION_DTYPE hoặc TRACK_DTYPE
+            class_names: Dict class_id -> tên class
+
+        Returns:
+            canvas
+        """
+        for detection in detections.tolist():
+            x1, y1, x2, y2, conf, class_id = detection[:6]
+            track_id = detection[6] if len(detection) > 6 else None
+            class_name = class_names.get(class_id, str(class_id))
+
+            cv2.rectangle(canvas, (x1, y1), (x2, y2), self.color_fn(class_name), 1)
+            sprite = self._label_sprite(class_name, conf, track_id)
+            self._blit(canvas, sprite, x1, y1 - sprite.shape[0] + 1)
+
+        return canvas
+
+    def draw_panel(self, canvas, lines, origin=(10, 10), width=390, line_height=30, padding=10, alpha=0.4):
+        """
+        Vẽ stats panel nền tối bán trong suốt, chỉ xử lý vùng panel
+
+        Args:
+            canvas: Buffer để vẽ
+            lines: List of (text, màu BGR)
+            origin: Góc trên trái của panel
+            width: Chiều rộng panel
+            line_height: Khoảng cách giữa các dòng
+            padding: Lề trong panel
+            alpha: Độ sáng giữ lại của nền (0.4 = làm tối 60%)
+
+        Returns:
+            canvas
+        """
+        x, y = origin
+        h, w = canvas.shape[:2]
+        panel_height = line_height * len(lines) + padding * 2
+        roi = canvas[y : min(y + panel_height + 1, h), x : min(x + width + 1, w)]
+        if roi.size:
+            darkened = cv2.convertScaleAbs(roi, dst=roi, alpha=alpha)
+            if darkened is not roi:
+                roi[:] = darkened
+
+        y_offset = y + padding + 20
+        for text, color in lines:
+            cv2.putText(canvas, text, (x + 10, y_offset), self.FONT, 0.6, color, 2)
+            y_offset += line_height
+        return canvas
@@ -0,0 +1,127 @@
+"""
+Pipeline - Các thành phần dùng chung cho pipeline xử lý video nhiều stage
+Chức năng:
+- DropOldestQueue: hàng đợi giới hạn, đầy thì bỏ item cũ nhất (luôn giữ frame mới nhất)
+- StageCounter: đếm throughput / thời gian xử lý của từng stage
+"""
+
+import collections
+import queue
+import threading
+import time
+
+
+class DropOldestQueue:
+    """Hàng đợi có giới hạn, khi đầy sẽ bỏ item cũ nhất thay vì block producer"""
+
+    def __init__(self, maxsize=1):
+        """
+        Args:
+            maxsize: Số item tối đa giữ trong hàng đợi
+        """
+        self.maxsize = max(1, int(maxsize))
+        self._items = collections.deque()
+        self._cond = threading.Condition()
+        self.dropped = 0  # Số item bị bỏ do consumer chậm
+
+    def put(self, item):
+        """
+        Thêm item, bỏ item cũ nhất nếu hàng đợi đầy (không bao giờ block)
+
+        Returns:
+            True nếu phải bỏ item cũ
+        """
+        with self._cond:
+            dropped = False
+            while len(self._items) >= self.maxsize:
+                self._items.popleft()
+                self.dropped += 1
+                dropped = True
+            self._items.append(item)
+            self._cond.notify()
+            return dropped
+
+    def get(self, timeout=None):
+        """
+        Lấy item cũ nhất còn trong hàng đợi
+
+        Args:
+            timeout: Thời gian chờ tối đa (giây), None = chờ mãi
+
+        Raises:
+            queue.Empty: Nếu hết timeout mà không có item
+        """
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._items, timeout):
+                raise queue.Empty
+            return self._items.popleft()
+
+    def clear(self):
+        """Xóa toàn bộ item"""
+        with self._cond:
+            self._items.clear()
+
+    def qsize(self):
+        """Số item hiện có"""
+        return len(self._items)
+
+
+class StageCounter:
+    """Đếm số item đã xử lý, thời gian xử lý và throughput của một stage"""
+
+    def __init__(self, name, window=2.0):
+        """
+        Args:
+            name: Tên stage (capture / infer / render ...)
+            window: Khoảng thời gian (giây) để tính lại FPS
+        """
+        self.name = name
+        self.window = window
+        self.count = 0
+        self.busy_time = 0.0  # Tổng thời gian xử lý (giây)
+        self.last_duration = 0.0
+        self.fps = 0.0
+
+        self._window_start = time.time()
+        self._window_count = 0
+
+    def tick(self, duration=0.0):
+        """
+        Ghi nhận một item vừa được xử lý xong
+
+        Args:
+            duration: Thời gian xử lý item (giây)
+        """
+        self.count += 1
+        self.busy_time += duration
+        self.last_duration = duration
+        self._window_count += 1
+
+        now = time.time()
+        elapsed = now - self._window_start
+        if elapsed >= self.window:
+            self.fps = self._window_count / elapsed
+            self._window_start = now
+            self._window_count = 0
+
+    def reset(self):
+        """Reset toàn bộ bộ đếm"""
+        self.count = 0
+        self.busy_time = 0.0
+        self.last_duration = 0.0
+        self.fps = 0.0
+        self._window_start = time.time()
+        self._window_count = 0
+
+    def snapshot(self):
+        """
+        Returns:
+            Dict thống kê của stage
+        """
+        avg_ms = self.busy_time / self.count * 1000 if self.count else 0.0
+        return {
+            "count": self.count,
+            "fps": round(self.fps, 2),
+            "avg_ms": round(avg_ms, 2),
+            "last_ms": round(self.last_duration * 1000, 2),
+        }
@@ -0,0 +1,85 @@
+"""
+Rate Controller - Tự động chọn frame_skip cho YOLO detection
+Chức năng:
+- Đo latency inference thực tế (chi phí mỗi frame của engine) và FPS của source
+- Chia ngân sách CPU của engine cho các stream đang chạy
+- Chọn frame_skip để đạt detection rate mục tiêu mà không vượt ngân sách
+"""
+
+import math
+import time
+
+
+class DetectionRateController:
+    """Vòng điều khiển kín chọn tần suất detect cho một stream"""
+
+    def __init__(self, target_fps=5.0, cpu_budget=0.8, min_skip=1, max_skip=30, update_interval=1.0, frame_skip=3):
+        """
+        Args:
+            target_fps: Số lần detect mong muốn mỗi giây cho một stream
+            cpu_budget: Tỉ lệ thời gian tối đa engine được bận inference (0-1), chia đều cho các stream
+            min_skip: frame_skip nhỏ nhất (1 = detect mọi frame)
+            max_skip: frame_skip lớn nhất
+            update_interval: Chu kỳ (giây) tính lại frame_skip
+            frame_skip: Giá trị khởi tạo trước khi có số đo
+        """
+        self.target_fps = target_fps
+        self.cpu_budget = cpu_budget
+        self.min_skip = min_skip
+        self.max_skip = max_skip
+        self.update_interval = update_interval
+
+        self.frame_skip = frame_skip
+        self.detection_fps = 0.0  # Tần suất detect đã chọn (lần/giây)
+        self.allowed_fps = 0.0  # Tần suất tối đa ngân sách CPU cho phép
+        self.source_fps = 0.0
+        self._last_update = 0.0
+
+    def update(self, source_fps, frame_time, active_streams, now=None):
+        """
+        Cập nhật frame_skip theo số đo mới nhất (tự giới hạn theo update_interval)
+
+        Args:
+            source_fps: FPS thực tế của source
+            frame_time: Thời gian inference trung bình mỗi frame (giây)
+            active_streams: Số stream đang chia sẻ engine
+
+        Returns:
+            frame_skip đã chọn
+        """
+        now = time.time() if now is None else now
+        if now - self._last_update < self.update_interval or source_fps <= 0:
+            return self.frame_skip
+        self._last_update = now
+
+        # Engine có thể xử lý (cpu_budget / frame_time) frame/giây, chia đều cho các stream
+        if frame_time > 0:
+            self.allowed_fps = self.cpu_budget / frame_time / max(1, active_streams)
+        else:
+            self.allowed_fps = self.target_fps
+
+        rate = min(self.target_fps, self.allowed_fps, source_fps)
+        if rate <= 0:
+            skip = self.max_skip
+        else:
+            # Làm tròn lên để không vượt ngân sách
+            skip = math.ceil(source_fps / rate - 1e-6)
+        self.frame_skip = max(self.min_skip, min(self.max_skip, skip))
+
+        self.source_fps = source_fps
+        self.detection_fps = source_fps / self.frame_skip
+        return self.frame_skip
+
+    def snapshot(self):
+        """
+        Returns:
+            Dict trạng thái của controller
+        """
+        return {
+            "frame_skip": self.frame_skip,
+            "detection_fps": round(self.detection_fps, 2),
+            "target_fps": self.target_fps,
+            "allowed_fps": round(self.allowed_fps, 2),
+            "source_fps": round(self.source_fps, 2),
+            "cpu_budget": self.cpu_budget,
+        }
@@ -0,0 +1,125 @@
+"""
+Tracing - Ghi span theo từng frame, từng stage để xem pipeline trên Chrome trace / Perfetto
+Chức năng:
+- FrameTracer: ring buffer có giới hạn các span (tên, stream, thời điểm bắt đầu / kết thúc, frame id, thread)
+- Tắt (mặc định): hot path chỉ kiểm tra tracer.enabled, không tạo object nào
+- to_chrome_trace: chuyển span sang JSON "Trace Event Format" (mở bằng chrome://tracing hoặc ui.perfetto.dev),
+  mỗi stream là một process, mỗi thread (reader / capture / infer / render) là một track
+
+Thời gian dùng time.perf_counter() (monotonic, cùng gốc giữa các process trên Linux) nên ghép được span
+từ worker process (YOLO_WORKER_MODE=process) vào cùng timeline.
+"""
+
+import collections
+import threading
+
+
+class FrameTracer:
+    """Ring buffer span của pipeline (span cũ nhất bị bỏ khi đầy)"""
+
+    def __init__(self, capacity=50000, enabled=False):
+        """
+        Args:
+            capacity: Số span tối đa giữ trong bộ nhớ
+            enabled: Bật ghi span ngay từ đầu
+        """
+        self.enabled = enabled
+        self.capacity = capacity
+        self.recorded = 0
+        self._spans = collections.deque(maxlen=capacity)
+
+    def enable(self, capacity=None):
+        """Bật ghi span (đổi capacity sẽ xóa span cũ)"""
+        if capacity and capacity != self.capacity:
+            self.capacity = capacity
+            self._spans = collections.deque(maxlen=capacity)
+        self.enabled = True
+
+    def disable(self):
+        """Tắt ghi span (span đã ghi vẫn giữ để export)"""
+        self.enabled = False
+
+    def clear(self):
+        self._spans.clear()
+        self.recorded = 0
+
+    def record(self, name, stream, start, end, frame_id=None):
+        """
+        Ghi một span (chỉ gọi khi enabled, caller tự kiểm tra để hot path không tốn gì khi tắt)
+
+        Args:
+            name: Tên bước (read, capture, inference, draw, encode, emit, ...)
+            stream: stream_url
+            start, end: time.perf_counter() lúc bắt đầu / kết thúc
+            frame_id: Sequence number của frame (None nếu không gắn với frame)
+        """
+        thread = threading.current_thread()
+        # deque.append thread-safe, không cần lock
+        self._spans.append((name, stream, start, end, frame_id, thread.ident, thread.name))
+        self.recorded += 1
+
+    def spans(self, stream=None):
+        """
+        Returns:
+            List span (tuple) hiện có, lọc theo stream nếu có
+        """
+        spans = self._spans.copy()  # Copy nguyên khối trong C, không bị lỗi khi thread khác đang append
+        if stream is None:
+            return list(spans)
+        return [span for span in spans if span[1] == stream]
+
+    def get_stats(self):
+        return {
+            "enabled": self.enabled,
+            "capacity": self.capacity,
+            "buffered": len(self._spans),
+            "recorded": self.recorded,
+        }
+
+
+def to_chrome_trace(spans):
+    """
+    Chuyển span sang Trace Event Format
+
+    Args:
+        spans: List span từ FrameTracer.spans() (có thể gộp từ nhiều process)
+
+    Returns:
+        Dict {"traceEvents": [...], "displayTimeUnit": "ms"} (json.dumps để lưu file)
+    """
+    stream_ids = {}
+    thread_names = {}
+    events = []
+    for name, stream, start, end, frame_id, tid, thread_name in sorted(spans, key=lambda span: span[2]):
+        pid = stream_ids.setdefault(stream, len(stream_ids) + 1)
+        thread_names[(pid, tid)] = thread_name
+        event = {
+            "name": name,
+            "cat": "pipeline",
+            "ph": "X",
+            "ts": round(start * 1e6, 3),
+            "dur": round(max(end - start, 0.0) * 1e6, 3),
+            "pid": pid,
+            "tid": tid,
+        }
+        if frame_id is not None:
+            event["args"] = {"frame": frame_id}
+        events.append(event)
+
+    metadata = [
+        {"name": "process_name", "ph": "M", "pid": pid, "args": {"name": stream}} for stream, pid in stream_ids.items()
+    ]
+    metadata += [
+        {"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": name}}
+        for (pid, tid), name in thread_names.items()
+    ]
+    return {"traceEvents": metadata + events, "displayTimeUnit": "ms"}
+
+
+# Tracer dùng chung của process (yolo_processor bật theo YOLO_TRACE, API bật / tắt lúc chạy)
+_tracer = FrameTracer()
+
+
+def get_tracer():
+    """Lấy FrameTracer dùng chung"""
+    return _tracer
@@ -0,0 +1,270 @@
+"""
+Box Tracker - Theo dõi object giữa các lần chạy YOLO
+Chức năng:
+- Ghép detection mới với track cũ theo IoU (cùng class)
+- Kalman filter vận tốc hằng (cx, cy, w, h) để dự đoán vị trí box trên mọi frame
+- Gán track ID ổn định, tự xóa track không còn được detect
+- Chỉ hiển thị track được ghép ở lần detect gần nhất: track mất detection chỉ được giữ để ghép lại
+  (không vẽ box "ma" khi object đi nhanh hoặc đã rời khung hình / đổi class)
+"""
+
+import threading
+import time
+
+import numpy as np
+
+from .detections import TRACK_DTYPE, detection_boxes, empty_detections
+
+
+def _iou_matrix(boxes_a, boxes_b):
+    """IoU giữa hai mảng box (N, 4) và (M, 4) dạng x1, y1, x2, y2"""
+    if len(boxes_a) == 0 or len(boxes_b) == 0:
+        return np.zeros((len(boxes_a), len(boxes_b)))
+    a = boxes_a[:, None, :]
+    b = boxes_b[None, :, :]
+    inter_w = np.clip(np.minimum(a[..., 2], b[..., 2]) - np.maximum(a[..., 0], b[..., 0]), 0, None)
+    inter_h = np.clip(np.minimum(a[..., 3], b[..., 3]) - np.maximum(a[..., 1], b[..., 1]), 0, None)
+    inter = inter_w * inter_h
+    area_a = (a[..., 2] - a[..., 0]) * (a[..., 3] - a[..., 1])
+    area_b = (b[..., 2] - b[..., 0]) * (b[..., 3] - b[..., 1])
+    return inter / np.maximum(area_a + area_b - inter, 1e-9)
+
+
+def _to_state(box):
+    x1, y1, x2, y2 = box
+    return np.array([(x1 + x2) / 2, (y1 + y2) / 2, x2 - x1, y2 - y1], dtype=np.float64)
+
+
+def _to_box(state):
+    cx, cy, w, h = state[:4]
+    w, h = max(w, 1.0), max(h, 1.0)
+    return np.array([cx - w / 2, cy - h / 2, cx + w / 2, cy + h / 2])
+
+
+class Track:
+    """Một object đang được theo dõi (Kalman state: cx, cy, w, h và vận tốc theo giây)"""
+
+    def __init__(self, track_id, box, conf, class_id, timestamp, process_noise, measurement_noise):
+        self.track_id = track_id
+        self.class_id = class_id
+        self.conf = conf
+        self.timestamp = timestamp  # Thời điểm của state hiện tại
+        self.last_seen = timestamp  # Thời điểm được detect gần nhất
+        self.hits = 1
+
+        self.process_noise = process_noise
+        self.measurement_noise = measurement_noise
+
+        self.x = np.zeros(8)
+        self.x[:4] = _to_state(box)
+        self.P = np.diag([10.0, 10.0, 10.0, 10.0, 1000.0, 1000.0, 1000.0, 1000.0])
+
+    def _transition(self, dt):
+        F = np.eye(8)
+        F[:4, 4:] = np.eye(4) * dt
+        return F
+
+    def predict_box(self, timestamp):
+        """
+        Dự đoán box tại thời điểm timestamp (không thay đổi state)
+
+        Returns:
+            np.array [x1, y1, x2, y2]
+        """
+        dt = max(0.0, timestamp - self.timestamp)
+        return _to_box(self.x[:4] + self.x[4:] * dt)
+
+    def predict(self, timestamp):
+        """Đưa state tới thời điểm timestamp (bước predict của Kalman)"""
+        dt = max(0.0, timestamp - self.timestamp)
+        if dt > 0:
+            F = self._transition(dt)
+            self.x = F @ self.x
+            # Nhiễu quá trình tăng theo dt, tỉ lệ với kích thước box
+            scale = max(self.x[2], self.x[3])
+            q = (self.process_noise * scale) ** 2
+            Q = np.diag([q * dt, q * dt, q * dt, q * dt, q, q, q, q])
+            self.P = F @ self.P @ F.T + Q
+        self.timestamp = max(self.timestamp, timestamp)
+
+    def update(self, box, conf, timestamp):
+        """Cập nhật state bằng detection mới (bước update của Kalman)"""
+        self.predict(timestamp)
+        z = _to_state(box)
+        r = (self.measurement_noise * max(z[2], z[3])) ** 2
+        R = np.eye(4) * r
+
+        H = np.zeros((4, 8))
+        H[:, :4] = np.eye(4)
+        S = H @ self.P @ H.T + R
+        K = self.P @ H.T @ np.linalg.inv(S)
+        self.x = self.x + K @ (z - H @ self.x)
+        self.P = (np.eye(8) - K @ H) @ self.P
+
+        self.conf = conf
+        self.last_seen = timestamp
+        self.hits += 1
+
+    def hold(self, timestamp):
+        """Cảnh đứng yên: giữ nguyên vị trí, bỏ vận tốc và coi như vừa được thấy"""
+        self.predict(timestamp)
+        self.x[4:] = 0.0
+        self.last_seen = timestamp
+
+
+class BoxTracker:
+    """Tracker nhẹ chạy giữa các lần detect, dùng chung giữa stage infer và render"""
+
+    def __init__(self, iou_threshold=0.3, max_age=1.0, process_noise=0.05, measurement_noise=0.05):
+        """
+        Args:
+            iou_threshold: IoU tối thiểu để ghép detection với track
+            max_age: Thời gian (giây) giữ track khi không còn được detect (chỉ để ghép lại, không hiển thị)
+            process_noise: Nhiễu chuyển động (tỉ lệ theo kích thước box)
+            measurement_noise: Nhiễu đo của detector (tỉ lệ theo kích thước box)
+        """
+        self.iou_threshold = iou_threshold
+        self.max_age = max_age
+        self.process_noise = process_noise
+        self.measurement_noise = measurement_noise
+
+        self.tracks = []
+        self.next_id = 1
+        self.last_update = None  # Thời điểm lần detect (hoặc hold) gần nhất
+        self.lock = threading.Lock()
+
+    def _visible(self):
+        """Track được ghép / tạo ở lần detect gần nhất (hoặc được giữ nguyên bởi hold)"""
+        return [t for t in self.tracks if t.last_seen == self.last_update]
+
+    def update(self, detections, timestamp=None):
+        """
+        Ghép detections mới vào các track
+
+        Args:
+            detections: Mảng detection (DETECTION_DTYPE)
+            timestamp: Thời điểm capture của frame được detect
+
+        Returns:
+            Số track đang hoạt động
+        """
+        timestamp = time.time() if timestamp is None else timestamp
+
+        with self.lock:
+            for track in self.tracks:
+                track.predict(timestamp)
+
+            det_boxes = detection_boxes(detections)
+            det_conf = detections["conf"].tolist()
+            det_classes = detections["class_id"]
+            track_boxes = np.array([_to_box(t.x) for t in self.tracks]).reshape(-1, 4)
+            ious = _iou_matrix(track_boxes, det_boxes)
+
+            # Chỉ ghép track và detection cùng class
+            track_classes = np.array([t.class_id for t in self.tracks], dtype=det_classes.dtype)
+            ious[track_classes[:, None] != det_classes[None, :]] = 0.0
+
+            # Ghép tham lam theo IoU giảm dần (số object mỗi frame nhỏ)
+            matched_tracks, matched_dets = set(), set()
+            if ious.size:
+                for flat in np.argsort(-ious, axis=None):
+                    i, j = divmod(int(flat), ious.shape[1])
+                    if ious[i, j] < self.iou_threshold:
+                        break
+                    if i in matched_tracks or j in matched_dets:
+                        continue
+                    self.tracks[i].update(det_boxes[j], det_conf[j], timestamp)
+                    matched_tracks.add(i)
+                    matched_dets.add(j)
+
+            for j, class_id in enumerate(det_classes.tolist()):
+                if j not in matched_dets:
+                    self.tracks.append(
+                        Track(
+                            self.next_id,
+                            det_boxes[j],
+                            det_conf[j],
+                            class_id,
+                            timestamp,
+                            self.process_noise,
+                            self.measurement_noise,
+                        )
+                    )
+                    self.next_id += 1
+
+            # Track không được ghép ở lần detect này chỉ còn dùng để ghép, bỏ luôn nếu đã quá max_age
+            self.tracks = [
+                t
+                for i, t in enumerate(self.tracks)
+                if i in matched_tracks or timestamp - t.last_seen <= self.max_age
+            ]
+            self.last_update = timestamp
+            return len(self.tracks)
+
+    def hold(self, timestamp=None):
+        """
+        Giữ nguyên các track khi bỏ qua detection vì cảnh không đổi (motion gate)
+
+        Args:
+            timestamp: Thời điểm capture của frame bị bỏ qua
+        """
+        timestamp = time.time() if timestamp is None else timestamp
+        with self.lock:
+            # Chỉ giữ track đang hiển thị, track đã mất detection tiếp tục già đi
+            for track in self._visible():
+                track.hold(timestamp)
+            if self.last_update is not None:
+                self.last_update = timestamp
+
+    def predict(self, timestamp=None, frame_shape=None):
+        """
+        Dự đoán vị trí các track tại thời điểm của frame đang render
+        Chỉ gồm track được ghép ở lần detect gần nhất (hoặc được giữ bởi hold)
+
+        Args:
+            timestamp: Thời điểm capture của frame
+            frame_shape: (h, w, ...) để giới hạn box trong frame
+
+        Returns:
+            Mảng track (TRACK_DTYPE)
+        """
+        timestamp = time.time() if timestamp is None else timestamp
+        with self.lock:
+            alive = [t for t in self._visible() if timestamp - t.last_seen <= self.max_age]
+            if not alive:
+                return empty_detections(TRACK_DTYPE)
+
+            boxes = np.array([t.predict_box(timestamp) for t in alive])
+            if frame_shape is not None:
+                h, w = frame_shape[:2]
+                boxes[:, 0::2] = np.clip(boxes[:, 0::2], 0, w - 1)
+                boxes[:, 1::2] = np.clip(boxes[:, 1::2], 0, h - 1)
+
+            tracked = np.empty(len(alive), dtype=TRACK_DTYPE)
+            for i, field in enumerate(("x1", "y1", "x2", "y2")):
+                tracked[field] = boxes[:, i]
+            tracked["conf"] = [t.conf for t in alive]
+            tracked["class_id"] = [t.class_id for t in alive]
+            tracked["track_id"] = [t.track_id for t in alive]
+            return tracked
+
+    def reset(self):
+        """Xóa toàn bộ track"""
+        with self.lock:
+            self.tracks = []
+            self.next_id = 1
+            self.last_update = None
+
+    def snapshot(self):
+        """
+        Returns:
+            Dict thống kê tracker
+        """
+        with self.lock:
+            return {
+                "tracks": len(self.tracks),
+                "visible": len(self._visible()),
+                "next_id": self.next_id,
+                "max_age": self.max_age,
+                "iou_threshold": self.iou_threshold,
+            }
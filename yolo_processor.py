@@ -8,49 +8,140 @@ Chức năng:
 """
 
 import cv2
+import json
 import numpy as np
-from ultralytics import YOLO
+import queue
 import threading
 import time
 from loguru import logger
-import torch
+
+from inference_engine import get_engine
+from jetson_nano.frame_reader import LatestFrameReader
+from jetson_nano.metrics import Histogram, MetricFamily
+from jetson_nano.mjpeg_stream import MJPEGCapture, decode_jpeg, is_mjpeg_url
+from jetson_nano.shm_ring import ShmCapture, is_shm_url, local_shm_url, parse_shm_url, ring_exists
+from utils.detections import TRACK_DTYPE, empty_detections
+from utils.motion_gate import MotionGate
+from utils.overlay import OverlayRenderer
+from utils.pipeline import DropOldestQueue, StageCounter
+from utils.rate_controller import DetectionRateController
+from utils.tracker import BoxTracker
+from utils.tracing import get_tracer, to_chrome_trace
+import config
 
 
 class YOLOStreamProcessor:
     """Class xử lý video stream với YOLO detection"""
 
-    def __init__(self, model_path="./models/yolo_based/customized_yolo11s.pt"):
+    def __init__(self, model_path=None, engine=None):
         """
         Khởi tạo YOLO processor
 
         Args:
-            model_path: Đường dẫn đến model YOLO
+            model_path: Đường dẫn đến model YOLO (mặc định lấy từ config)
+            engine: InferenceEngine dùng chung (mặc định lấy theo model_path)
         """
         self.model_path = model_path
+        self.engine = engine
         self.model = None
         self.stream_url = None
-        self.cap = None
+        self.reader = None  # LatestFrameReader: drain buffer, chỉ giữ frame mới nhất
         self.is_running = False
         self.current_frame = None
         self.lock = threading.Lock()
-        self.detection_thread = None
+        self.detection_thread = None  # Capture thread (giữ tên cũ cho tương thích)
+        self.inference_thread = None
+        self.render_thread = None
+
+        # Hàng đợi giữa các stage: giới hạn, đầy thì bỏ frame cũ nhất
+        # Mỗi item là (frame_id, capture_time, frame, jpeg): frame có thể None (chưa decode),
+        # jpeg là bytes gốc của source MJPEG (None với source khác)
+        self.infer_queue = DropOldestQueue(maxsize=1)
+        self.render_queue = DropOldestQueue(maxsize=2)
+
+        # Throughput counters cho từng stage
+        self.stage_counters = {
+            "capture": StageCounter("capture"),
+            "infer": StageCounter("infer"),
+            "render": StageCounter("render"),
+        }
+        # Phân bố thời gian từng bước (cho /metrics), thời gian đọc nằm ở reader.read_time
+        self.timings = {"inference": Histogram(), "draw": Histogram(), "encode": Histogram()}
+        self.mjpeg_bytes_sent = 0
+        self.tracer = get_tracer()  # Span theo frame (tắt mặc định, chỉ tốn một lần kiểm tra enabled)
 
         # Cấu hình detection
-        self.conf_threshold = 0.5  # Ngưỡng confidence
-        self.frame_skip = 3  # Bỏ qua nhiều frame để giảm lag (tăng từ 2 lên 5)
+        self.conf_threshold = 0.5  # Ngưỡng confidence (lấy theo engine khi load)
+        self.frame_skip = 3  # Giá trị khởi tạo, được điều chỉnh tự động nếu bật adaptive
         self.frame_count = 0
 
-        # Lưu trữ detections cuối cùng để vẽ lại trên mọi frame
-        self.last_detections = []  # [(x1, y1, x2, y2, conf, class_name), ...]
+        # Controller chọn frame_skip theo latency inference thực tế và số stream đang chạy
+        self.adaptive_skip = config.YOLO_ADAPTIVE_SKIP
+        self.rate_controller = DetectionRateController(
+            target_fps=config.YOLO_TARGET_DETECTION_FPS,
+            cpu_budget=config.YOLO_CPU_BUDGET,
+            frame_skip=self.frame_skip,
+        )
+
+        # Motion gate: bỏ qua inference khi cảnh không đổi kể từ lần detect gần nhất
+        self.motion_gating = config.YOLO_MOTION_GATE
+        self.motion_gate = MotionGate(
+            threshold=config.YOLO_MOTION_THRESHOLD,
+            pixel_delta=config.YOLO_MOTION_PIXEL_DELTA,
+            max_staleness=config.YOLO_MOTION_MAX_STALENESS,
+        )
 
-        # WebSocket callback để emit frames
+        # Lưu trữ detections cuối cùng để vẽ lại trên mọi frame
+        self.last_detections = empty_detections()  # Mảng DETECTION_DTYPE (x1, y1, x2, y2, conf, class_id)
+        self.class_names = {}  # class_id -> tên class (lấy theo engine)
+
+        # Tracker: dự đoán vị trí box trên mọi frame giữa hai lần detect, gán track ID ổn định
+        self.tracking = config.YOLO_TRACKING
+        self.tracker = BoxTracker(
+            iou_threshold=config.YOLO_TRACK_IOU_THRESHOLD,
+            max_age=config.YOLO_TRACK_MAX_AGE,
+        )
+        self.tracked_objects = empty_detections(TRACK_DTYPE)  # Box dự đoán (kèm track_id) của frame render gần nhất
+
+        # WebSocket: một callback broadcast (emit vào room của stream) + tập subscriber theo sid
         self.frame_callback = None
+        self.subscribers = set()
+        self.subscribers_lock = threading.Lock()
+
+        # Kênh metadata: client tự vẽ overlay lên stream gốc, server chỉ gửi detections (không vẽ / encode)
+        self.detection_callback = None
+        self.metadata_subscribers = set()
+
+        # Passthrough: source MJPEG được tách part trực tiếp, JPEG gốc forward nguyên vẹn cho viewer
+        # (client passthrough nhận JPEG gốc + metadata), chỉ decode frame được chọn để inference / vẽ overlay
+        self.passthrough = config.YOLO_MJPEG_PASSTHROUGH
+        self.ingest_jpeg = False  # Source hiện tại đang được đọc dạng JPEG (không qua cv2.VideoCapture)
+        self.ingest = "decoded"  # "decoded", "mjpeg_passthrough" hoặc "shared_memory"
+        self.local_shm = config.YOLO_LOCAL_SHM
+        self.raw_frame_callback = None
+        self.raw_subscribers = set()
+
+        # JPEG dùng chung: encode một lần mỗi frame, mọi viewer đọc cùng buffer
+        self.jpeg_quality = 85
+        self.jpeg_bytes = None
+        self.jpeg_version = 0
+        self.jpeg_cond = threading.Condition()
+        self.mjpeg_viewers = 0  # Số viewer HTTP MJPEG đang kết nối
+
+        # JPEG gốc (không overlay) cho viewer passthrough, dùng chung jpeg_cond
+        self.raw_jpeg_bytes = None
+        self.raw_jpeg_version = 0
+        self.raw_mjpeg_viewers = 0
+
+        # Lần cuối còn viewer (registry tự dừng processor không còn ai xem quá YOLO_IDLE_TIMEOUT)
+        self.last_viewer_seen = time.time()
+
+        # Overlay vẽ trực tiếp lên buffer tái sử dụng (không copy / cấp phát frame mới mỗi lần vẽ)
+        self.overlay = OverlayRenderer(self._get_color_for_class)
 
         # FPS tracking
-        self.fps_start_time = None
-        self.fps_frame_count = 0
         self.fps_log_interval = 60  # Log FPS mỗi 60 frames
-        self.current_fps = 0.0  # FPS hiện tại để vẽ lên frame
+        self.current_fps = 0.0  # FPS hiện tại để vẽ lên frame (FPS của render stage)
 
         # GPU info
         self.gpu_info = "CPU"  # Mặc định CPU
@@ -59,24 +150,15 @@ class YOLOStreamProcessor:
         self.load_model()
 
     def load_model(self):
-        """Load YOLO model"""
+        """Gắn processor vào inference engine dùng chung (model chỉ load một lần)"""
         try:
-            logger.info(f"Loading YOLO model from {self.model_path}")
-            self.model = YOLO(self.model_path)
-
-            # Kiểm tra GPU
-            cuda_available = torch.cuda.is_available()
-            if cuda_available:
-                gpu_name = torch.cuda.get_device_name(0)
-                gpu_memory = torch.cuda.get_device_properties(0).total_memory / 1024**3  # GB
-                self.gpu_info = f"{gpu_name} ({gpu_memory:.1f}GB)"
-                logger.success(f"✓ YOLO model loaded successfully!")
-                logger.success(f"✓ GPU: {self.gpu_info}")
-                logger.success(f"✓ CUDA Version: {torch.version.cuda}")
-            else:
-                self.gpu_info = "CPU (No GPU)"
-                logger.warning("⚠ GPU not available - running on CPU")
-                logger.warning("⚠ Performance will be significantly slower")
+            if self.engine is None:
+                self.engine = get_engine(self.model_path)
+            self.model_path = self.engine.model_path
+            self.model = self.engine.model
+            self.gpu_info = self.engine.gpu_info
+            self.conf_threshold = self.engine.conf_threshold
+            self.class_names = self.engine.names
 
         except Exception as e:
             logger.error(f"Failed to load YOLO model: {e}")
@@ -94,7 +176,8 @@ class YOLOStreamProcessor:
 
     def set_frame_callback(self, callback):
         """
-        Set callback function để emit frames qua WebSocket
+        Set callback broadcast frame tới tất cả subscriber (ví dụ emit vào Socket.IO room của stream)
+        Callback chỉ được gọi khi có ít nhất một subscriber
 
         Args:
             callback: Function nhận frame_bytes làm parameter
@@ -102,6 +185,104 @@ class YOLOStreamProcessor:
         self.frame_callback = callback
         logger.info("Frame callback set for WebSocket streaming")
 
+    def set_detection_callback(self, callback):
+        """
+        Set callback gửi metadata detection (JSON) tới các subscriber chế độ metadata
+        Callback được gọi sau mỗi lần inference, chỉ khi có subscriber metadata
+
+        Args:
+            callback: Function nhận payload JSON (str) làm parameter
+        """
+        self.detection_callback = callback
+        logger.info("Detection callback set for metadata streaming")
+
+    def set_raw_frame_callback(self, callback):
+        """
+        Set callback gửi JPEG gốc (không overlay) tới các subscriber chế độ passthrough
+
+        Args:
+            callback: Function nhận jpeg_bytes làm parameter
+        """
+        self.raw_frame_callback = callback
+        logger.info("Raw frame callback set for passthrough streaming")
+
+    def add_subscriber(self, subscriber_id, mode="pixels"):
+        """
+        Thêm subscriber (Socket.IO sid) xem stream này
+
+        Args:
+            subscriber_id: ID của subscriber
+            mode: "pixels" (nhận JPEG đã vẽ overlay), "metadata" (chỉ nhận detections)
+                hoặc "passthrough" (JPEG gốc + detections)
+
+        Returns:
+            Số subscriber hiện tại
+        """
+        with self.subscribers_lock:
+            if mode == "metadata":
+                self.metadata_subscribers.add(subscriber_id)
+            elif mode == "passthrough":
+                self.raw_subscribers.add(subscriber_id)
+            else:
+                self.subscribers.add(subscriber_id)
+            count = self.subscriber_count()
+        logger.info(f"Subscriber {subscriber_id} joined {self.stream_url} as {mode} ({count} watching)")
+        return count
+
+    def remove_subscriber(self, subscriber_id):
+        """
+        Xóa subscriber khỏi stream (không ảnh hưởng subscriber khác)
+
+        Args:
+            subscriber_id: ID của subscriber
+
+        Returns:
+            Số subscriber còn lại
+        """
+        with self.subscribers_lock:
+            self.subscribers.discard(subscriber_id)
+            self.metadata_subscribers.discard(subscriber_id)
+            self.raw_subscribers.discard(subscriber_id)
+            count = self.subscriber_count()
+        self.last_viewer_seen = time.time()
+        logger.info(f"Subscriber {subscriber_id} left {self.stream_url} ({count} watching)")
+        return count
+
+    def subscriber_count(self):
+        """Số subscriber WebSocket đang xem stream (mọi chế độ)"""
+        return len(self.subscribers) + len(self.metadata_subscribers) + len(self.raw_subscribers)
+
+    def viewer_count(self):
+        """Tổng số viewer (WebSocket mọi chế độ + HTTP MJPEG)"""
+        return self.subscriber_count() + self.mjpeg_viewers + self.raw_mjpeg_viewers
+
+    def touch(self):
+        """Đánh dấu processor vừa được dùng (tránh bị dừng trước khi viewer kịp đăng ký)"""
+        self.last_viewer_seen = time.time()
+
+    def idle_seconds(self, now=None):
+        """
+        Returns:
+            Số giây không có viewer nào (0 nếu đang có viewer)
+        """
+        now = time.time() if now is None else now
+        if self.viewer_count() > 0:
+            self.last_viewer_seen = now
+            return 0.0
+        return now - self.last_viewer_seen
+
+    def has_pixel_viewers(self):
+        """Có viewer cần frame đã vẽ overlay (WebSocket pixels hoặc MJPEG) hay không"""
+        return (self.frame_callback is not None and len(self.subscribers) > 0) or self.mjpeg_viewers > 0
+
+    def has_raw_viewers(self):
+        """Có viewer cần JPEG gốc không overlay (WebSocket passthrough hoặc MJPEG overlay=0) hay không"""
+        return (self.raw_frame_callback is not None and len(self.raw_subscribers) > 0) or self.raw_mjpeg_viewers > 0
+
+    def has_metadata_viewers(self):
+        """Có client cần metadata detection (metadata hoặc passthrough) hay không"""
+        return self.detection_callback is not None and (len(self.metadata_subscribers) + len(self.raw_subscribers)) > 0
+
     def start_processing(self):
         """Bắt đầu xử lý video stream"""
         if self.is_running:
@@ -113,164 +294,454 @@ class YOLOStreamProcessor:
             return
 
         self.is_running = True
-        self.detection_thread = threading.Thread(target=self._process_loop, daemon=True)
+        self.engine.register_stream(self.stream_url)
+        self.infer_queue.clear()
+        self.render_queue.clear()
+        for counter in self.stage_counters.values():
+            counter.reset()
+        self.motion_gate.reset()
+        self.tracker.reset()
+
+        # Mỗi stage một thread, nối với nhau bằng DropOldestQueue
+        self.detection_thread = threading.Thread(target=self._capture_loop, name="capture", daemon=True)
+        self.inference_thread = threading.Thread(target=self._inference_loop, name="infer", daemon=True)
+        self.render_thread = threading.Thread(target=self._render_loop, name="render", daemon=True)
         self.detection_thread.start()
+        self.inference_thread.start()
+        self.render_thread.start()
         logger.info("Started video processing")
 
     def stop_processing(self):
         """Dừng xử lý video stream"""
+        # Capture thread tự release cap khi thoát loop
         self.is_running = False
-        if self.cap:
-            self.cap.release()
-            self.cap = None
+        self.engine.unregister_stream(self.stream_url)
+
+        # Đánh thức các viewer đang đợi frame để generator kết thúc
+        with self.jpeg_cond:
+            self.jpeg_cond.notify_all()
         logger.info("Stopped video processing")
 
-    def _process_loop(self):
-        """Loop chính để xử lý video"""
-        try:
-            # Mở video stream
-            self.cap = cv2.VideoCapture(self.stream_url)
+    def _shm_source(self):
+        """
+        Tên ring shared memory của stream (shm://camera/<id>, hoặc http://localhost:<port>/video_feed/<id>
+        khi camera server cùng máy đang publish ring)
 
-            if not self.cap.isOpened():
+        Returns:
+            Tên ring hoặc None nếu đọc qua URL gốc
+        """
+        if is_shm_url(self.stream_url):
+            return parse_shm_url(self.stream_url)
+        shm_url = local_shm_url(self.stream_url) if self.local_shm else None
+        if shm_url is not None and ring_exists(parse_shm_url(shm_url)):
+            return parse_shm_url(shm_url)
+        return None
+
+    def _trace(self, name, start, frame_id=None):
+        """Ghi span từ start (perf_counter) tới hiện tại (caller kiểm tra self.tracer.enabled trước)"""
+        self.tracer.record(name, self.stream_url, start, time.perf_counter(), frame_id)
+
+    def _trace_read(self, seq, start, end):
+        if self.tracer.enabled:
+            self.tracer.record("read", self.stream_url, start, end, seq)
+
+    def _capture_loop(self):
+        """Stage 1 - Capture: lấy frame mới nhất từ reader và đẩy sang infer / render"""
+        counter = self.stage_counters["capture"]
+        try:
+            # Mở video stream, reader tự đọc liên tục trên thread riêng để tránh trễ buffer
+            # Source MJPEG qua HTTP: tự tách part, giữ bytes JPEG gốc thay vì decode mọi frame
+            # Camera server cùng máy: đọc frame thô qua shared memory, không encode / decode JPEG
+            shm_name = self._shm_source()
+            self.ingest_jpeg = shm_name is None and self.passthrough and is_mjpeg_url(self.stream_url)
+            if shm_name is not None:
+                source = lambda: ShmCapture(shm_name)  # noqa: E731
+                self.ingest = "shared_memory"
+            elif self.ingest_jpeg:
+                source = lambda: MJPEGCapture(self.stream_url)  # noqa: E731
+                self.ingest = "mjpeg_passthrough"
+            else:
+                source = self.stream_url
+                self.ingest = "decoded"
+            self.reader = LatestFrameReader(source, name=self.stream_url)
+            self.reader.on_read = self._trace_read
+
+            opened = self.reader.open()
+            if not opened and self.ingest_jpeg:
+                # URL HTTP nhưng không phải multipart MJPEG (HLS, MP4, ...): để OpenCV / FFmpeg đọc
+                logger.warning(f"Not a multipart MJPEG stream, falling back to cv2.VideoCapture: {self.stream_url}")
+                self.ingest_jpeg = False
+                self.ingest = "decoded"
+                self.reader = LatestFrameReader(self.stream_url, name=self.stream_url)
+                self.reader.on_read = self._trace_read
+                opened = self.reader.open()
+
+            if not opened:
                 logger.error(f"Cannot open stream: {self.stream_url}")
                 self.is_running = False
                 return
 
-            logger.info("Video stream opened successfully")
-
-            # Khởi tạo FPS tracking
-            self.fps_start_time = time.time()
-            self.fps_frame_count = 0
+            self.reader.start()
+            logger.info(f"Video stream opened successfully ({self.ingest})")
 
+            last_seq = 0
             while self.is_running:
-                ret, frame = self.cap.read()
-
-                if not ret:
-                    logger.warning("Failed to read frame, retrying...")
-                    time.sleep(0.1)
+                latest = self.reader.read_latest(last_seq, timeout=0.5)
+                if latest is None:
+                    if self.reader.stopped:
+                        logger.warning("Frame reader stopped")
+                        break
                     continue
 
-                # Tăng frame counter
+                start_time = time.perf_counter()
+                last_seq, capture_time, payload = latest
+                frame, jpeg = (None, payload) if self.ingest_jpeg else (payload, None)
                 self.frame_count += 1
-                self.fps_frame_count += 1
-
-                # Tính FPS hiện tại
-                if self.fps_frame_count > 1:  # Tránh chia cho 0
-                    elapsed = time.time() - self.fps_start_time
-                    if elapsed > 0:
-                        self.current_fps = self.fps_frame_count / elapsed
-
-                # Log FPS định kỳ
-                if self.fps_frame_count % self.fps_log_interval == 0:
-                    elapsed = time.time() - self.fps_start_time
-                    fps = self.fps_frame_count / elapsed
-                    logger.info(
-                        f"📊 FPS: {fps:.2f} | Frames: {self.fps_frame_count} | Detection every {self.frame_skip} frames"
+
+                # Điều chỉnh tần suất detect theo FPS source, chi phí inference và số stream
+                if self.adaptive_skip:
+                    self.frame_skip = self.rate_controller.update(
+                        self.reader.fps, self.engine.frame_time, self.engine.active_stream_count()
                     )
-                    # Reset counter
-                    self.fps_start_time = time.time()
-                    self.fps_frame_count = 0
 
-                # Chỉ chạy detection trên một số frame
+                # Chỉ gửi một số frame sang inference, stage infer luôn lấy frame mới nhất
+                # Với source JPEG, chỉ decode đúng những frame này
                 if self.frame_count % self.frame_skip == 0:
-                    # Chạy detection và cập nhật last_detections
-                    self._detect_and_update(frame)
+                    if frame is None:
+                        frame = decode_jpeg(jpeg)
+                    if frame is not None:
+                        self.infer_queue.put((last_seq, capture_time, frame, jpeg))
 
-                # Luôn vẽ bounding boxes (dùng detection cũ nếu không chạy detection mới)
-                processed_frame = self._draw_boxes(frame, self.last_detections)
+                # Mọi frame đều được render (dùng detection gần nhất)
+                self.render_queue.put((last_seq, capture_time, frame, jpeg))
+
+                counter.tick(time.perf_counter() - start_time)
+                if self.tracer.enabled:
+                    self._trace("capture", start_time, last_seq)
+
+        except Exception as e:
+            logger.error(f"Error in capture loop: {e}")
+        finally:
+            self.is_running = False
+            self.engine.unregister_stream(self.stream_url)
+            if self.reader:
+                self.reader.stop()
+
+    def _inference_loop(self):
+        """Stage 2 - Infer: chạy detection trên frame mới nhất, nhanh nhất CPU cho phép"""
+        counter = self.stage_counters["infer"]
+        while self.is_running:
+            try:
+                frame_id, capture_time, frame, _ = self.infer_queue.get(timeout=0.5)
+            except queue.Empty:
+                continue
+
+            # Cảnh gần như không đổi: giữ detections cũ, không tốn inference
+            start_time = time.perf_counter()
+            if self.motion_gating and not self.motion_gate.should_detect(frame):
+                if self.tracking:
+                    self.tracker.hold(capture_time)
+                if self.tracer.enabled:
+                    self._trace("motion_skip", start_time, frame_id)
+                continue
+
+            start_time = time.perf_counter()
+            self._detect_and_update(frame, capture_time)
+            counter.tick(time.perf_counter() - start_time)
+            if self.tracer.enabled:
+                self._trace("inference", start_time, frame_id)
+
+            # Gửi metadata detection cho client tự vẽ overlay
+            if self.has_metadata_viewers():
+                emit_start = time.perf_counter()
+                try:
+                    self.detection_callback(self._detection_payload(frame_id, capture_time, frame.shape))
+                except Exception as e:
+                    logger.error(f"Error sending detections: {e}")
+                if self.tracer.enabled:
+                    self._trace("emit_detections", emit_start, frame_id)
+
+    def _render_loop(self):
+        """Stage 3 - Render/Encode: vẽ overlay, lưu frame hiện tại và emit qua callback"""
+        counter = self.stage_counters["render"]
+        while self.is_running:
+            try:
+                frame_id, capture_time, frame, jpeg = self.render_queue.get(timeout=0.5)
+            except queue.Empty:
+                continue
+
+            # Viewer passthrough: forward JPEG gốc, không decode / encode
+            if self.has_raw_viewers():
+                raw_start = time.perf_counter()
+                try:
+                    self._publish_raw(frame, jpeg)
+                except Exception as e:
+                    logger.error(f"Error publishing raw frame: {e}")
+                if self.tracer.enabled:
+                    self._trace("publish_raw", raw_start, frame_id)
+
+            # Không ai xem frame đã vẽ (chỉ có client metadata / passthrough hoặc không có viewer): bỏ qua vẽ / encode
+            if not self.has_pixel_viewers():
+                continue
+
+            start_time = time.perf_counter()
+            try:
+                if frame is None:
+                    frame = decode_jpeg(jpeg)
+                    if frame is None:
+                        continue
+                    if self.tracer.enabled:
+                        self._trace("decode", start_time, frame_id)
+                # Luôn vẽ bounding boxes: vị trí dự đoán bởi tracker, hoặc detection cũ nếu tắt tracking
+                if self.tracking:
+                    self.tracked_objects = self.tracker.predict(capture_time, frame.shape)
+                    detections = self.tracked_objects
+                else:
+                    detections = self.last_detections
+                draw_start = time.perf_counter()
+                processed_frame = self._draw_boxes(self.overlay.prepare(frame), detections)
 
                 # Vẽ performance stats lên frame
                 processed_frame = self._draw_performance_stats(processed_frame)
+                self.timings["draw"].observe(time.perf_counter() - draw_start)
+                if self.tracer.enabled:
+                    self._trace("draw", draw_start, frame_id)
 
                 # Lưu frame đã xử lý
                 with self.lock:
                     self.current_frame = processed_frame
 
-                # Emit frame qua WebSocket callback nếu có
-                if self.frame_callback:
-                    try:
-                        # Encode frame thành JPEG
-                        ret, buffer = cv2.imencode(".jpg", processed_frame, [cv2.IMWRITE_JPEG_QUALITY, 85])
-                        if ret:
-                            frame_bytes = buffer.tobytes()
-                            self.frame_callback(frame_bytes)
-                    except Exception as e:
-                        logger.error(f"Error in frame callback: {e}")
+                # Encode đúng một lần cho mọi viewer (MJPEG + WebSocket)
+                encode_start = time.perf_counter()
+                frame_bytes = self._publish_jpeg(processed_frame)
+                if self.tracer.enabled:
+                    self._trace("encode", encode_start, frame_id)
+
+                # Broadcast một lần cho tất cả subscriber WebSocket
+                has_subscribers = self.frame_callback is not None and len(self.subscribers) > 0
+                if frame_bytes is not None and has_subscribers:
+                    emit_start = time.perf_counter()
+                    self.frame_callback(frame_bytes)
+                    if self.tracer.enabled:
+                        self._trace("emit", emit_start, frame_id)
+            except Exception as e:
+                logger.error(f"Error in render loop: {e}")
+
+            counter.tick(time.perf_counter() - start_time)
+            self.current_fps = counter.fps
+
+            # Log FPS định kỳ
+            if counter.count % self.fps_log_interval == 0:
+                logger.info(
+                    f"📊 FPS: {counter.fps:.2f} | Capture: {self.stage_counters['capture'].fps:.2f} "
+                    f"| Infer: {self.stage_counters['infer'].fps:.2f} "
+                    f"| Dropped (infer/render): {self.infer_queue.dropped}/{self.render_queue.dropped} "
+                    f"| Detection every {self.frame_skip} frames "
+                    f"| Motion skip: {self.motion_gate.skip_ratio:.0%}"
+                )
+
+    def _detection_payload(self, frame_id, capture_time, frame_shape):
+        """
+        Tạo metadata detection gọn cho client vẽ overlay
 
-        except Exception as e:
-            logger.error(f"Error in process loop: {e}")
-        finally:
-            if self.cap:
-                self.cap.release()
+        Args:
+            frame_id: Số thứ tự frame đã detect
+            capture_time: Thời điểm capture của frame
+            frame_shape: Kích thước frame (h, w, ...) để client scale box
 
-    def _detect_and_update(self, frame):
+        Returns:
+            Chuỗi JSON {stream_url, frame_id, ts, width, height, boxes: [[x1, y1, x2, y2, conf, class_id, track_id]]}
         """
-        Chạy detection và cập nhật last_detections
+        if self.tracking:
+            detections = self.tracker.predict(capture_time, frame_shape)
+        else:
+            detections = self.last_detections
+
+        boxes = []
+        for detection in detections.tolist():
+            x1, y1, x2, y2, conf, class_id = detection[:6]
+            track_id = detection[6] if len(detection) > 6 else None
+            boxes.append([x1, y1, x2, y2, round(conf, 3), class_id, track_id])
+
+        return json.dumps(
+            {
+                "stream_url": self.stream_url,
+                "frame_id": frame_id,
+                "ts": round(capture_time, 3),
+                "width": frame_shape[1],
+                "height": frame_shape[0],
+                "boxes": boxes,
+            },
+            separators=(",", ":"),
+        )
+
+    def _publish_jpeg(self, frame):
+        """
+        Encode frame thành JPEG một lần và publish vào buffer dùng chung (có version)
 
         Args:
-            frame: Frame từ video
+            frame: Frame đã vẽ overlay
+
+        Returns:
+            Bytes JPEG hoặc None nếu encode lỗi
         """
-        try:
-            # Chạy YOLO detection
-            results = self.model.predict(frame, conf=self.conf_threshold, verbose=False)
-
-            # Cập nhật detections
-            detections = []
-            for result in results:
-                boxes = result.boxes
-                for box in boxes:
-                    # Lấy thông tin box
-                    x1, y1, x2, y2 = map(int, box.xyxy[0])
-                    conf = float(box.conf[0])
-                    cls_id = int(box.cls[0])
-                    class_name = self.model.names[cls_id]
-
-                    # Bỏ qua class "natural"
-                    if class_name == "natural":
-                        continue
+        encode_start = time.perf_counter()
+        ret, buffer = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality])
+        self.timings["encode"].observe(time.perf_counter() - encode_start)
+        if not ret:
+            return None
 
-                    detections.append((x1, y1, x2, y2, conf, class_name))
+        frame_bytes = buffer.tobytes()
+        with self.jpeg_cond:
+            self.jpeg_bytes = frame_bytes
+            self.jpeg_version += 1
+            self.jpeg_cond.notify_all()
+        return frame_bytes
 
-            # Cập nhật last_detections
-            self.last_detections = detections
+    def _publish_raw(self, frame, jpeg):
+        """
+        Publish JPEG gốc (không overlay) cho viewer passthrough
 
-        except Exception as e:
-            logger.error(f"Error in detection: {e}")
+        Args:
+            frame: Frame đã decode (dùng khi source không phải MJPEG)
+            jpeg: Bytes JPEG gốc của source MJPEG (None nếu không có)
+        """
+        if jpeg is None:
+            # Source không phải MJPEG: vẫn phải encode một lần
+            encode_start = time.perf_counter()
+            ret, buffer = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality])
+            self.timings["encode"].observe(time.perf_counter() - encode_start)
+            if not ret:
+                return
+            jpeg = buffer.tobytes()
 
-    def _draw_boxes(self, frame, detections):
+        with self.jpeg_cond:
+            self.raw_jpeg_bytes = jpeg
+            self.raw_jpeg_version += 1
+            self.jpeg_cond.notify_all()
+
+        if self.raw_frame_callback is not None and self.raw_subscribers:
+            self.raw_frame_callback(jpeg)
+
+    def get_jpeg(self, last_version=0, timeout=None, raw=False):
         """
-        Vẽ bounding boxes lên frame
+        Đợi tới khi có JPEG mới hơn last_version
 
         Args:
-            frame: Frame từ video
-            detections: List of (x1, y1, x2, y2, conf, class_name)
+            last_version: Version JPEG viewer đã gửi
+            timeout: Thời gian chờ tối đa (giây)
+            raw: True để lấy JPEG gốc không overlay (passthrough)
 
         Returns:
-            Frame đã được vẽ bounding boxes
+            (version, jpeg_bytes) hoặc None nếu hết timeout / processor đã dừng
+        """
+        def current():
+            if raw:
+                return self.raw_jpeg_version, self.raw_jpeg_bytes
+            return self.jpeg_version, self.jpeg_bytes
+
+        with self.jpeg_cond:
+            ready = self.jpeg_cond.wait_for(lambda: current()[0] > last_version or not self.is_running, timeout)
+            version, jpeg_bytes = current()
+            if not ready or version <= last_version:
+                return None
+            return version, jpeg_bytes
+
+    def get_stats(self):
+        """
+        Lấy thống kê pipeline của processor
+
+        Returns:
+            Dict thống kê từng stage và số frame bị bỏ ở mỗi hàng đợi
+        """
+        return {
+            "stream_url": self.stream_url,
+            "is_running": self.is_running,
+            "frame_skip": self.frame_skip,
+            "detection": dict(self.rate_controller.snapshot(), adaptive=self.adaptive_skip),
+            "motion_gate": dict(self.motion_gate.snapshot(), enabled=self.motion_gating),
+            "tracker": dict(self.tracker.snapshot(), enabled=self.tracking),
+            "objects": len(self.tracked_objects if self.tracking else self.last_detections),
+            "mjpeg_viewers": self.mjpeg_viewers,
+            "subscribers": len(self.subscribers),
+            "metadata_subscribers": len(self.metadata_subscribers),
+            "raw_subscribers": len(self.raw_subscribers),
+            "raw_mjpeg_viewers": self.raw_mjpeg_viewers,
+            "ingest": self.ingest,
+            "jpeg_version": self.jpeg_version,
+            "reader": self.reader.get_stats() if self.reader else None,
+            "stages": {name: counter.snapshot() for name, counter in self.stage_counters.items()},
+            "queues": {
+                "infer": {"depth": self.infer_queue.qsize(), "dropped": self.infer_queue.dropped},
+                "render": {"depth": self.render_queue.qsize(), "dropped": self.render_queue.dropped},
+            },
+        }
+
+    def metrics_snapshot(self):
         """
-        annotated_frame = frame.copy()
+        Giá trị hiện tại cho /metrics (dict picklable, worker process gửi được qua pipe)
 
-        for x1, y1, x2, y2, conf, class_name in detections:
-            # Chọn màu theo class
-            color = self._get_color_for_class(class_name)
+        Returns:
+            Dict timings (histogram), stages, queues, viewers, ...
+        """
+        reader = self.reader
+        timings = {name: histogram.snapshot() for name, histogram in self.timings.items()}
+        if reader is not None:
+            timings["read"] = reader.read_time.snapshot()
+        queues = {
+            "infer": (self.infer_queue.qsize(), self.infer_queue.dropped),
+            "render": (self.render_queue.qsize(), self.render_queue.dropped),
+        }
+        return {
+            "is_running": self.is_running,
+            "timings": timings,
+            "stages": {name: (counter.count, counter.fps) for name, counter in self.stage_counters.items()},
+            "source_fps": reader.fps if reader is not None else 0.0,
+            "reader_dropped": reader.frames_dropped if reader is not None else 0,
+            "queues": queues,
+            "motion_skipped": self.motion_gate.skipped,
+            "objects": len(self.tracked_objects if self.tracking else self.last_detections),
+            "viewers": {
+                "pixels": len(self.subscribers),
+                "metadata": len(self.metadata_subscribers),
+                "passthrough": len(self.raw_subscribers),
+                "mjpeg": self.mjpeg_viewers,
+                "raw_mjpeg": self.raw_mjpeg_viewers,
+            },
+            "mjpeg_bytes_sent": self.mjpeg_bytes_sent,
+        }
 
-            # Vẽ bounding box (giảm độ dày từ 2 xuống 1)
-            cv2.rectangle(annotated_frame, (x1, y1), (x2, y2), color, 1)
+    def _detect_and_update(self, frame, capture_time=None):
+        """
+        Chạy detection và cập nhật last_detections (và tracker nếu bật)
 
-            # Vẽ label
-            label = f"{class_name}: {conf:.2f}"
-            label_size, _ = cv2.getTextSize(label, cv2.FONT_HERSHEY_SIMPLEX, 0.5, 1)
+        Args:
+            frame: Frame từ video
+            capture_time: Thời điểm capture của frame (dùng cho tracker)
+        """
+        try:
+            # Gửi frame vào engine dùng chung, đợi batch chứa frame chạy xong
+            start_time = time.perf_counter()
+            self.last_detections = self.engine.infer(frame)
+            self.timings["inference"].observe(time.perf_counter() - start_time)
+            if self.tracking:
+                self.tracker.update(self.last_detections, capture_time)
 
-            # Vẽ background cho text
-            cv2.rectangle(annotated_frame, (x1, y1 - label_size[1] - 8), (x1 + label_size[0], y1), color, -1)
+        except Exception as e:
+            logger.error(f"Error in detection: {e}")
 
-            # Chọn màu chữ: đen cho look_away (nền vàng), trắng cho các class khác
-            text_color = (0, 0, 0) if class_name == "look_away" else (255, 255, 255)
+    def _draw_boxes(self, frame, detections):
+        """
+        Vẽ bounding boxes trực tiếp lên frame (frame phải là buffer riêng, ví dụ từ overlay.prepare)
 
-            # Vẽ text (giảm font size và thickness)
-            cv2.putText(annotated_frame, label, (x1, y1 - 5), cv2.FONT_HERSHEY_SIMPLEX, 0.5, text_color, 1)
+        Args:
+            frame: Buffer frame để vẽ
+            detections: Mảng DETECTION_DTYPE hoặc TRACK_DTYPE (có thêm track_id)
 
-        return annotated_frame
+        Returns:
+            Frame đã được vẽ bounding boxes
+        """
+        return self.overlay.draw_boxes(frame, detections, self.class_names)
 
     def _draw_performance_stats(self, frame):
         """
@@ -282,35 +753,21 @@ class YOLOStreamProcessor:
         Returns:
             Frame với performance overlay
         """
-        h, w = frame.shape[:2]
-
         # Thông tin hiển thị
         fps_text = f"FPS: {self.current_fps:.1f}"
         gpu_text = f"Device: {self.gpu_info}"
-        objects_text = f"Objects: {len(self.last_detections)}"
-
-        # Cấu hình hiển thị
-        font = cv2.FONT_HERSHEY_SIMPLEX
-        font_scale = 0.6
-        thickness = 2
-        padding = 10
-        line_height = 30
-
-        # Vẽ nền semi-transparent cho stats panel
-        overlay = frame.copy()
-        panel_height = line_height * 3 + padding * 2
-        cv2.rectangle(overlay, (10, 10), (400, 10 + panel_height), (0, 0, 0), -1)
-        cv2.addWeighted(overlay, 0.6, frame, 0.4, 0, frame)
-
-        # Vẽ text
-        y_offset = 10 + padding + 20
-        cv2.putText(frame, fps_text, (20, y_offset), font, font_scale, (0, 255, 0), thickness)
-        y_offset += line_height
-        cv2.putText(frame, gpu_text, (20, y_offset), font, font_scale, (0, 255, 255), thickness)
-        y_offset += line_height
-        cv2.putText(frame, objects_text, (20, y_offset), font, font_scale, (255, 255, 255), thickness)
-
-        return frame
+        objects = self.tracked_objects if self.tracking else self.last_detections
+        objects_text = f"Objects: {len(objects)}"
+        detect_text = f"Detect: {self.stage_counters['infer'].fps:.1f}/s (1/{self.frame_skip} frames)"
+
+        # Panel chỉ làm tối vùng ROI của nó, vẽ thẳng lên frame
+        lines = [
+            (fps_text, (0, 255, 0)),
+            (gpu_text, (0, 255, 255)),
+            (objects_text, (255, 255, 255)),
+            (detect_text, (255, 200, 0)),
+        ]
+        return self.overlay.draw_panel(frame, lines)
 
     def _detect_and_draw(self, frame):
         """
@@ -324,42 +781,9 @@ class YOLOStreamProcessor:
             Frame đã được vẽ bounding boxes
         """
         try:
-            # Chạy YOLO detection
-            results = self.model.predict(frame, conf=self.conf_threshold, verbose=False)
-
-            # Vẽ bounding boxes
-            annotated_frame = frame.copy()
-
-            for result in results:
-                boxes = result.boxes
-                for box in boxes:
-                    # Lấy thông tin box
-                    x1, y1, x2, y2 = map(int, box.xyxy[0])
-                    conf = float(box.conf[0])
-                    cls_id = int(box.cls[0])
-                    class_name = self.model.names[cls_id]
-
-                    # Bỏ qua class "natural" - không vẽ bounding box
-                    if class_name == "natural":
-                        continue
-
-                    # Chọn màu theo class
-                    color = self._get_color_for_class(class_name)
-
-                    # Vẽ bounding box
-                    cv2.rectangle(annotated_frame, (x1, y1), (x2, y2), color, 2)
-
-                    # Vẽ label
-                    label = f"{class_name}: {conf:.2f}"
-                    label_size, _ = cv2.getTextSize(label, cv2.FONT_HERSHEY_SIMPLEX, 0.6, 2)
-
-                    # Vẽ background cho text
-                    cv2.rectangle(annotated_frame, (x1, y1 - label_size[1] - 10), (x1 + label_size[0], y1), color, -1)
-
-                    # Vẽ text
-                    cv2.putText(annotated_frame, label, (x1, y1 - 5), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
-
-            return annotated_frame
+            # Qua engine dùng chung (self.model là None với backend ONNX / OpenVINO), class bị lọc theo engine
+            detections = self.engine.infer(frame)
+            return self._draw_boxes(frame.copy(), detections)
 
         except Exception as e:
             logger.error(f"Error in detection: {e}")
@@ -394,36 +818,232 @@ class YOLOStreamProcessor:
         """
         with self.lock:
             if self.current_frame is not None:
+                # current_frame là buffer của overlay pool, sẽ được tái sử dụng nên trả bản copy
                 return self.current_frame.copy()
             return None
 
-    def generate_frames(self):
+    def generate_frames(self, raw=False):
         """
         Generator để stream frames qua HTTP (MJPEG)
+        Không encode lại: chỉ gửi JPEG dùng chung khi có version mới
+
+        Args:
+            raw: True để gửi JPEG gốc không overlay (passthrough)
 
         Yields:
             Bytes của frame dưới dạng JPEG
         """
-        while True:
-            frame = self.get_current_frame()
+        with self.jpeg_cond:
+            if raw:
+                self.raw_mjpeg_viewers += 1
+            else:
+                self.mjpeg_viewers += 1
 
-            if frame is None:
-                time.sleep(0.1)
-                continue
+        try:
+            last_version = 0
+            while self.is_running:
+                # Block tới khi render stage publish frame mới (không gửi trùng frame)
+                latest = self.get_jpeg(last_version, timeout=1.0, raw=raw)
+                if latest is None:
+                    continue
+
+                last_version, frame_bytes = latest
+                with self.jpeg_cond:
+                    self.mjpeg_bytes_sent += len(frame_bytes)
+
+                # Yield frame theo format MJPEG (yield riêng từng phần để không copy JPEG cho mỗi viewer)
+                yield b"--frame\r\nContent-Type: image/jpeg\r\nContent-Length: %d\r\n\r\n" % len(frame_bytes)
+                yield frame_bytes
+                yield b"\r\n"
+        finally:
+            with self.jpeg_cond:
+                if raw:
+                    self.raw_mjpeg_viewers -= 1
+                else:
+                    self.mjpeg_viewers -= 1
+            self.last_viewer_seen = time.time()
+
+
+class StreamLimitError(RuntimeError):
+    """Đã đạt số stream tối đa (YOLO_MAX_STREAMS), không nhận thêm stream mới"""
+
+
+def _default_factory(stream_url):
+    """Tạo processor theo YOLO_WORKER_MODE: thread trong process này hoặc proxy tới worker process"""
+    if config.YOLO_WORKER_MODE == "process":
+        from stream_workers import get_worker_pool
+
+        return get_worker_pool().create(stream_url)
+
+    processor = YOLOStreamProcessor()
+    processor.set_stream_url(stream_url)
+    return processor
 
-            # Encode frame thành JPEG
-            ret, buffer = cv2.imencode(".jpg", frame)
-            if not ret:
-                continue
 
-            frame_bytes = buffer.tobytes()
+class ProcessorRegistry:
+    """
+    Quản lý vòng đời processor theo stream_url
+    - Tạo single-flight: nhiều request cùng lúc cho một URL chỉ tạo một processor
+    - Giới hạn số stream đồng thời (admission control)
+    - Thread reaper tự dừng processor không còn viewer quá idle_timeout
+    """
 
-            # Yield frame theo format MJPEG
-            yield (b"--frame\r\n" b"Content-Type: image/jpeg\r\n\r\n" + frame_bytes + b"\r\n")
+    def __init__(self, max_streams=0, idle_timeout=30.0, reap_interval=5.0, factory=None):
+        """
+        Args:
+            max_streams: Số stream tối đa (0 = không giới hạn)
+            idle_timeout: Số giây không có viewer trước khi tự dừng processor (0 = không tự dừng)
+            reap_interval: Chu kỳ kiểm tra processor idle (giây)
+            factory: Hàm stream_url -> processor (mặc định theo config.YOLO_WORKER_MODE)
+        """
+        self.max_streams = max_streams
+        self.factory = factory or _default_factory
+        self.idle_timeout = idle_timeout
+        self.reap_interval = reap_interval
+
+        self._instances = {}
+        self._creating = {}  # stream_url -> threading.Event của lần tạo đang chạy
+        self._lock = threading.Lock()
+        self._reaper = None
+
+        # Thống kê
+        self.created = 0
+        self.reaped = 0
+        self.rejected = 0
+
+    def get(self, stream_url):
+        """
+        Lấy hoặc tạo processor cho stream_url
+
+        Raises:
+            StreamLimitError: Đã đủ max_streams stream
+        """
+        while True:
+            with self._lock:
+                processor = self._instances.get(stream_url)
+                if processor is not None:
+                    processor.touch()
+                    return processor
+
+                pending = self._creating.get(stream_url)
+                if pending is None:
+                    if self.max_streams and len(self._instances) + len(self._creating) >= self.max_streams:
+                        self.rejected += 1
+                        raise StreamLimitError(
+                            f"Đã đạt giới hạn {self.max_streams} stream đồng thời, thử lại sau"
+                        )
+                    pending = self._creating[stream_url] = threading.Event()
+                    break
+
+            # Request khác đang tạo processor cho URL này: đợi rồi lấy lại
+            pending.wait()
+
+        # Tạo processor ngoài lock (có thể mất thời gian), các request cùng URL đợi trên event
+        processor = None
+        try:
+            logger.info(f"Creating new YOLO processor for stream: {stream_url}")
+            processor = self.factory(stream_url)
+        finally:
+            with self._lock:
+                del self._creating[stream_url]
+                if processor is not None:
+                    self._instances[stream_url] = processor
+                    self.created += 1
+            pending.set()
+
+        self._ensure_reaper()
+        return processor
+
+    def find(self, stream_url):
+        """Lấy processor đã tồn tại (không tạo mới)"""
+        with self._lock:
+            return self._instances.get(stream_url)
+
+    def remove(self, stream_url):
+        """Dừng và xóa processor của stream_url"""
+        with self._lock:
+            processor = self._instances.pop(stream_url, None)
+        if processor is not None:
+            logger.info(f"Removing YOLO processor for stream: {stream_url}")
+            processor.stop_processing()
+
+    def items(self):
+        """List (stream_url, processor) đang quản lý"""
+        with self._lock:
+            return list(self._instances.items())
+
+    def active_streams(self):
+        with self._lock:
+            return [url for url, proc in self._instances.items() if proc.is_running]
+
+    def reap_idle(self, now=None):
+        """
+        Dừng các processor không có viewer quá idle_timeout
+
+        Returns:
+            List stream_url đã dừng
+        """
+        if not self.idle_timeout:
+            return []
+        now = time.time() if now is None else now
+        with self._lock:
+            idle = [
+                url for url, proc in self._instances.items() if proc.idle_seconds(now) >= self.idle_timeout
+            ]
+            removed = [self._instances.pop(url) for url in idle]
+
+        for url, processor in zip(idle, removed):
+            logger.info(f"Stopping idle YOLO processor ({self.idle_timeout:.0f}s without viewers): {url}")
+            processor.stop_processing()
+        self.reaped += len(idle)
+        return idle
+
+    def _ensure_reaper(self):
+        with self._lock:
+            if self._reaper is not None or not self.idle_timeout:
+                return
+            self._reaper = threading.Thread(target=self._reap_loop, name="processor-reaper", daemon=True)
+            self._reaper.start()
+
+    def _reap_loop(self):
+        while True:
+            time.sleep(self.reap_interval)
+            try:
+                self.reap_idle()
+            except Exception as e:
+                logger.error(f"Processor reaper error: {e}")
+
+    def get_stats(self):
+        """
+        Returns:
+            Dict thống kê registry
+        """
+        now = time.time()
+        with self._lock:
+            streams = {
+                url: {"viewers": proc.viewer_count(), "idle_s": round(proc.idle_seconds(now), 1)}
+                for url, proc in self._instances.items()
+            }
+        return {
+            "streams": streams,
+            "max_streams": self.max_streams,
+            "idle_timeout": self.idle_timeout,
+            "created": self.created,
+            "reaped": self.reaped,
+            "rejected": self.rejected,
+        }
 
 
 # Multi-instance management - Mỗi stream_url có 1 processor riêng
-_processor_instances = {}
+_registry = ProcessorRegistry(
+    max_streams=config.YOLO_MAX_STREAMS,
+    idle_timeout=config.YOLO_IDLE_TIMEOUT,
+)
+
+
+def get_registry():
+    """Lấy ProcessorRegistry dùng chung"""
+    return _registry
 
 
 def get_processor(stream_url):
@@ -435,16 +1055,24 @@ def get_processor(stream_url):
 
     Returns:
         YOLOStreamProcessor instance cho stream đó
+
+    Raises:
+        StreamLimitError: Đã đạt số stream tối đa
+    """
+    return _registry.get(stream_url)
+
+
+def find_processor(stream_url):
     """
-    global _processor_instances
+    Lấy processor đã tồn tại cho stream_url (không tạo mới)
 
-    if stream_url not in _processor_instances:
-        logger.info(f"Creating new YOLO processor for stream: {stream_url}")
-        processor = YOLOStreamProcessor()
-        processor.set_stream_url(stream_url)
-        _processor_instances[stream_url] = processor
+    Args:
+        stream_url: URL của stream
 
-    return _processor_instances[stream_url]
+    Returns:
+        YOLOStreamProcessor instance hoặc None
+    """
+    return _registry.find(stream_url)
 
 
 def remove_processor(stream_url):
@@ -454,12 +1082,7 @@ def remove_processor(stream_url):
     Args:
         stream_url: URL của stream cần xóa processor
     """
-    global _processor_instances
-
-    if stream_url in _processor_instances:
-        logger.info(f"Removing YOLO processor for stream: {stream_url}")
-        _processor_instances[stream_url].stop_processing()
-        del _processor_instances[stream_url]
+    _registry.remove(stream_url)
 
 
 def get_active_streams():
@@ -469,4 +1092,130 @@ def get_active_streams():
     Returns:
         List of stream URLs đang được detect
     """
-    return [url for url, proc in _processor_instances.items() if proc.is_running]
+    return _registry.active_streams()
+
+
+if config.YOLO_TRACE:
+    get_tracer().enable(config.YOLO_TRACE_CAPACITY)
+
+
+def _worker_pool():
+    """WorkerPool nếu đang chạy chế độ process (None ở chế độ thread)"""
+    if config.YOLO_WORKER_MODE != "process":
+        return None
+    from stream_workers import get_worker_pool
+
+    return get_worker_pool()
+
+
+def set_tracing(action, capacity=None):
+    """
+    Bật / tắt / xóa trace span của mọi stream (kể cả trong worker process)
+
+    Args:
+        action: "enable", "disable" hoặc "clear"
+        capacity: Số span tối đa giữ lại khi enable (None = giữ nguyên)
+
+    Returns:
+        Dict trạng thái tracer của process web
+    """
+    tracer = get_tracer()
+    if action == "enable":
+        tracer.enable(capacity)
+    elif action == "disable":
+        tracer.disable()
+    elif action == "clear":
+        tracer.clear()
+    else:
+        raise ValueError(f"action không hợp lệ: {action}")
+
+    pool = _worker_pool()
+    if pool is not None:
+        pool.broadcast("trace", action, capacity)
+    return tracer.get_stats()
+
+
+def export_trace(stream_url=None):
+    """
+    Xuất span đang có thành Chrome trace / Perfetto JSON
+
+    Args:
+        stream_url: Chỉ lấy span của stream này (None = tất cả)
+
+    Returns:
+        Dict theo Trace Event Format
+    """
+    spans = get_tracer().spans(stream_url)
+    pool = _worker_pool()
+    if pool is not None:
+        for worker_spans in pool.broadcast("trace_spans", stream_url):
+            spans.extend(worker_spans)
+    return to_chrome_trace(spans)
+
+
+def collect_metrics():
+    """
+    Collector cho MetricsRegistry: metrics của từng stream và của registry
+
+    Returns:
+        List MetricFamily
+    """
+    stage_time = MetricFamily("yolo_stage_seconds", "histogram", "Thời gian mỗi bước (read, inference, draw, encode)")
+    stage_fps = MetricFamily("yolo_stage_fps", "gauge", "FPS hiệu dụng của từng stage (capture, infer, render)")
+    stage_frames = MetricFamily("yolo_stage_frames_total", "counter", "Số frame đã qua từng stage (infer = số lần detect)")
+    source_fps = MetricFamily("yolo_source_fps", "gauge", "FPS đọc được từ source")
+    queue_depth = MetricFamily("yolo_queue_depth", "gauge", "Số item đang chờ trong hàng đợi giữa các stage")
+    dropped = MetricFamily("yolo_frames_dropped_total", "counter", "Số frame bị bỏ (reader, hàng đợi infer / render)")
+    motion_skipped = MetricFamily("yolo_motion_skipped_total", "counter", "Số lần motion gate bỏ qua inference")
+    objects = MetricFamily("yolo_objects", "gauge", "Số object đang được vẽ")
+    viewers = MetricFamily("yolo_viewers", "gauge", "Số viewer theo loại")
+    bytes_sent = MetricFamily("yolo_mjpeg_bytes_sent_total", "counter", "Số byte JPEG đã gửi qua /api/yolo/stream")
+    running = MetricFamily("yolo_stream_running", "gauge", "Stream đang chạy (1) hay đã dừng (0)")
+
+    for stream_url, processor in _registry.items():
+        try:
+            snapshot = processor.metrics_snapshot()
+        except Exception as e:
+            logger.warning(f"Cannot collect metrics for {stream_url}: {e}")
+            continue
+
+        running.add(snapshot["is_running"], stream=stream_url)
+        for step, histogram in snapshot["timings"].items():
+            stage_time.add(histogram, stream=stream_url, step=step)
+        for stage, (count, fps) in snapshot["stages"].items():
+            stage_frames.add(count, stream=stream_url, stage=stage)
+            stage_fps.add(fps, stream=stream_url, stage=stage)
+        source_fps.add(snapshot["source_fps"], stream=stream_url)
+        dropped.add(snapshot["reader_dropped"], stream=stream_url, queue="reader")
+        for name, (depth, queue_dropped) in snapshot["queues"].items():
+            queue_depth.add(depth, stream=stream_url, queue=name)
+            dropped.add(queue_dropped, stream=stream_url, queue=name)
+        motion_skipped.add(snapshot["motion_skipped"], stream=stream_url)
+        objects.add(snapshot["objects"], stream=stream_url)
+        for kind, count in snapshot["viewers"].items():
+            viewers.add(count, stream=stream_url, kind=kind)
+        bytes_sent.add(snapshot["mjpeg_bytes_sent"], stream=stream_url)
+
+    registry_stats = _registry.get_stats()
+    active = MetricFamily("yolo_active_streams", "gauge", "Số processor đang được quản lý").add(
+        len(registry_stats["streams"])
+    )
+    lifecycle = MetricFamily("yolo_processors_total", "counter", "Số processor theo sự kiện vòng đời")
+    for event in ("created", "reaped", "rejected"):
+        lifecycle.add(registry_stats[event], event=event)
+
+    return [
+        stage_time,
+        stage_fps,
+        stage_frames,
+        source_fps,
+        queue_depth,
+        dropped,
+        motion_skipped,
+        objects,
+        viewers,
+        bytes_sent,
+        running,
+        active,
+        lifecycle,
+    ]